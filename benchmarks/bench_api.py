@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark of the API against the instrument simulators
+
+The API runs on uvicorn in a background thread and the simulators run in the same process, so no hardware is needed.
+Client threads share the interpreter with the API, use the numbers to compare runs on the same machine.
+qDRA and qMR endpoints check the devices by ping, which needs raw sockets (root or CAP_NET_RAW).
+Ex) python benchmarks/bench_api.py --requests 200 --concurrency 4 --latency 0.001 --output api.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+import uvicorn
+
+P_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(P_ROOT))
+
+from simulator.runner import SimulatorSuite  # noqa: E402
+from simulator.serial_device import BAUDRATE_DEFAULT  # noqa: E402
+
+SESSION_NAME = "bench"
+DOWNLOAD_FILE_COUNT = 8
+DOWNLOAD_MODES = [("sftp", "none"), ("tar", "none"), ("tar", "gzip")]
+REQUEST_TIMEOUT = 60  # s
+
+
+class ApiServer:
+    """
+    uvicorn on an ephemeral port in a background thread
+    """
+
+    def __init__(self, app: Any, host: str = "127.0.0.1") -> None:
+        self.__server = uvicorn.Server(uvicorn.Config(app, host=host, port=0, log_level="warning"))
+        self.__thread = threading.Thread(target=self.__server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self.__thread.start()
+        while not self.__server.started:
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self.__server.should_exit = True
+        self.__thread.join()
+
+
+def is_success(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    body = response.json()
+    return not isinstance(body, dict) or body.get("success", True) is True
+
+
+def summarize_latencies(latencies: list[float], error_count: int, elapsed: float) -> dict[str, float]:
+    # Nearest rank is stable for small numbers of requests
+    ordered = sorted(latencies)
+
+    def percentile(q: float) -> float:
+        if len(ordered) == 0:
+            return float("nan")
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "errors": error_count,
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0,
+        "mean_ms": statistics.mean(latencies) * 1000 if len(latencies) > 0 else float("nan"),
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+        "max_ms": ordered[-1] * 1000 if len(ordered) > 0 else float("nan"),
+    }
+
+
+def measure_endpoint(url: str, path: str, request_count: int, concurrency: int) -> dict[str, float]:
+    """
+    Send request_count requests from concurrency threads, each thread keeps one connection alive
+    """
+    latencies: list[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(count: int) -> None:
+        with httpx.Client(base_url=url, timeout=REQUEST_TIMEOUT) as client:
+            for _ in range(count):
+                time_start = time.perf_counter()
+                response = client.get(path)
+                latency = time.perf_counter() - time_start
+                with lock:
+                    latencies.append(latency)
+                    if not is_success(response):
+                        errors[0] += 1
+
+    counts = [request_count // concurrency + (1 if i < request_count % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(count,)) for count in counts if count > 0]
+    time_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize_latencies(latencies, errors[0], time.perf_counter() - time_start)
+
+
+def measure_rate(task: Callable[[], bool], duration: float) -> dict[str, float]:
+    """
+    Call task back to back for duration and count successful calls
+    """
+    count = 0
+    error_count = 0
+    time_start = time.perf_counter()
+    while time.perf_counter() - time_start < duration:
+        if task():
+            count += 1
+        else:
+            error_count += 1
+    elapsed = time.perf_counter() - time_start
+    return {"count": count, "errors": error_count, "elapsed_s": elapsed, "per_s": count / elapsed}
+
+
+def measure_sas_frames(port: str, duration: float) -> dict[str, float]:
+    """
+    Output command and data frame round trips on the engine, the API has no endpoint to read SAS frames
+    """
+    from src.engine.read_instrument_settings import SasOutputSetting
+    from src.engine.sas import SAS_DATA_LENGTH, SasSerial
+
+    sas = SasSerial()
+    sas.set_port(port=port, baudrate=BAUDRATE_DEFAULT)
+    setting = SasOutputSetting(voc=50, isc=1, fill_factor=0.9)
+
+    def task() -> bool:
+        sas.output(onoff="on", setting=setting)
+        return sas.receive_data()["data"]["voltage"] is not None
+
+    try:
+        result = measure_rate(task, duration)
+    finally:
+        sas.close_port()
+    result["bytes_per_s"] = result["per_s"] * SAS_DATA_LENGTH
+    return result
+
+
+def make_download_data(p_session: Path, size_mb: float) -> int:
+    p_session.mkdir(parents=True, exist_ok=True)
+    file_size = int(size_mb * 1024 * 1024 / DOWNLOAD_FILE_COUNT)
+    for i in range(DOWNLOAD_FILE_COUNT):
+        # Random data is not compressed, so gzip shows its CPU cost only
+        (p_session / f"data_{i}.bin").write_bytes(os.urandom(file_size))
+    return file_size * DOWNLOAD_FILE_COUNT
+
+
+def measure_download(client: httpx.Client, p_save: Path, total_bytes: int) -> dict[str, dict[str, Any]]:
+    results: dict[str, dict[str, Any]] = {}
+    for transfer_mode, compression in DOWNLOAD_MODES:
+        shutil.rmtree(p_save / SESSION_NAME, ignore_errors=True)
+        params = {"sessionName": SESSION_NAME, "pathStr": "data", "transferMode": transfer_mode, "compression": compression}
+        time_start = time.perf_counter()
+        response = client.get("/trans/test/getProcessingData", params=params)
+        elapsed = time.perf_counter() - time_start
+        results[f"{transfer_mode}_{compression}"] = {
+            "success": is_success(response),
+            "elapsed_s": elapsed,
+            "mb_per_s": total_bytes / 1024 / 1024 / elapsed,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5, help="duration of each acquisition rate in s")
+    parser.add_argument("--download-mb", type=float, default=32)
+    parser.add_argument("--latency", type=float, default=0, help="delay of each simulator response in s")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/s of network simulators, 0 means unlimited")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    suite = SimulatorSuite(latency=args.latency, bandwidth=args.bandwidth)
+    suite.start()
+    p_save = suite.root / "Shared drives" / "save"
+    p_save.mkdir(parents=True)
+    p_settings = suite.root / "settings.json"
+    suite.write_settings(p_settings, default_path=p_save)
+    total_bytes = make_download_data(suite.root / "data" / SESSION_NAME, args.download_mb)
+    settings = suite.make_settings()
+
+    # Settings are read when the routers are imported
+    from src.engine.read_instrument_settings import setting_service
+
+    setting_service.path = p_settings
+    setting_service.reload()
+    import src.main
+
+    server = ApiServer(src.main.app)
+    server.start()
+    try:
+        with httpx.Client(base_url=server.url, timeout=REQUEST_TIMEOUT) as client:
+            client.get("/obs/powerSensor/connect", params={"accessPoint": settings["power_sensor"]["visa"]})
+            client.get("/obs/signalAnalyzer/connect", params={"accessPoint": settings["signal_analyzer"]["visa"]})
+            client.get("/trans/qdra/connect", params={"accessPoint": settings["qdra"]["network"]["ip_address"]})
+            client.get("/trans/qmr/connect", params={"accessPoint": settings["qmr"]["network"]["ip_address"]})
+            client.get("/trans/qmr/8psk_2_3")
+
+            endpoints = [
+                "/",
+                "/health",
+                "/obs/powerSensor/getData",
+                "/obs/signalAnalyzer/getTrace",
+                "/trans/qmr/readAttribute?name=dvbs2ModCodExpected",
+                f"/trans/qdra/checkExistence?pathStr=data/{SESSION_NAME}",
+            ]
+            endpoint_results = {path: measure_endpoint(server.url, path, args.requests, args.concurrency) for path in endpoints}
+
+            trace_points = len(client.get("/obs/signalAnalyzer/getTrace").json()["data"]["frequency"])
+            acquisition_results = {
+                "power_sensor_samples": measure_rate(lambda: is_success(client.get("/obs/powerSensor/getData")), args.duration),
+                "signal_analyzer_traces": measure_rate(lambda: is_success(client.get("/obs/signalAnalyzer/getTrace")), args.duration),
+                "sas_frames": measure_sas_frames(suite.sas.port, args.duration),
+            }
+            acquisition_results["signal_analyzer_traces"]["points"] = trace_points
+            download_results = measure_download(client, p_save, total_bytes)
+    finally:
+        server.stop()
+        suite.stop()
+
+    result = {
+        "python": sys.version.split()[0],
+        "link": {"latency_s": args.latency, "bandwidth_bytes_per_s": args.bandwidth},
+        "concurrency": args.concurrency,
+        "endpoints": endpoint_results,
+        "acquisition": acquisition_results,
+        "qdra_download": {"total_mb": total_bytes / 1024 / 1024, **download_results},
+    }
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output is not None:
+        args.output.write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
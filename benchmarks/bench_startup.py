@@ -0,0 +1,107 @@
+"""
+Startup benchmark of the API
+
+Each run starts a fresh interpreter, so module caches of previous runs do not affect the result.
+Ex) python benchmarks/bench_startup.py --runs 10 --output startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+P_ROOT = Path(__file__).resolve().parents[1]
+IMPORT_TIME_PATTERN = r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)"
+
+MEASURE_IMPORT = """
+import time
+time_start = time.perf_counter()
+import src.main
+print(time.perf_counter() - time_start)
+"""
+
+MEASURE_FIRST_REQUEST = """
+import time
+import src.main
+from fastapi.testclient import TestClient
+with TestClient(src.main.app) as client:
+    time_start = time.perf_counter()
+    client.get("/obs/signalAnalyzer/getTrace")
+    print(time.perf_counter() - time_start)
+"""
+
+HEAVY_MODULES = ["pandas", "paramiko", "pyvisa", "pythonping", "psutil", "serial", "requests", "httpx"]
+
+MEASURE_LOADED_MODULES = f"""
+import json
+import sys
+import src.main
+print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))
+"""
+
+
+def run_python(code: str, options: list[str] | None = None) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, "-W", "ignore", *(options or []), "-c", code],
+        cwd=P_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values),
+    }
+
+
+def measure_import_top(count: int) -> list[dict[str, Any]]:
+    """
+    Modules imported directly by src.main sorted by cumulative import time
+    """
+    stderr = run_python("import src.main", options=["-X", "importtime"]).stderr
+    modules: list[dict[str, Any]] = []
+    for line in stderr.splitlines():
+        match = re.match(IMPORT_TIME_PATTERN, line)
+        # Modules imported directly by src.main are indented by 3 spaces
+        if match is None or len(match.group(3)) != 3:
+            continue
+        modules.append({"module": match.group(4), "cumulative_ms": int(match.group(2)) / 1000})
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    import_times = [float(run_python(MEASURE_IMPORT).stdout) for _ in range(args.runs)]
+    first_request_times = [float(run_python(MEASURE_FIRST_REQUEST).stdout.splitlines()[-1]) for _ in range(args.runs)]
+    result = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_s": summarize(import_times),
+        "first_request_s": summarize(first_request_times),
+        "heavy_modules_loaded_at_import": json.loads(run_python(MEASURE_LOADED_MODULES).stdout),
+        "import_top": measure_import_top(args.top),
+    }
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output is not None:
+        args.output.write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
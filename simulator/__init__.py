@@ -0,0 +1,11 @@
+"""
+Instrument simulators to run the API and benchmarks without hardware
+
+- scpi: SCPI socket server emulating N90xx signal analyzer, U20xx power sensor and GL840
+- serial_device: pty-backed SAS and bus jig
+- rest: qDRA/qMR REST server
+- ssh: SSH server with SFTP and exec for qDRA
+- runner: start all of them and write settings.json pointing at them
+
+Ex) python -m simulator --latency 0.002 --bandwidth 12500000 --settings .settings/settings.json
+"""
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from simulator.runner import SimulatorSuite
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m simulator", description="Run instrument simulators until Ctrl+C")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency", type=float, default=0, help="delay of each response in s")
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/s of network devices, 0 means unlimited")
+    parser.add_argument("--root", type=Path, default=None, help="home directory of the SSH server")
+    parser.add_argument("--settings", type=Path, default=None, help="write settings.json pointing at the simulators")
+    parser.add_argument("--no-ssh", action="store_true")
+    args = parser.parse_args()
+
+    suite = SimulatorSuite(host=args.host, latency=args.latency, bandwidth=args.bandwidth, root=args.root, uses_ssh=not args.no_ssh)
+    suite.start()
+    if args.settings is not None:
+        suite.write_settings(args.settings)
+    print(json.dumps(suite.make_settings(), indent=2))
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        suite.stop()
+
+
+if __name__ == "__main__":
+    main()
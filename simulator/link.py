@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import time
+
+
+class Link:
+    """
+    Emulate latency and bandwidth of the link to a device.
+
+    Parameters
+    ----------
+    latency : float, optional
+        Delay added to each response in s, 0 disables it
+    bandwidth : float, optional
+        Transfer rate in bytes/s, 0 means unlimited
+    """
+
+    def __init__(self, latency: float = 0, bandwidth: float = 0) -> None:
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def get_transfer_time(self, size: int) -> float:
+        if self.bandwidth <= 0:
+            return 0
+        return size / self.bandwidth
+
+    def delay(self, size: int) -> None:
+        """
+        Wait before sending a response of size bytes
+        """
+        wait_time = self.latency + self.get_transfer_time(size)
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+    def throttle(self, size: int) -> None:
+        """
+        Wait for a chunk of a stream, latency is not added
+        """
+        wait_time = self.get_transfer_time(size)
+        if wait_time > 0:
+            time.sleep(wait_time)
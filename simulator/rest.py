@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from simulator.link import Link
+
+RECORD_START_PATH = "/rest/dataRecorder5/_procedure/startRecording"
+RECORD_STOP_PATH = "/rest/dataRecorder5/_procedure/stopRecording"
+ATTRIBUTE_PATH_PATTERN = r"/rest/([^/]+)/_attribute/([^/?]+)"
+
+
+class RestDeviceSim:
+    """
+    REST API of qDRA (recording procedures) and qMR (attributes) on one HTTP/1.1 keep-alive server.
+    Attributes are kept as posted, so a written attribute can be read back.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, link: Optional[Link] = None) -> None:
+        self.link = Link() if link is None else link
+        self.lock = threading.Lock()
+        self.attributes: dict[tuple[str, str], dict[str, Any]] = {}
+        self.is_recording = False
+        self.session_name: Optional[str] = None
+        self.request_count = 0
+        device = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def send_json(self, status_code: int, body: Any) -> None:
+                data = json.dumps(body).encode()
+                device.link.delay(len(data))
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_json(self) -> Any:
+                length = int(self.headers.get("Content-Length", 0))
+                if length == 0:
+                    return None
+                return json.loads(self.rfile.read(length))
+
+            def do_POST(self) -> None:  # noqa
+                payload = self.read_json()
+                status_code, body = device.post(self.path, payload)
+                self.send_json(status_code, body)
+
+            def do_GET(self) -> None:  # noqa
+                status_code, body = device.get(self.path)
+                self.send_json(status_code, body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa
+                pass
+
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+
+    def post(self, path: str, payload: Any) -> tuple[int, Any]:
+        with self.lock:
+            self.request_count += 1
+            if path == RECORD_START_PATH:
+                self.is_recording = True
+                self.session_name = payload["sessionName"]["value"] if isinstance(payload, dict) else None
+                return 200, {"startRecordingResponse": {"factory": "Attribute", "factoryType": "bool", "value": True}}
+            elif path == RECORD_STOP_PATH:
+                self.is_recording = False
+                return 200, {"stopRecordingResponse": {"factory": "Attribute", "factoryType": "bool", "value": True}}
+
+            match = re.fullmatch(ATTRIBUTE_PATH_PATTERN, path)
+            if match is not None and isinstance(payload, dict) and match.group(2) in payload:
+                self.attributes[(match.group(1), match.group(2))] = payload[match.group(2)]
+                return 200, {}
+            return 404, {"error": f"Not found: {path}"}
+
+    def get(self, path: str) -> tuple[int, Any]:
+        with self.lock:
+            self.request_count += 1
+            match = re.fullmatch(ATTRIBUTE_PATH_PATTERN, path)
+            if match is not None and (match.group(1), match.group(2)) in self.attributes:
+                return 200, {match.group(2): self.attributes[(match.group(1), match.group(2))]}
+            return 404, {"error": f"Not found: {path}"}
+
+    @property
+    def host(self) -> str:
+        return str(self.__server.server_address[0])
+
+    @property
+    def port(self) -> int:
+        return int(self.__server.server_address[1])
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+from simulator.link import Link
+from simulator.rest import RestDeviceSim
+from simulator.scpi import Gl840Sim, PowerSensorSim, ScpiServer, SignalAnalyzerSim
+from simulator.serial_device import BAUDRATE_DEFAULT, BusJigSim, SasSim
+
+
+class SimulatorSuite:
+    """
+    Start every simulator with the same link profile.
+
+    Parameters
+    ----------
+    latency : float, optional
+        Delay of each response in s
+    bandwidth : float, optional
+        Bytes/s of network devices, 0 means unlimited. Serial devices always use the baudrate.
+    root : Path, optional
+        Home directory of the SSH server, a temporary directory is used when None
+    uses_ssh : bool, optional
+        The SSH server needs paramiko and takes a moment to make a host key
+    """
+
+    def __init__(self, host: str = "127.0.0.1", latency: float = 0, bandwidth: float = 0, root: Optional[Path] = None, uses_ssh: bool = True) -> None:
+        self.host = host
+        self.__temp_dir: Optional[tempfile.TemporaryDirectory[str]] = None
+        if root is None:
+            self.__temp_dir = tempfile.TemporaryDirectory()
+            root = Path(self.__temp_dir.name)
+        self.root = root
+
+        link = Link(latency=latency, bandwidth=bandwidth)
+        serial_link = Link(latency=latency, bandwidth=BAUDRATE_DEFAULT / 10)
+        self.signal_analyzer = ScpiServer(SignalAnalyzerSim(), host=host, link=link)
+        self.power_sensor = ScpiServer(PowerSensorSim(), host=host, link=link)
+        self.gl840 = ScpiServer(Gl840Sim(), host=host, link=link)
+        self.sas = SasSim(link=serial_link)
+        self.bus_jig = BusJigSim(link=serial_link)
+        self.qdra_rest = RestDeviceSim(host=host, link=link)
+        self.qmr_rest = RestDeviceSim(host=host, link=link)
+        self.qdra_ssh: Optional[Any] = None
+        if uses_ssh:
+            from simulator.ssh import SshSim
+
+            self.qdra_ssh = SshSim(root=self.root, host=host, link=link)
+
+    def get_devices(self) -> list[Any]:
+        devices: list[Any] = [self.signal_analyzer, self.power_sensor, self.gl840, self.sas, self.bus_jig, self.qdra_rest, self.qmr_rest]
+        if self.qdra_ssh is not None:
+            devices.append(self.qdra_ssh)
+        return devices
+
+    def start(self) -> None:
+        for device in self.get_devices():
+            device.start()
+
+    def stop(self) -> None:
+        for device in self.get_devices():
+            device.stop()
+        if self.__temp_dir is not None:
+            self.__temp_dir.cleanup()
+
+    def make_settings(self, default_path: Optional[Path] = None) -> dict[str, Any]:
+        """
+        Same structure as .settings/settings.json (InstrumentSetting)
+        """
+        default_path = self.root / "save" if default_path is None else default_path
+        ssh = self.qdra_ssh
+        return {
+            "common": {"default_path": str(default_path)},
+            "trans": {"ignore_file_extension": ["bin"], "ignore_file": []},
+            "gl840": {"visa": self.gl840.visa_address, "ftp": {"ip_address": self.host, "port": 21}},
+            "sas": {"serial": {"port": self.sas.port}, "output": {}, "repeat": {}},
+            "bus_jig": {"serial": {"port": self.bus_jig.port}},
+            "qmr": {"network": {"ip_address": self.qmr_rest.host, "port": self.qmr_rest.port}},
+            "qdra": {
+                "network": {"ip_address": self.qdra_rest.host, "port": self.qdra_rest.port},
+                "ssh": {
+                    "ip_address": self.host if ssh is None else ssh.host,
+                    "port": 22 if ssh is None else ssh.port,
+                    "username": "user" if ssh is None else ssh.username,
+                    "password": "password" if ssh is None else ssh.password,
+                },
+            },
+            # Simulators end responses by a newline instead of EOI of the instruments
+            "power_sensor": {"visa": self.power_sensor.visa_address, "read_termination": "\n"},
+            "signal_analyzer": {"visa": self.signal_analyzer.visa_address, "capture_path": "D:\\capture", "read_termination": "\n"},
+        }
+
+    def write_settings(self, path: Path, default_path: Optional[Path] = None) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.make_settings(default_path=default_path), indent=2), encoding="utf-8")
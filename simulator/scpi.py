@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import math
+import os
+import random
+import re
+import socketserver
+import struct
+import threading
+import time
+from typing import Optional
+
+from simulator.link import Link
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+CAPTURE_SIZE = 100 * 1024  # bytes
+GL840_CHANNEL_COUNT = 20
+
+
+def make_block(data: bytes) -> bytes:
+    """
+    IEEE 488.2 definite length block
+    Ex) b"abc" => b"#13abc"
+    """
+    length = str(len(data))
+    return f"#{len(length)}{length}".encode() + data
+
+
+def get_quoted(command: str) -> str:
+    match = re.search(r'"(.*)"', command)
+    return "" if match is None else match.group(1)
+
+
+class ScpiInstrument:
+    """
+    Base of simulated SCPI instruments. Commands are case-insensitive and one command is sent per line.
+    """
+
+    idn = ""
+    termination = "\n"
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+
+    def handle(self, command: str) -> Optional[bytes]:
+        """
+        Returns
+        -------
+        Optional[bytes]
+            Response including termination, None for commands without response
+        """
+        with self.lock:
+            if command.upper() == "*IDN?":
+                return self.respond(self.idn)
+            return self.handle_command(command)
+
+    def handle_command(self, command: str) -> Optional[bytes]:
+        return None
+
+    def respond(self, text: str) -> bytes:
+        return (text + self.termination).encode()
+
+
+class SignalAnalyzerSim(ScpiInstrument):
+    """
+    N90xx signal analyzer with one tone on a noise floor
+    """
+
+    idn = "Keysight Technologies,N9010B,MY00000001,A.33.03"
+
+    def __init__(self, freq_start: float = 1e9, freq_stop: float = 2e9, points: int = 1001, capture_size: int = CAPTURE_SIZE) -> None:
+        super().__init__()
+        self.freq_start = freq_start
+        self.freq_stop = freq_stop
+        self.points = points
+        self.capture_size = capture_size
+        self.noise_floor = -90.0  # dBm
+        self.tone_power = -20.0  # dBm
+        self.tone_width = 0.01  # ratio to span
+        self.files: dict[str, bytes] = {}
+
+    def make_trace(self) -> list[float]:
+        span = self.freq_stop - self.freq_start
+        center = (self.freq_start + self.freq_stop) / 2
+        step = span / (self.points - 1) if self.points > 1 else 0
+        trace: list[float] = []
+        for i in range(self.points):
+            offset = (self.freq_start + step * i - center) / (span * self.tone_width)
+            tone = self.tone_power - self.noise_floor
+            trace.append(self.noise_floor + tone * math.exp(-(offset**2)) + random.gauss(0, 0.5))
+        return trace
+
+    def handle_command(self, command: str) -> Optional[bytes]:
+        upper = command.upper()
+        if upper == "FREQ:START?":
+            return self.respond(f"{self.freq_start:+.11E}")
+        elif upper == "FREQ:STOP?":
+            return self.respond(f"{self.freq_stop:+.11E}")
+        elif upper == "SWEEP:POINTS?":
+            return self.respond(str(self.points))
+        elif upper.startswith("TRACE:DATA?"):
+            return self.respond(",".join(f"{value:.8E}" for value in self.make_trace()))
+        elif upper.startswith(":MMEM:STOR:SCR"):
+            self.files[get_quoted(command)] = PNG_SIGNATURE + os.urandom(self.capture_size - len(PNG_SIGNATURE))
+        elif upper.startswith(":MMEM:DATA?"):
+            return make_block(self.files.get(get_quoted(command), b"")) + self.termination.encode()
+        elif upper.startswith(":MMEM:DEL"):
+            self.files.pop(get_quoted(command), None)
+        return None
+
+
+class PowerSensorSim(ScpiInstrument):
+    """
+    U20xx power sensor. fetc? returns the power measured by the last init.
+    """
+
+    idn = "Keysight Technologies,U2021XA,MY00000001,A1.03.05"
+
+    def __init__(self, power: float = -10.0) -> None:
+        super().__init__()
+        self.power = power
+        self.measured_power = power
+
+    def handle_command(self, command: str) -> Optional[bytes]:
+        upper = command.upper()
+        if upper == "INIT":
+            self.measured_power = self.power + random.gauss(0, 0.01)
+        elif upper == "FETC?":
+            return self.respond(f"{self.measured_power:+.6E}")
+        return None
+
+
+class Gl840Sim(ScpiInstrument):
+    """
+    GL840 data logger. Output data is a block of int16 per channel, which only approximates the real frame layout.
+    """
+
+    idn = "*IDN GRAPHTEC,GL840,0,1.10"
+    termination = "\r\n"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.is_recording = False
+        self.sampling = "1S"
+        self.inputs = {f"CH{i}": "DC" for i in range(1, GL840_CHANNEL_COUNT + 1)}
+        self.ranges = {f"CH{i}": "20V" for i in range(1, GL840_CHANNEL_COUNT + 1)}
+        self.time_start = time.time()
+
+    def make_record(self) -> bytes:
+        elapsed = time.time() - self.time_start
+        values = [int(1000 * math.sin(elapsed + i)) for i in range(GL840_CHANNEL_COUNT)]
+        return make_block(struct.pack(f">{GL840_CHANNEL_COUNT}h", *values))
+
+    def handle_command(self, command: str) -> Optional[bytes]:
+        upper = command.upper()
+        if upper == ":MEAS:START":
+            self.is_recording = True
+        elif upper == ":MEAS:STOP":
+            self.is_recording = False
+        elif upper in (":MEAS:OUTP:ONE?", ":MEAS:OUTP:ACK?"):
+            return self.make_record()
+        elif upper.startswith(":DATA:SAMP "):
+            self.sampling = upper.split(" ", 1)[1]
+        else:
+            match = re.fullmatch(r":AMP:(CH[0-9]+):(INP|RANG) (\S+)", upper)
+            if match is not None:
+                target = self.inputs if match.group(2) == "INP" else self.ranges
+                target[match.group(1)] = match.group(3)
+        return None
+
+
+class ReusableTcpServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class ScpiServer:
+    """
+    SCPI over raw TCP socket (VISA resource "TCPIP0::host::port::SOCKET")
+    """
+
+    def __init__(self, instrument: ScpiInstrument, host: str = "127.0.0.1", port: int = 0, link: Optional[Link] = None) -> None:
+        self.instrument = instrument
+        self.link = Link() if link is None else link
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    command = line.decode(errors="replace").strip()
+                    if command == "":
+                        continue
+                    response = server.instrument.handle(command)
+                    if response is not None:
+                        server.link.delay(len(response))
+                        self.wfile.write(response)
+
+        self.__server = ReusableTcpServer((host, port), Handler)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return str(self.__server.server_address[0])
+
+    @property
+    def port(self) -> int:
+        return int(self.__server.server_address[1])
+
+    @property
+    def visa_address(self) -> str:
+        return f"TCPIP0::{self.host}::{self.port}::SOCKET"
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+import select
+import threading
+import time
+import tty
+from typing import Optional
+
+from simulator.link import Link
+
+SAS_COMMAND_HEADER = bytes([0x10, 0x02, 0x00, 0x18])
+SAS_COMMAND_LENGTH = 24
+SAS_DATA_HEADER = bytes([0x10, 0x12, 0x00, 0x20])
+SAS_DATA_LENGTH = 32
+SAS_FRAME_INTERVAL = 1  # s
+BAUDRATE_DEFAULT = 9600
+READ_SIZE = 4096
+
+
+def make_check_sum(data: bytes) -> bytes:
+    """
+    Same as SasSerial.make_check_sum: sum of bytes as 2 bytes big endian
+    """
+    return (sum(data) & 0xFFFF).to_bytes(2, "big")
+
+
+class PtySerialDevice:
+    """
+    Serial device behind a pseudo terminal. Open `port` (Ex. /dev/pts/3) with pyserial like a real COM port.
+    Bytes sent to the client are throttled by link, use the baudrate / 10 bytes/s to emulate the UART speed.
+    """
+
+    def __init__(self, link: Optional[Link] = None) -> None:
+        self.link = Link(bandwidth=BAUDRATE_DEFAULT / 10) if link is None else link
+        self.__master_fd, self.__slave_fd = os.openpty()
+        # Raw mode so that binary frames are not changed by the line discipline
+        tty.setraw(self.__slave_fd)
+        self.port = os.ttyname(self.__slave_fd)
+        self.__write_lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        self.__thread.join()
+        os.close(self.__master_fd)
+        os.close(self.__slave_fd)
+
+    def is_stopped(self) -> bool:
+        return self.__stop_event.is_set()
+
+    def write(self, data: bytes) -> None:
+        with self.__write_lock:
+            self.link.delay(len(data))
+            os.write(self.__master_fd, data)
+
+    def __run(self) -> None:
+        while not self.__stop_event.is_set():
+            readable, _, _ = select.select([self.__master_fd], [], [], 0.1)
+            if len(readable) == 0:
+                continue
+            try:
+                data = os.read(self.__master_fd, READ_SIZE)
+            except OSError:
+                continue
+            self.on_receive(data)
+
+    def on_receive(self, data: bytes) -> None:
+        pass
+
+
+class SasSim(PtySerialDevice):
+    """
+    Solar array simulator. Each output command is answered with a data frame, and frames are also sent every frame_interval (0 disables it).
+    The operating point is 80% of Voc when the output is on.
+    """
+
+    def __init__(self, link: Optional[Link] = None, frame_interval: float = SAS_FRAME_INTERVAL) -> None:
+        super().__init__(link=link)
+        self.frame_interval = frame_interval
+        self.is_on = False
+        self.voc = 0.0
+        self.pmax = 0.0
+        self.fill_factor = 0.0
+        self.command_count = 0
+        self.__buffer = bytearray()
+        self.__frame_thread = threading.Thread(target=self.__send_frames, daemon=True)
+
+    def start(self) -> None:
+        super().start()
+        if self.frame_interval > 0:
+            self.__frame_thread.start()
+
+    def on_receive(self, data: bytes) -> None:
+        self.__buffer.extend(data)
+        while True:
+            position = self.__buffer.find(SAS_COMMAND_HEADER)
+            if position < 0 or len(self.__buffer) < position + SAS_COMMAND_LENGTH:
+                return
+            command = bytes(self.__buffer[position : position + SAS_COMMAND_LENGTH])
+            del self.__buffer[: position + SAS_COMMAND_LENGTH]
+            if make_check_sum(command[:-2]) != command[-2:]:
+                continue
+            self.is_on = command[4] == 0x01
+            self.pmax = float(int.from_bytes(command[8:10], "big"))
+            self.voc = int.from_bytes(command[10:12], "big") / 10
+            self.fill_factor = int.from_bytes(command[12:14], "big") / 10000
+            self.command_count += 1
+            self.write(self.make_frame())
+
+    def make_frame(self) -> bytes:
+        voltage = self.voc * 0.8 if self.is_on else 0.0
+        current = self.pmax / voltage if self.is_on and voltage > 0 else 0.0
+        frame = bytearray(SAS_DATA_LENGTH - 2)
+        frame[0:4] = SAS_DATA_HEADER
+        frame[6:8] = int(voltage * 10).to_bytes(2, "big")
+        frame[8:10] = int(current * 100).to_bytes(2, "big")
+        return bytes(frame) + make_check_sum(bytes(frame))
+
+    def __send_frames(self) -> None:
+        while not self.is_stopped():
+            time_start = time.perf_counter()
+            self.write(self.make_frame())
+            time.sleep(max(self.frame_interval - (time.perf_counter() - time_start), 0))
+
+
+class BusJigSim(PtySerialDevice):
+    """
+    Bus jig accepting "ENA" and "DIS" lines. The API does not read anything from the jig, so nothing is sent back.
+    """
+
+    def __init__(self, link: Optional[Link] = None) -> None:
+        super().__init__(link=link)
+        self.is_ena = False
+        self.__buffer = b""
+
+    def on_receive(self, data: bytes) -> None:
+        self.__buffer += data
+        *lines, self.__buffer = self.__buffer.split(b"\n")
+        for line in lines:
+            command = line.strip().decode(errors="replace").upper()
+            if command == "ENA":
+                self.is_ena = True
+            elif command == "DIS":
+                self.is_ena = False
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import paramiko
+from paramiko.common import (
+    AUTH_FAILED,
+    AUTH_SUCCESSFUL,
+    OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED,
+    OPEN_SUCCEEDED,
+)
+from paramiko.sftp import (
+    SFTP_FAILURE,
+    SFTP_NO_SUCH_FILE,
+    SFTP_OK,
+    SFTP_PERMISSION_DENIED,
+)
+
+from simulator.link import Link
+
+EXEC_CHUNK_SIZE = 32 * 1024
+
+
+def to_sftp_error(error: OSError) -> int:
+    if isinstance(error, FileNotFoundError):
+        return SFTP_NO_SUCH_FILE
+    if isinstance(error, PermissionError):
+        return SFTP_PERMISSION_DENIED
+    return SFTP_FAILURE
+
+
+class RootedPath:
+    """
+    Map client paths into the root directory. Relative paths are from the home directory, which is the root itself.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root.resolve()
+
+    def resolve(self, path: str) -> Path:
+        resolved = (self.root / path.lstrip("/")).resolve()
+        if resolved != self.root and self.root not in resolved.parents:
+            raise PermissionError(path)
+        return resolved
+
+
+class ThrottledSftpHandle(paramiko.SFTPHandle):
+    def __init__(self, link: Link, flags: int = 0) -> None:
+        super().__init__(flags)
+        self.link = link
+
+    def read(self, offset: int, length: int) -> Union[bytes, int]:
+        data = super().read(offset, length)
+        if isinstance(data, bytes):
+            self.link.throttle(len(data))
+        return data
+
+
+class RootedSftpServer(paramiko.SFTPServerInterface):
+    def __init__(self, server: paramiko.ServerInterface, root: Path, link: Link, *args: Any, **kwargs: Any) -> None:
+        super().__init__(server, *args, **kwargs)
+        self.paths = RootedPath(root)
+        self.link = link
+
+    def list_folder(self, path: str) -> Union[list[paramiko.SFTPAttributes], int]:
+        try:
+            p_dir = self.paths.resolve(path)
+            return [paramiko.SFTPAttributes.from_stat(os.stat(p_dir / name), name) for name in os.listdir(p_dir)]
+        except OSError as error:
+            return to_sftp_error(error)
+
+    def stat(self, path: str) -> Union[paramiko.SFTPAttributes, int]:
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.paths.resolve(path)))
+        except OSError as error:
+            return to_sftp_error(error)
+
+    def lstat(self, path: str) -> Union[paramiko.SFTPAttributes, int]:
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.lstat(self.paths.resolve(path)))
+        except OSError as error:
+            return to_sftp_error(error)
+
+    def open(self, path: str, flags: int, attr: paramiko.SFTPAttributes) -> Union[paramiko.SFTPHandle, int]:
+        try:
+            p_file = self.paths.resolve(path)
+            fd = os.open(p_file, flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as error:
+            return to_sftp_error(error)
+
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        file = os.fdopen(fd, mode)
+        handle = ThrottledSftpHandle(link=self.link, flags=flags)
+        handle.filename = str(p_file)  # type: ignore
+        handle.readfile = file  # type: ignore
+        handle.writefile = file  # type: ignore
+        return handle
+
+    def remove(self, path: str) -> int:
+        try:
+            os.remove(self.paths.resolve(path))
+        except OSError as error:
+            return to_sftp_error(error)
+        return SFTP_OK
+
+    def rename(self, oldpath: str, newpath: str) -> int:
+        try:
+            os.rename(self.paths.resolve(oldpath), self.paths.resolve(newpath))
+        except OSError as error:
+            return to_sftp_error(error)
+        return SFTP_OK
+
+    def mkdir(self, path: str, attr: paramiko.SFTPAttributes) -> int:
+        try:
+            os.mkdir(self.paths.resolve(path))
+        except OSError as error:
+            return to_sftp_error(error)
+        return SFTP_OK
+
+    def rmdir(self, path: str) -> int:
+        try:
+            os.rmdir(self.paths.resolve(path))
+        except OSError as error:
+            return to_sftp_error(error)
+        return SFTP_OK
+
+    def canonicalize(self, path: str) -> str:
+        try:
+            return "/" + str(self.paths.resolve(path).relative_to(self.paths.root)).replace("\\", "/").lstrip(".")
+        except PermissionError:
+            return "/"
+
+
+class ShellServer(paramiko.ServerInterface):
+    """
+    Password authentication and exec requests. Commands run by bash with HOME set to the root directory, so "~/" is the root.
+    """
+
+    def __init__(self, username: str, password: str, root: Path, link: Link) -> None:
+        self.username = username
+        self.password = password
+        self.root = root
+        self.link = link
+        self.ptys: set[int] = set()
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if username == self.username and password == self.password:
+            return AUTH_SUCCESSFUL
+        return AUTH_FAILED
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return OPEN_SUCCEEDED
+        return OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel: paramiko.Channel, *args: Any) -> bool:
+        self.ptys.add(channel.get_id())
+        return True
+
+    def check_channel_exec_request(self, channel: paramiko.Channel, command: bytes) -> bool:
+        uses_pty = channel.get_id() in self.ptys
+        thread = threading.Thread(target=self.__exec, args=(channel, command.decode(), uses_pty), daemon=True)
+        thread.start()
+        return True
+
+    def __exec(self, channel: paramiko.Channel, command: str, uses_pty: bool) -> None:
+        env = dict(os.environ, HOME=str(self.root))
+        # stderr is merged into stdout on a pty like a real terminal
+        process = subprocess.Popen(
+            ["bash", "-c", command],
+            cwd=self.root,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if uses_pty else subprocess.PIPE,
+        )
+
+        def forward_stdin() -> None:
+            try:
+                while process.poll() is None:
+                    data = channel.recv(EXEC_CHUNK_SIZE)
+                    if len(data) == 0 or process.stdin is None:
+                        break
+                    process.stdin.write(data)
+                    process.stdin.flush()
+            except (OSError, EOFError):
+                pass
+
+        def forward_stderr() -> None:
+            if process.stderr is not None:
+                for chunk in iter(lambda: process.stderr.read1(EXEC_CHUNK_SIZE), b""):  # type: ignore
+                    channel.sendall_stderr(chunk)
+
+        threading.Thread(target=forward_stdin, daemon=True).start()
+        stderr_thread = threading.Thread(target=forward_stderr, daemon=True)
+        stderr_thread.start()
+
+        try:
+            if process.stdout is not None:
+                for chunk in iter(lambda: process.stdout.read1(EXEC_CHUNK_SIZE), b""):  # type: ignore
+                    self.link.throttle(len(chunk))
+                    channel.sendall(chunk)
+        except OSError:
+            # The client closed the channel, ex) cancelled processing job
+            process.kill()
+        stderr_thread.join()
+        channel.send_exit_status(process.wait())
+        channel.close()
+
+
+class SshSim:
+    """
+    SSH server for qDRA with SFTP subsystem and exec.
+
+    Parameters
+    ----------
+    root : Path
+        Directory used as the home directory of the user
+    """
+
+    def __init__(
+        self, root: Path, username: str = "user", password: str = "password", host: str = "127.0.0.1", port: int = 0, link: Optional[Link] = None
+    ) -> None:
+        self.root = root
+        self.username = username
+        self.password = password
+        self.link = Link() if link is None else link
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__socket.bind((host, port))
+        self.__stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__transports: list[paramiko.Transport] = []
+
+    @property
+    def host(self) -> str:
+        return str(self.__socket.getsockname()[0])
+
+    @property
+    def port(self) -> int:
+        return int(self.__socket.getsockname()[1])
+
+    def start(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.__socket.listen(16)
+        self.__socket.settimeout(0.5)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        self.__thread.join()
+        self.__socket.close()
+        for transport in self.__transports:
+            transport.close()
+
+    def __run(self) -> None:
+        while not self.__stop_event.is_set():
+            try:
+                client, _ = self.__socket.accept()
+            except socket.timeout:
+                continue
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, RootedSftpServer, root=self.root, link=self.link)
+            server = ShellServer(username=self.username, password=self.password, root=self.root, link=self.link)
+            try:
+                transport.start_server(server=server)
+            except (paramiko.SSHException, EOFError):
+                transport.close()
+                continue
+            self.__transports = [t for t in self.__transports if t.is_active()] + [transport]
+            threading.Thread(target=self.__accept_channels, args=(transport,), daemon=True).start()
+
+    def __accept_channels(self, transport: paramiko.Transport) -> None:
+        # Channels are served by the callbacks of ShellServer and SFTPServer.
+        # Accepted channels are only kept, because a dropped channel is closed by garbage collection.
+        channels: list[paramiko.Channel] = []
+        while transport.is_active() and not self.__stop_event.is_set():
+            channel = transport.accept(timeout=0.5)
+            channels = [c for c in channels if not c.closed]
+            if channel is not None:
+                channels.append(channel)
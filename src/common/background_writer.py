@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Callable, Optional, TypedDict
+
+from src.common.logger import set_logger
+from src.common.tracing import tracer
+
+logger = set_logger(__name__)
+
+WRITER_MAX_ITEMS = 64
+WRITER_CLOSE_TIMEOUT = 60  # s
+
+
+class WriterStatsDict(TypedDict):
+    written_count: int
+    error_count: int
+    max_queue_size: int
+    write_time: float
+    stall_time: float
+
+
+class BackgroundWriter:
+    """
+    Persist files in one background thread, so slow storage (Ex. Google Drive) does not delay acquisition.
+    The queue is bounded to keep memory use limited. When it is full, put blocks until a write finishes,
+    and the blocked time is reported as stall_time.
+
+    Parameters
+    ----------
+    name : str
+        Name of the thread and category of trace spans
+    max_items : int, optional
+        Number of writes waiting in the queue
+    """
+
+    def __init__(self, name: str, max_items: int = WRITER_MAX_ITEMS) -> None:
+        self.name = name
+        self.__queue: queue.Queue[Optional[tuple[str, Callable[[], object]]]] = queue.Queue(maxsize=max_items)
+        self.__lock = threading.Lock()
+        self.__stats: WriterStatsDict = {"written_count": 0, "error_count": 0, "max_queue_size": 0, "write_time": 0.0, "stall_time": 0.0}
+        self.__thread = threading.Thread(target=self.__run, name=name, daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def put(self, label: str, write: Callable[[], object]) -> None:
+        """
+        Queue write, label is used for the trace span and the error log. Ex) "save_picture"
+        """
+        time_start = time.perf_counter()
+        self.__queue.put((label, write))
+        stall_time = time.perf_counter() - time_start
+        with self.__lock:
+            self.__stats["stall_time"] += stall_time
+            self.__stats["max_queue_size"] = max(self.__stats["max_queue_size"], self.__queue.qsize())
+
+    def close(self, timeout: Optional[float] = WRITER_CLOSE_TIMEOUT) -> bool:
+        """
+        Write everything queued and stop the thread
+
+        Returns
+        -------
+        bool
+            False if writes have not finished within timeout
+        """
+        self.__queue.put(None)
+        self.__thread.join(timeout=timeout)
+        return not self.__thread.is_alive()
+
+    def get_stats(self) -> WriterStatsDict:
+        with self.__lock:
+            return self.__stats.copy()
+
+    def __run(self) -> None:
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                return
+            label, write = item
+            time_start = time.perf_counter()
+            is_success = True
+            try:
+                with tracer.span(f"{self.name}.{label}", category=self.name):
+                    write()
+            except Exception as error:
+                logger.error(f"{label}: {error}")
+                is_success = False
+            with self.__lock:
+                self.__stats["write_time"] += time.perf_counter() - time_start
+                self.__stats["written_count" if is_success else "error_count"] += 1
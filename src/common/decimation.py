@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Literal, Optional, TypedDict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DecimationMethod = Literal["minmax", "lttb"]
+
+# Runs are forgotten from the least recently used when the number of runs exceeds this
+DECIMATION_CACHE_MAX_RUNS = 8
+# LTTB results kept for each run
+DECIMATION_CACHE_MAX_LTTB = 32
+# Two buckets of two points each, the fewest a zoom can be reduced to by minmax
+MINMAX_MIN_POINTS = 4
+
+
+class DecimationDict(TypedDict):
+    method: DecimationMethod
+    total_count: int
+    range_count: int
+    count: int
+
+
+def select_range(x: np.ndarray, start: Optional[float], end: Optional[float]) -> tuple[int, int]:
+    """
+    Index range of start <= x <= end, x must be sorted
+    """
+    import numpy as np
+
+    i_start = 0 if start is None else int(np.searchsorted(x, start, side="left"))
+    i_end = len(x) if end is None else int(np.searchsorted(x, end, side="right"))
+    return i_start, max(i_start, i_end)
+
+
+def minmax_indices(y: np.ndarray, bucket_size: int) -> np.ndarray:
+    """
+    Sorted indices of the minimum and the maximum in each bucket of bucket_size points
+    """
+    import numpy as np
+
+    n_buckets = math.ceil(len(y) / bucket_size)
+    padding = n_buckets * bucket_size - len(y)
+    # Padding never becomes the minimum or the maximum
+    y_min = np.concatenate([y, np.full(padding, np.inf)]).reshape(n_buckets, bucket_size)
+    y_max = np.concatenate([y, np.full(padding, -np.inf)]).reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    indices = np.concatenate([offsets + np.argmin(y_min, axis=1), offsets + np.argmax(y_max, axis=1)])
+    return np.unique(indices)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets, keeps the shape of the line better than min/max for smooth data.
+    The first and the last points are always kept.
+    """
+    import numpy as np
+
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+    for bucket in range(max_points - 2):
+        i_start, i_end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # Average of the next bucket, the last point for the last bucket
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+            x_next, y_next = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            x_next, y_next = x[n - 1], y[n - 1]
+        areas = np.abs((x[selected] - x_next) * (y[i_start:i_end] - y[selected]) - (x[selected] - x[i_start:i_end]) * (y_next - y[selected]))
+        selected = i_start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+
+class MinMaxPyramid:
+    """
+    Min/max indices for bucket sizes of 2, 4, 8, ... points, each level is made at first use.
+    A zoom uses the coarsest level fine enough for max_points in its range, so no full scan is needed after the first zooms.
+    The ends of the range are added to the min/max points, so a zoom has at most max_points + 2 points.
+    """
+
+    def __init__(self, y: np.ndarray) -> None:
+        self.y = y
+        self.__levels: dict[int, np.ndarray] = {}
+
+    def get_level(self, level: int) -> np.ndarray:
+        if level not in self.__levels:
+            self.__levels[level] = minmax_indices(self.y, 2**level)
+        return self.__levels[level]
+
+    def get_indices(self, i_start: int, i_end: int, max_points: int) -> np.ndarray:
+        import numpy as np
+
+        count = i_end - i_start
+        if count <= max_points:
+            return np.arange(i_start, i_end)
+        if max_points < MINMAX_MIN_POINTS:
+            raise ValueError(f"max_points must be at least {MINMAX_MIN_POINTS} for minmax: {max_points}")
+        # A range not aligned to buckets overlaps one more bucket, two points for each bucket and two more for the ends of the range
+        level = 1
+        while math.ceil((count - 1) / 2**level) + 1 > max_points // 2:
+            level += 1
+        bucket_size = 2**level
+        indices = self.get_level(level)
+        # Min/max of the buckets cut by the range may be outside it, so the cut parts are scanned instead
+        i_full_start = min(-(-i_start // bucket_size) * bucket_size, i_end)
+        i_full_end = max(i_end // bucket_size * bucket_size, i_full_start)
+        selected = indices[np.searchsorted(indices, i_full_start) : np.searchsorted(indices, i_full_end)]
+        edges = [i_start, i_end - 1]
+        for i_part_start, i_part_end in ((i_start, i_full_start), (i_full_end, i_end)):
+            if i_part_start < i_part_end:
+                part = self.y[i_part_start:i_part_end]
+                edges.extend([i_part_start + int(np.argmin(part)), i_part_start + int(np.argmax(part))])
+        return np.unique(np.concatenate([selected, edges]))
+
+
+class DecimationRunDict(TypedDict):
+    x: np.ndarray
+    y: np.ndarray
+    pyramid: MinMaxPyramid
+    lttb: OrderedDict[tuple[int, int, int], np.ndarray]
+
+
+class DecimationCache:
+    """
+    Arrays and decimation levels of recent runs, so repeated zooms into the same run do not convert and scan all data again
+    """
+
+    def __init__(self, max_runs: int = DECIMATION_CACHE_MAX_RUNS) -> None:
+        self.max_runs = max_runs
+        self.__lock = threading.Lock()
+        self.__runs: OrderedDict[str, DecimationRunDict] = OrderedDict()
+
+    def __get_run(self, run_id: Optional[str], x: list[float], y: list[float]) -> DecimationRunDict:
+        import numpy as np
+
+        with self.__lock:
+            if run_id is not None and run_id in self.__runs:
+                self.__runs.move_to_end(run_id)
+                return self.__runs[run_id]
+
+        y_array = np.asarray(y, dtype=float)
+        run: DecimationRunDict = {"x": np.asarray(x, dtype=float), "y": y_array, "pyramid": MinMaxPyramid(y_array), "lttb": OrderedDict()}
+        if run_id is not None:
+            with self.__lock:
+                self.__runs[run_id] = run
+                while len(self.__runs) > self.max_runs:
+                    self.__runs.popitem(last=False)
+        return run
+
+    def decimate(
+        self,
+        run_id: Optional[str],
+        x: list[float],
+        y: list[float],
+        max_points: Optional[int] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        method: DecimationMethod = "minmax",
+    ) -> tuple[np.ndarray, DecimationDict]:
+        """
+        Indices of points to plot in start <= x <= end selected on y, x must be sorted.
+        Use the indices for all columns of the run so that they stay aligned.
+
+        Parameters
+        ----------
+        run_id : Optional[str]
+            Key of the cache, None for data used once. Ex) job ID of an obs test
+        max_points : Optional[int]
+            No decimation without it. The ends of the range may exceed this by 2 for minmax, which needs at least MINMAX_MIN_POINTS
+        """
+        import numpy as np
+
+        run = self.__get_run(run_id, x, y)
+        i_start, i_end = select_range(run["x"], start, end)
+        if max_points is None or i_end - i_start <= max_points:
+            indices = np.arange(i_start, i_end)
+        elif method == "lttb":
+            key = (i_start, i_end, max_points)
+            with self.__lock:
+                cached = run["lttb"].get(key)
+            if cached is None:
+                cached = i_start + lttb_indices(run["x"][i_start:i_end], run["y"][i_start:i_end], max_points)
+                with self.__lock:
+                    run["lttb"][key] = cached
+                    while len(run["lttb"]) > DECIMATION_CACHE_MAX_LTTB:
+                        run["lttb"].popitem(last=False)
+            indices = cached
+        else:
+            indices = run["pyramid"].get_indices(i_start, i_end, max_points)
+        info: DecimationDict = {"method": method, "total_count": len(run["y"]), "range_count": i_end - i_start, "count": len(indices)}
+        return indices, info
+
+
+decimation_cache = DecimationCache()
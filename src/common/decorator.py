@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Callable
+from typing import Any, Awaitable, Callable
 
 
 def exception(logger: logging.Logger) -> Any:
@@ -15,3 +15,18 @@ def exception(logger: logging.Logger) -> Any:
         return wrapper
 
     return _exception
+
+
+def async_exception(logger: logging.Logger) -> Any:
+    def _exception(func: Callable[..., Awaitable[Any]]) -> Any:
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                response = await func(*args, **kwargs)
+                return response
+            except Exception as error:
+                logger.error(error)
+                return {"success": False, "error": "Unexpected error. See log for details"}
+
+        return wrapper
+
+    return _exception
@@ -3,14 +3,16 @@ from __future__ import annotations
 import struct
 from datetime import datetime as dt
 from pathlib import Path
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
-import pandas
-from pythonping import ping
-from pythonping.executor import ResponseList
+if TYPE_CHECKING:
+    from pythonping.executor import ResponseList
 
 
 def save_csv_from_dict(data: dict[Any, Any], path: Path) -> None:
+    # pandas is imported at first use because it takes most of startup time
+    import pandas
+
     df = pandas.DataFrame(data=data)
     df.to_csv(path, index=False)
 
@@ -66,6 +68,8 @@ def resolve_path_shared_drives(path: str | Path) -> Optional[Path]:
 
 
 def check_ping(ip_address: str) -> bool:
+    from pythonping import ping
+
     is_ok = False
     response: ResponseList = ping(ip_address, timeout=0.1, count=2)  # type: ignore
     response_list = response.__iter__()
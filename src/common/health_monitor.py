@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypedDict
+
+from src.common.general import check_ping
+from src.common.logger import set_logger
+from src.common.visa_driver import exists_resource
+
+logger = set_logger(__name__)
+
+HEALTH_CHECK_INTERVAL = 2  # s
+# Looking up the VISA resource list is heavier than ping, so it is done less often
+HEALTH_VISA_LOOKUP_INTERVAL = 30  # s
+# When the last check is older than this, the state is checked again on the calling thread
+HEALTH_MAX_AGE = 10  # s
+VISA_TCPIP_PATTERN = r"TCPIP[0-9]*::([^:]+)::.*"
+
+
+class DeviceHealthDict(TypedDict):
+    is_alive: bool
+    checked_at: Optional[float]
+    latency: Optional[float]
+    error: Optional[str]
+
+
+def get_ip_address_from_visa(address: str) -> Optional[str]:
+    """
+    Ex) "TCPIP0::192.168.1.5::8023::SOCKET" => "192.168.1.5"
+    None is returned for other interfaces such as USB.
+    """
+    match = re.fullmatch(VISA_TCPIP_PATTERN, address)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def make_visa_probe(address: str, is_open: Optional[Callable[[], bool]] = None) -> Callable[[], bool]:
+    """
+    TCPIP instruments are pinged, others are looked up in the VISA resource list.
+    An open instrument is not listed on some platforms, so it is alive while is_open returns True.
+    """
+    ip_address = get_ip_address_from_visa(address)
+    if ip_address is not None:
+        return lambda: check_ping(ip_address)
+    else:
+        return lambda: (is_open is not None and is_open()) or exists_resource(address)
+
+
+def get_visa_probe_interval(address: str) -> Optional[float]:
+    """
+    None for the default interval of HealthMonitor
+    """
+    return None if get_ip_address_from_visa(address) is not None else HEALTH_VISA_LOOKUP_INTERVAL
+
+
+class HealthMonitor:
+    """
+    Probe registered devices in background and cache reachability with timestamps.
+    Readers get the cached state without any I/O.
+    """
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, max_age: float = HEALTH_MAX_AGE) -> None:
+        self.interval = interval
+        self.max_age = max_age
+        self.__lock = threading.Lock()
+        self.__probes: dict[str, Callable[[], bool]] = {}
+        self.__intervals: dict[str, float] = {}
+        self.__submitted_at: dict[str, float] = {}
+        self.__targets: dict[str, Optional[str]] = {}
+        # Generation of each registration, results of probes of a superseded registration are dropped
+        self.__generations: dict[str, int] = {}
+        self.__generation_count = 0
+        self.__health: dict[str, DeviceHealthDict] = {}
+        self.__running: dict[str, Future[bool]] = {}
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+        self.__executor: Optional[ThreadPoolExecutor] = None
+
+    def register(self, name: str, probe: Callable[[], bool], target: Optional[str] = None, interval: Optional[float] = None) -> None:
+        """
+        Parameters
+        ----------
+        name : str
+            Device name
+        probe : Callable[[], bool]
+            Function returning whether the device is reachable
+        target : Optional[str], optional
+            Address probed, Ex) IP address or VISA address. Cached health is kept when the same target is registered again,
+            Ex) at reload of settings. None always resets the health.
+        interval : Optional[float], optional
+            Probe interval of the device in s, the interval of the monitor when None
+        """
+        with self.__lock:
+            self.__probes[name] = probe
+            self.__intervals[name] = self.interval if interval is None else interval
+            if target is not None and name in self.__health and self.__targets.get(name) == target:
+                return
+            self.__targets[name] = target
+            self.__generation_count += 1
+            self.__generations[name] = self.__generation_count
+            self.__submitted_at.pop(name, None)
+            self.__health[name] = {"is_alive": False, "checked_at": None, "latency": None, "error": None}
+
+    def unregister(self, name: str) -> None:
+        with self.__lock:
+            self.__probes.pop(name, None)
+            self.__intervals.pop(name, None)
+            self.__submitted_at.pop(name, None)
+            self.__targets.pop(name, None)
+            self.__generations.pop(name, None)
+            self.__health.pop(name, None)
+
+    def start(self) -> None:
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop_event.clear()
+        self.__executor = ThreadPoolExecutor(thread_name_prefix="health")
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def __run(self) -> None:
+        while not self.__stop_event.is_set():
+            with self.__lock:
+                names = list(self.__probes.keys())
+            for name in names:
+                with self.__lock:
+                    is_probing = name in self.__running and not self.__running[name].done()
+                    is_due = time.monotonic() - self.__submitted_at.get(name, -float("inf")) >= self.__intervals.get(name, self.interval)
+                # Slow probe is not submitted again until it finishes
+                if not is_probing and is_due and self.__executor is not None:
+                    with self.__lock:
+                        self.__submitted_at[name] = time.monotonic()
+                    self.__running[name] = self.__executor.submit(self.probe_now, name)
+            self.__stop_event.wait(self.interval)
+
+    def probe_now(self, name: str) -> bool:
+        """
+        Check the device on the calling thread and update the cache
+        """
+        with self.__lock:
+            probe = self.__probes.get(name)
+            generation = self.__generations.get(name)
+        if probe is None:
+            return False
+
+        error: Optional[str] = None
+        time_start = time.perf_counter()
+        try:
+            is_alive = probe()
+        except Exception as e:
+            logger.error(e)
+            is_alive = False
+            error = str(e)
+        latency = time.perf_counter() - time_start
+
+        with self.__lock:
+            if generation is not None and self.__generations.get(name) == generation:
+                self.__health[name] = {"is_alive": is_alive, "checked_at": time.time(), "latency": latency, "error": error}
+        return is_alive
+
+    def is_alive(self, name: str) -> bool:
+        """
+        Cached reachability. The device is probed on the calling thread only when it has never been checked or the cache is stale,
+        for example when the monitor is not started. Devices probed less often than max_age are stale after two intervals.
+        """
+        with self.__lock:
+            health = self.__health.get(name)
+            max_age = max(self.max_age, 2 * self.__intervals.get(name, self.interval))
+        if health is None:
+            return False
+        checked_at = health["checked_at"]
+        if checked_at is None or time.time() - checked_at > max_age:
+            return self.probe_now(name)
+        return health["is_alive"]
+
+    def get(self, name: str) -> Optional[DeviceHealthDict]:
+        with self.__lock:
+            health = self.__health.get(name)
+            return None if health is None else health.copy()
+
+    def get_all(self) -> dict[str, DeviceHealthDict]:
+        with self.__lock:
+            return {name: health.copy() for name, health in self.__health.items()}
+
+
+health_monitor = HealthMonitor()
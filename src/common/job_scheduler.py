@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Literal, Optional, TypedDict
+from uuid import uuid4
+
+from src.common.logger import set_logger
+from src.common.tracing import tracer
+
+logger = set_logger(__name__)
+
+JOB_MAX_WORKERS = 4
+# Finished jobs are forgotten from the oldest when the number of jobs exceeds this
+JOB_MAX_HISTORY = 100
+
+JobState = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+FINISHED_STATES: tuple[JobState, ...] = ("succeeded", "failed", "cancelled")
+
+
+class JobStatusDict(TypedDict):
+    job_id: str
+    name: str
+    state: JobState
+    resources: list[str]
+    submitted_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    is_cancel_requested: bool
+    is_timed_out: bool
+    error: Optional[str]
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+class JobContext:
+    """
+    Passed to the job function for cooperative cancellation.
+    The job checks is_cancelled() between steps, or passes cancel_event to functions which accept it.
+    Cancellation is also requested when the timeout of the job has passed, by setting cancel_event from a timer,
+    so jobs waiting on cancel_event directly stop at the timeout too.
+    """
+
+    def __init__(self, job_id: str, timeout: Optional[float] = None) -> None:
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+        self.timeout = timeout
+        self.is_timed_out = False
+        self.__timer: Optional[threading.Timer] = None
+
+    def start(self) -> None:
+        """
+        Start the timeout, called when the job starts running
+        """
+        if self.timeout is not None:
+            self.__timer = threading.Timer(self.timeout, self.__time_out)
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def stop(self) -> None:
+        """
+        Stop the timeout, called when the job finishes
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+    def __time_out(self) -> None:
+        if not self.cancel_event.is_set():
+            self.is_timed_out = True
+            self.cancel_event.set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check(self) -> None:
+        """
+        Raise JobCancelledError if cancelled, for jobs which have no clean-up between steps
+        """
+        if self.is_cancelled():
+            raise JobCancelledError(self.job_id)
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        Sleep which returns early when cancelled
+
+        Returns
+        -------
+        bool
+            False if cancelled
+        """
+        self.cancel_event.wait(seconds)
+        return not self.is_cancelled()
+
+
+class Job:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[JobContext], Any],
+        resources: frozenset[str],
+        timeout: Optional[float] = None,
+        on_finish: Optional[Callable[[JobStatusDict], None]] = None,
+    ) -> None:
+        self.job_id = str(uuid4())
+        self.name = name
+        self.func = func
+        self.resources = resources
+        self.on_finish = on_finish
+        self.context = JobContext(job_id=self.job_id, timeout=timeout)
+        self.state: JobState = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done_event = threading.Event()
+        self.future: Optional[Future[None]] = None
+
+    def is_finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def get_status(self) -> JobStatusDict:
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "state": self.state,
+            "resources": sorted(self.resources),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "is_cancel_requested": self.context.cancel_event.is_set(),
+            "is_timed_out": self.context.is_timed_out,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """
+    Run long jobs on a bounded worker pool.
+    Each job reserves resources (instrument names) from submission until it finishes, and a job whose resources are
+    reserved by another job is rejected, so two jobs never drive the same instrument. Jobs over the pool size wait queued.
+    """
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, max_history: int = JOB_MAX_HISTORY) -> None:
+        self.max_workers = max_workers
+        self.max_history = max_history
+        self.__lock = threading.Lock()
+        self.__jobs: dict[str, Job] = {}
+        self.__reservations: dict[str, str] = {}
+        self.__executor: Optional[ThreadPoolExecutor] = None
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        # Worker threads are made at first submission
+        if self.__executor is None:
+            self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        return self.__executor
+
+    def submit(
+        self,
+        name: str,
+        func: Callable[[JobContext], Any],
+        resources: Iterable[str] = (),
+        timeout: Optional[float] = None,
+        on_finish: Optional[Callable[[JobStatusDict], None]] = None,
+    ) -> Optional[str]:
+        """
+        Parameters
+        ----------
+        name : str
+            Shown in status, Ex) "obs.get_obs_data"
+        func : Callable[[JobContext], Any]
+            Job function, the return value is kept as the result
+        resources : Iterable[str], optional
+            Names of instruments used by the job, Ex) ["power_sensor", "signal_analyzer"]
+        timeout : float, optional
+            Cancellation is requested when the job has run longer than this in s
+        on_finish : Callable[[JobStatusDict], None], optional
+            Called with the final status when the job finishes, also when it is cancelled before running.
+            Owners of jobs keep the status with it, because finished jobs are forgotten after max_history jobs.
+
+        Returns
+        -------
+        Optional[str]
+            Job ID, or None if some resources are reserved by another job
+        """
+        job = self.__submit(name=name, func=func, resources=resources, timeout=timeout, on_finish=on_finish)
+        return None if job is None else job.job_id
+
+    def submit_and_wait(
+        self, name: str, func: Callable[[JobContext], Any], resources: Iterable[str] = (), timeout: Optional[float] = None
+    ) -> tuple[Optional[JobStatusDict], Any]:
+        """
+        Run func as a job and wait for it, for synchronous endpoints which must hold the same reservations as jobs
+
+        Returns
+        -------
+        tuple[Optional[JobStatusDict], Any]
+            Status and result as get_result, status is None if some resources are reserved by another job
+        """
+        job = self.__submit(name=name, func=func, resources=resources, timeout=timeout, on_finish=None)
+        if job is None:
+            return None, None
+        job.done_event.wait()
+        return job.get_status(), job.result if job.state == "succeeded" else None
+
+    def __submit(
+        self,
+        name: str,
+        func: Callable[[JobContext], Any],
+        resources: Iterable[str],
+        timeout: Optional[float],
+        on_finish: Optional[Callable[[JobStatusDict], None]],
+    ) -> Optional[Job]:
+        job = Job(name=name, func=func, resources=frozenset(resources), timeout=timeout, on_finish=on_finish)
+        with self.__lock:
+            if any(resource in self.__reservations for resource in job.resources):
+                return None
+            for resource in job.resources:
+                self.__reservations[resource] = job.job_id
+            self.__jobs[job.job_id] = job
+            self.__forget_old_jobs()
+            job.future = self.__get_executor().submit(self.__run, job)
+        return job
+
+    def __forget_old_jobs(self) -> None:
+        finished_job_ids = [job_id for job_id, job in self.__jobs.items() if job.is_finished()]
+        for job_id in finished_job_ids[: max(0, len(self.__jobs) - self.max_history)]:
+            del self.__jobs[job_id]
+
+    def __run(self, job: Job) -> None:
+        with self.__lock:
+            if job.is_finished():
+                return
+            job.state = "running"
+            job.started_at = time.time()
+        job.context.start()
+
+        state: JobState = "succeeded"
+        try:
+            with tracer.span(f"job.{job.name}", category="job", job_id=job.job_id):
+                job.result = job.func(job.context)
+            if job.context.cancel_event.is_set():
+                state = "cancelled"
+        except JobCancelledError:
+            state = "cancelled"
+        except Exception as error:
+            logger.error(error)
+            job.error = str(error)
+            state = "failed"
+        finally:
+            job.context.stop()
+        self.__finish(job, state)
+
+    def __finish(self, job: Job, state: JobState) -> None:
+        with self.__lock:
+            job.state = state
+            job.finished_at = time.time()
+            for resource in job.resources:
+                if self.__reservations.get(resource) == job.job_id:
+                    del self.__reservations[resource]
+            status = job.get_status()
+        if job.on_finish is not None:
+            try:
+                job.on_finish(status)
+            except Exception as error:
+                logger.error(error)
+        job.done_event.set()
+
+    def cancel(self, job_id: str, timeout: Optional[float] = None) -> Optional[bool]:
+        """
+        Request cancellation. A queued job is cancelled immediately, a running job stops at its next check.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Wait for the job to stop in s, 0 does not wait and None waits without limit
+
+        Returns
+        -------
+        Optional[bool]
+            True if the job has finished, None if the job does not exist
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+        if job is None:
+            return None
+
+        job.context.cancel()
+        if job.future is not None and job.future.cancel():
+            self.__finish(job, "cancelled")
+        return job.done_event.wait(timeout)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[bool]:
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+        if job is None:
+            return None
+        return job.done_event.wait(timeout)
+
+    def is_active(self, job_id: Optional[str]) -> bool:
+        with self.__lock:
+            job = None if job_id is None else self.__jobs.get(job_id)
+            return job is not None and not job.is_finished()
+
+    def is_reserved(self, resource: str) -> bool:
+        with self.__lock:
+            return resource in self.__reservations
+
+    def get_reservations(self) -> dict[str, str]:
+        """
+        Resource name => job ID
+        """
+        with self.__lock:
+            return dict(self.__reservations)
+
+    def get_status(self, job_id: str) -> Optional[JobStatusDict]:
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            return None if job is None else job.get_status()
+
+    def get_result(self, job_id: str) -> tuple[Optional[JobStatusDict], Any]:
+        """
+        Returns
+        -------
+        tuple[Optional[JobStatusDict], Any]
+            Status and result, the result is None until the job succeeds
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None:
+                return None, None
+            return job.get_status(), job.result if job.state == "succeeded" else None
+
+    def get_all(self) -> list[JobStatusDict]:
+        with self.__lock:
+            return [job.get_status() for job in self.__jobs.values()]
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        Cancel every job and wait for running jobs
+        """
+        with self.__lock:
+            jobs = [job for job in self.__jobs.values() if not job.is_finished()]
+        for job in jobs:
+            self.cancel(job.job_id, timeout=0)
+        for job in jobs:
+            job.done_event.wait(timeout)
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+
+job_scheduler = JobScheduler()
@@ -1,11 +1,23 @@
+from __future__ import annotations
+
+import atexit
+import json
 import logging
-import os
+import queue
 import sys
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Optional
+
+import src.common.settings
 
 LOG_FORMAT = "[%(asctime)s] %(levelname)s - %(filename)s - %(name)s - %(funcName)s: %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 LOG_DIR_NAME = "logs"
+LOG_FILE_NAME = "api.log"
 
 if getattr(sys, "frozen", False):
     p_this_file = Path(sys.executable)
@@ -16,39 +28,114 @@ else:
 
 P_LOG_DIR = p_top / LOG_DIR_NAME
 MAX_LOG_COUNT = 20
+MAX_LOG_BYTES = 10 * 1024 * 1024
 
 
-def set_logger(name: str, is_active_stream: bool = False) -> logging.Logger:
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+class RotatingLogFileHandler(RotatingFileHandler):
+    """
+    Rotate the log file at midnight and also when it gets larger than max_bytes.
+    Rotated files are numbered like api.log.1 (newest) and files beyond backup_count are deleted on rotation.
+    """
 
-    if not P_LOG_DIR.exists():
-        P_LOG_DIR.mkdir()
+    def __init__(self, filename: Path, max_bytes: int = MAX_LOG_BYTES, backup_count: int = MAX_LOG_COUNT) -> None:
+        super().__init__(filename=filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.rollover_at = self.compute_rollover(time.time())
 
-    now_time = datetime.now()
-    formatter = logging.Formatter(LOG_FORMAT, "%Y-%m-%d %H:%M:%S")
+    @staticmethod
+    def compute_rollover(current_time: float) -> float:
+        tomorrow = datetime.fromtimestamp(current_time).date() + timedelta(days=1)
+        return datetime(tomorrow.year, tomorrow.month, tomorrow.day).timestamp()
 
-    # Setting for file output
-    fh = logging.FileHandler(filename=P_LOG_DIR / f"{now_time:log_%Y%m%d}.log", encoding="utf-8")
-    fh.setFormatter(formatter)
-    fh.setLevel(logging.INFO)
+    def shouldRollover(self, record: logging.LogRecord) -> int:  # noqa
+        if time.time() >= self.rollover_at:
+            return 1
+        return super().shouldRollover(record)
 
-    # Setting of console output
-    sh = logging.StreamHandler()
-    sh.setFormatter(formatter)
-    sh.setLevel(logging.DEBUG)
+    def doRollover(self) -> None:  # noqa
+        super().doRollover()
+        self.rollover_at = self.compute_rollover(time.time())
 
-    logger.addHandler(fh)
-    if is_active_stream:
-        logger.addHandler(sh)
 
-    return logger
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line for log collectors
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            {
+                "time": self.formatTime(record, LOG_DATE_FORMAT),
+                "level": record.levelname,
+                "file": record.filename,
+                "name": record.name,
+                "func": record.funcName,
+                "message": record.getMessage(),
+            },
+            ensure_ascii=False,
+        )
+
+
+# Loggers only put records into the queue and one listener thread does the file and console I/O
+log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+stream_logger_names: set[str] = set()
+listener_lock = threading.Lock()
+listener: Optional[QueueListener] = None
+
+
+def start_listener() -> None:
+    global listener
+    with listener_lock:
+        if listener is not None:
+            return
+
+        if not P_LOG_DIR.exists():
+            P_LOG_DIR.mkdir()
 
+        formatter: logging.Formatter
+        if src.common.settings.logger_is_json:
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
 
-def delete_backlog() -> None:
+        # Setting for file output
+        fh = RotatingLogFileHandler(filename=P_LOG_DIR / LOG_FILE_NAME)
+        fh.setFormatter(formatter)
+        fh.setLevel(logging.INFO)
 
-    files = sorted(P_LOG_DIR.glob("*.log"), key=lambda f: os.stat(f).st_mtime, reverse=False)
-    for i, file in enumerate(files, 1):
-        if i > len(files) - MAX_LOG_COUNT:
-            break
-        os.remove(file)
+        # Setting of console output, only for loggers made with is_active_stream
+        sh = logging.StreamHandler()
+        sh.setFormatter(formatter)
+        sh.setLevel(logging.DEBUG)
+        sh.addFilter(lambda record: record.name in stream_logger_names)
+
+        listener = QueueListener(log_queue, fh, sh, respect_handler_level=True)
+        listener.start()
+        atexit.register(stop_listener)
+
+
+def stop_listener() -> None:
+    """
+    Write out queued records and stop the listener thread
+    """
+    global listener
+    with listener_lock:
+        if listener is None:
+            return
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+def set_logger(name: str, is_active_stream: bool = False) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+
+    start_listener()
+    if is_active_stream:
+        stream_logger_names.add(name)
+
+    if not any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        logger.addHandler(QueueHandler(log_queue))
+
+    return logger
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, TypeVar, cast
+
+from src.common.tracing import tracer
+
+if TYPE_CHECKING:
+    from starlette.routing import BaseRoute
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+FuncType = TypeVar("FuncType", bound=Callable[..., Any])
+
+# Seconds, from a fast VISA query to a long SFTP download
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+UNMATCHED_ROUTE = "unmatched"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonically increasing value per label set
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.__lock = threading.Lock()
+        self.__values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.label_names)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        key = tuple(labels[name] for name in self.label_names)
+        with self.__lock:
+            return self.__values.get(key, 0)
+
+    def render(self) -> list[str]:
+        with self.__lock:
+            values = sorted(self.__values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in values:
+            lines.append(f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count per label set
+    """
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self.__lock = threading.Lock()
+        # Per label set: [count of each bucket (not cumulative) + overflow, sum]
+        self.__values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.__lock:
+            if key not in self.__values:
+                self.__values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            counts, total = self.__values[key]
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - time_start, **labels)
+
+    def get_count(self, **labels: str) -> int:
+        key = tuple(labels[name] for name in self.label_names)
+        with self.__lock:
+            return sum(self.__values[key][0]) if key in self.__values else 0
+
+    def render(self) -> list[str]:
+        with self.__lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self.__values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, ('le', format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP handlers",
+    ("method", "route", "status"),
+)
+http_response_bytes = Counter(
+    "http_response_bytes_total",
+    "Bytes of HTTP response bodies",
+    ("method", "route"),
+)
+device_operations = Counter(
+    "device_operations_total",
+    "Instrument and device operations",
+    ("interface", "operation", "status"),
+)
+device_operation_duration = Histogram(
+    "device_operation_duration_seconds",
+    "Latency of instrument and device operations",
+    ("interface", "operation"),
+)
+device_bytes = Counter(
+    "device_bytes_total",
+    "Bytes transferred with instruments and devices",
+    ("interface", "direction"),
+)
+
+METRICS: list[Counter | Histogram] = [http_request_duration, http_response_bytes, device_operations, device_operation_duration, device_bytes]
+
+
+@contextmanager
+def observe_operation(interface: str, operation: str) -> Iterator[None]:
+    """
+    Count, time and trace one device operation. It is counted as "error" when an exception is raised.
+    """
+    status = "error"
+    time_start = time.perf_counter()
+    try:
+        with tracer.span(f"{interface}.{operation}", category=interface):
+            yield
+        status = "ok"
+    finally:
+        device_operation_duration.observe(time.perf_counter() - time_start, interface=interface, operation=operation)
+        device_operations.inc(interface=interface, operation=operation, status=status)
+
+
+def measure(interface: str, operation: str) -> Callable[[FuncType], FuncType]:
+    """
+    Decorator version of observe_operation
+    """
+
+    def _measure(func: FuncType) -> FuncType:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with observe_operation(interface=interface, operation=operation):
+                return func(*args, **kwargs)
+
+        return cast(FuncType, wrapper)
+
+    return _measure
+
+
+def add_bytes(interface: str, direction: str, size: int) -> None:
+    """
+    direction: "tx" (sent to the device) or "rx" (received from the device)
+    """
+    if size > 0:
+        device_bytes.inc(size, interface=interface, direction=direction)
+
+
+def render_metrics() -> str:
+    """
+    Text exposition format of Prometheus
+    """
+    lines: list[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording handler latency per route template. Unknown paths are grouped into one series.
+    """
+
+    def __init__(self, app: ASGIApp, routes: list[BaseRoute]) -> None:
+        self.app = app
+        self.routes = routes
+        self.__route_paths: dict[Any, str] = {}
+
+    def get_route_path(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if endpoint not in self.__route_paths:
+            for route in self.routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    self.__route_paths[endpoint] = getattr(route, "path", UNMATCHED_ROUTE)
+                    break
+            else:
+                return UNMATCHED_ROUTE
+        return self.__route_paths[endpoint]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        time_start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self.get_route_path(scope)
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - time_start, method=method, route=route, status=str(status_code))
+            http_response_bytes.inc(body_size, method=method, route=route)
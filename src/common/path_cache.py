@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, TypedDict
+
+from src.common.general import resolve_path_shared_drives
+from src.common.logger import set_logger
+
+logger = set_logger(__name__)
+
+# Found paths are resolved again on the calling thread after this
+PATH_CACHE_TTL = 600  # s
+# Shorter for paths not found, so that a drive mounted later is found soon
+PATH_CACHE_NEGATIVE_TTL = 10  # s
+# Cached paths are resolved again in background at this interval, so lookups hit the cache
+PATH_CACHE_REFRESH_INTERVAL = 60  # s
+# Paths not looked up for this long are not refreshed and forgotten
+PATH_CACHE_IDLE_TIMEOUT = 3600  # s
+
+
+class PathCacheEntryDict(TypedDict):
+    result: Optional[Path]
+    resolved_at: float
+    used_at: float
+
+
+class PathResolutionCache:
+    """
+    Memoize resolution of paths on network drives, Path.exists() can block for seconds when the drive is cold.
+    Directories made by make_dir are also remembered, so repeated directory setup does not touch the drive.
+
+    Parameters
+    ----------
+    resolve : Callable[[str | Path], Optional[Path]]
+        Resolution of a path, None when not found
+    """
+
+    def __init__(
+        self,
+        resolve: Callable[[str | Path], Optional[Path]],
+        ttl: float = PATH_CACHE_TTL,
+        negative_ttl: float = PATH_CACHE_NEGATIVE_TTL,
+        refresh_interval: float = PATH_CACHE_REFRESH_INTERVAL,
+    ) -> None:
+        self.__resolve = resolve
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_interval = refresh_interval
+        self.__lock = threading.Lock()
+        self.__entries: dict[str, PathCacheEntryDict] = {}
+        self.__made_dirs: dict[str, float] = {}
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__run, name="path_cache", daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __is_fresh(self, entry: PathCacheEntryDict, now: float) -> bool:
+        ttl = self.ttl if entry["result"] is not None else self.negative_ttl
+        return now - entry["resolved_at"] <= ttl
+
+    def __resolve_now(self, key: str) -> Optional[Path]:
+        result = self.__resolve(key)
+        now = time.time()
+        with self.__lock:
+            used_at = self.__entries[key]["used_at"] if key in self.__entries else now
+            self.__entries[key] = {"result": result, "resolved_at": now, "used_at": used_at}
+        return result
+
+    def resolve(self, path: str | Path) -> Optional[Path]:
+        """
+        Cached resolution, the path is resolved on the calling thread only when it is not cached or the cache is expired
+        """
+        key = str(path)
+        now = time.time()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                entry["used_at"] = now
+                if self.__is_fresh(entry, now):
+                    return entry["result"]
+        return self.__resolve_now(key)
+
+    def make_dir(self, path: Path) -> None:
+        """
+        Make path with its parents unless it was made within ttl
+        """
+        key = str(path)
+        now = time.time()
+        with self.__lock:
+            made_at = self.__made_dirs.get(key)
+        if made_at is not None and now - made_at <= self.ttl:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        with self.__lock:
+            self.__made_dirs[key] = now
+
+    def invalidate(self, path: Optional[str | Path] = None) -> None:
+        """
+        Forget path, or everything without path
+        """
+        with self.__lock:
+            if path is None:
+                self.__entries.clear()
+                self.__made_dirs.clear()
+            else:
+                self.__entries.pop(str(path), None)
+                self.__made_dirs.pop(str(path), None)
+
+    def __run(self) -> None:
+        while not self.__stop_event.wait(self.refresh_interval):
+            now = time.time()
+            with self.__lock:
+                for key in [key for key, entry in self.__entries.items() if now - entry["used_at"] > PATH_CACHE_IDLE_TIMEOUT]:
+                    del self.__entries[key]
+                for key in [key for key, made_at in self.__made_dirs.items() if now - made_at > self.ttl]:
+                    del self.__made_dirs[key]
+                keys = list(self.__entries.keys())
+            for key in keys:
+                if self.__stop_event.is_set():
+                    return
+                try:
+                    self.__resolve_now(key)
+                except Exception as error:
+                    logger.error(error)
+
+
+shared_drives_cache = PathResolutionCache(resolve=resolve_path_shared_drives)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from src.common.logger import set_logger
+
+logger = set_logger(__name__)
+
+# Difference of process creation times regarded as the same process, the PID is reused otherwise
+PID_CREATE_TIME_TOLERANCE = 0.01  # s
+
+
+def scan_pids(name: str) -> list[int]:
+    """
+    Find python processes with name in the command line by walking all processes, slow on a busy PC
+    """
+    import psutil
+
+    pid_list: list[int] = []
+    for proc in psutil.process_iter():
+        try:
+            for c in proc.cmdline():
+                if name in str(c) and "python" in str(proc.exe()):
+                    pid_list.append(proc.pid)
+                    break
+        except (psutil.AccessDenied, psutil.NoSuchProcess, psutil.ZombieProcess):
+            pass
+    return pid_list
+
+
+class PidRegistry:
+    """
+    Each process of the API writes its PID to its own file in p_dir, so no lock is needed.
+    Files of processes which no longer exist are removed on lookup.
+
+    Parameters
+    ----------
+    p_dir : Path
+        Directory of the registry
+    name : str
+        Prefix of the files
+    """
+
+    def __init__(self, p_dir: Path, name: str) -> None:
+        self.p_dir = p_dir
+        self.name = name
+
+    def __get_path(self, pid: int) -> Path:
+        return self.p_dir / f"{self.name}_{pid}.json"
+
+    @staticmethod
+    def __get_create_time(pid: int) -> Optional[float]:
+        import psutil
+
+        try:
+            return psutil.Process(pid).create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def register(self, pid: Optional[int] = None) -> None:
+        """
+        Register pid, the current process without pid
+        """
+        pid = os.getpid() if pid is None else pid
+        self.p_dir.mkdir(parents=True, exist_ok=True)
+        p_file = self.__get_path(pid)
+        p_tmp = p_file.with_suffix(".tmp")
+        with open(p_tmp, "w") as f:
+            json.dump({"pid": pid, "create_time": self.__get_create_time(pid)}, f)
+        os.replace(p_tmp, p_file)
+
+    def register_parent(self) -> None:
+        """
+        Register the parent process when it is also a process of the API, Ex) a launcher or the reloader of uvicorn
+        """
+        import psutil
+
+        try:
+            parent = psutil.Process(os.getppid())
+            if any(self.name in str(c) for c in parent.cmdline()):
+                self.register(parent.pid)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+    def unregister(self, pid: Optional[int] = None) -> None:
+        pid = os.getpid() if pid is None else pid
+        self.__get_path(pid).unlink(missing_ok=True)
+
+    def get_pids(self) -> list[int]:
+        if not self.p_dir.exists():
+            return []
+        pid_list: list[int] = []
+        for p_file in sorted(self.p_dir.glob(f"{self.name}_*.json")):
+            try:
+                with open(p_file) as f:
+                    entry = json.load(f)
+                pid = int(entry["pid"])
+                create_time = self.__get_create_time(pid)
+                is_alive = create_time is not None and (
+                    entry["create_time"] is None or abs(create_time - float(entry["create_time"])) <= PID_CREATE_TIME_TOLERANCE
+                )
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                logger.error(f"{p_file}: {error}")
+                continue
+            if is_alive:
+                pid_list.append(pid)
+            else:
+                p_file.unlink(missing_ok=True)
+        return pid_list
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, Literal, Optional, Sequence
+
+from fastapi.responses import JSONResponse, Response
+
+ResponseFormat = Literal["json", "binary", "arrow"]
+ArrayDtype = Literal["float32", "float64"]
+
+MEDIA_TYPE_BINARY = "application/octet-stream"
+MEDIA_TYPE_ARROW = "application/vnd.apache.arrow.stream"
+# JSON list of {"name", "dtype", "offset", "length"} of the arrays in a binary body
+LAYOUT_HEADER = "X-Array-Layout"
+# JSON of the other fields of the response
+METADATA_HEADER = "X-Metadata"
+# Offsets of arrays in a binary body are multiples of this, so that Float64Array can view the body without copy
+ARRAY_ALIGNMENT = 8
+
+
+def replace_non_finite(value: Any) -> Any:
+    """
+    NaN and infinity in floats, dicts, lists and tuples => None, as orjson encodes them as null
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: replace_non_finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [replace_non_finite(item) for item in value]
+    return value
+
+
+def to_builtin(value: Any) -> Any:
+    """
+    default of json.dumps for numpy arrays and scalars
+    """
+    if hasattr(value, "tolist"):
+        return replace_non_finite(value.tolist())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON encoded by orjson, falls back to the standard encoder when orjson is not installed.
+    numpy arrays and scalars in content are encoded as lists and numbers by both, and NaN and infinity as null.
+    """
+
+    def render(self, content: Any) -> bytes:
+        try:
+            import orjson
+        except ImportError:
+            return json.dumps(replace_non_finite(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=to_builtin).encode(
+                "utf-8"
+            )
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def negotiate_format(response_format: Optional[str], accept: Optional[str]) -> ResponseFormat:
+    """
+    response_format given by the query has priority over Accept header, JSON is the default
+    """
+    if response_format is not None:
+        if response_format not in ("json", "binary", "arrow"):
+            raise ValueError(f"Not supported: format {response_format}")
+        return response_format  # type: ignore
+    if accept is not None:
+        if MEDIA_TYPE_ARROW in accept:
+            return "arrow"
+        if MEDIA_TYPE_BINARY in accept:
+            return "binary"
+    return "json"
+
+
+def encode_arrays(arrays: dict[str, tuple[Sequence[float], ArrayDtype]], metadata: dict[str, Any], response_format: ResponseFormat) -> Response:
+    """
+    Encode numeric arrays of a successful response.
+
+    - json: {"success": true, "data": {name: list}, **metadata}
+    - binary: little-endian arrays one after another, positions in X-Array-Layout header and metadata in X-Metadata header
+    - arrow: one record batch in Arrow IPC stream format with metadata in the schema, needs pyarrow package
+
+    Parameters
+    ----------
+    arrays : dict[str, tuple[Sequence[float], ArrayDtype]]
+        Values and dtype in binary and arrow for each name. Ex) frequency needs float64 not to lose resolution
+    metadata : dict[str, Any]
+        Other fields, Ex) stats
+    """
+    if response_format == "json":
+        return FastJSONResponse({"success": True, "data": {name: values for name, (values, _) in arrays.items()}, **metadata})
+
+    import numpy as np
+
+    if response_format == "binary":
+        buffers: list[bytes] = []
+        layout: list[dict[str, Any]] = []
+        offset = 0
+        for name, (values, dtype) in arrays.items():
+            array = np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+            padding = -offset % ARRAY_ALIGNMENT
+            buffers.append(bytes(padding))
+            offset += padding
+            layout.append({"name": name, "dtype": dtype, "offset": offset, "length": len(array)})
+            buffers.append(array.tobytes())
+            offset += array.nbytes
+        headers = {LAYOUT_HEADER: json.dumps(layout), METADATA_HEADER: json.dumps(metadata)}
+        return Response(content=b"".join(buffers), media_type=MEDIA_TYPE_BINARY, headers=headers)
+
+    try:
+        import pyarrow
+    except ImportError:
+        return FastJSONResponse({"success": False, "error": "Not installed: pyarrow"})
+
+    batch = pyarrow.record_batch(
+        [pyarrow.array(np.asarray(values, dtype=dtype)) for values, dtype in arrays.values()],
+        names=list(arrays.keys()),
+        metadata={"metadata": json.dumps(metadata)},
+    )
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=MEDIA_TYPE_ARROW)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import TYPE_CHECKING, Any, Optional
+
+from src.common.metrics import add_bytes, observe_operation
+
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+HEADERS_JSON = {"Content-Type": "application/json"}
+
+
+class RestClient:
+    """
+    Keep-alive HTTP client for REST control of a device.
+    One client shares a pool of TCP connections, so sequential commands do not open new connections.
+    Only connection errors are retried because commands like startRecording are not idempotent.
+    """
+
+    def __init__(self, ip_address: str, port: int, timeout: float = 1, retries: int = 1, pool_size: int = 4) -> None:
+        self.base_url = f"http://{ip_address}:{port}"
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.__session: Optional[requests.Session] = None
+
+    def __get_session(self) -> requests.Session:
+        # requests is imported at first request to shorten startup time
+        if self.__session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            retry = Retry(total=self.retries, connect=self.retries, read=0, redirect=0, status=0, backoff_factor=0.1)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+            session.mount("http://", adapter)
+            self.__session = session
+        return self.__session
+
+    def post(self, endpoint: str, payload: Optional[dict[str, Any]] = None, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None) -> int:
+        """
+        Returns
+        -------
+        int
+            HTTP status code, -1 when the device cannot be connected
+        """
+        response = self.post_response(endpoint=endpoint, payload=payload, headers=headers, timeout=timeout)
+        if response is None:
+            return -1
+        return response.status_code
+
+    def post_response(
+        self, endpoint: str, payload: Optional[dict[str, Any]] = None, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None
+    ) -> Optional[requests.Response]:
+        import requests
+
+        url = f"{self.base_url}/{endpoint}"
+        data = json.dumps(payload) if payload is not None else None
+        try:
+            with observe_operation(interface="rest", operation="post"):
+                response = self.__get_session().post(url=url, data=data, headers=headers, timeout=self.timeout if timeout is None else timeout)
+        except requests.exceptions.ConnectionError:
+            return None
+        add_bytes(interface="rest", direction="tx", size=0 if data is None else len(data))
+        add_bytes(interface="rest", direction="rx", size=len(response.content))
+        return response
+
+    def get_response(self, endpoint: str, timeout: Optional[float] = None) -> Optional[requests.Response]:
+        import requests
+
+        url = f"{self.base_url}/{endpoint}"
+        try:
+            with observe_operation(interface="rest", operation="get"):
+                response = self.__get_session().get(url=url, timeout=self.timeout if timeout is None else timeout)
+        except requests.exceptions.ConnectionError:
+            return None
+        add_bytes(interface="rest", direction="rx", size=len(response.content))
+        return response
+
+    def close(self) -> None:
+        if self.__session is not None:
+            self.__session.close()
+            self.__session = None
+
+
+class AsyncRestClient:
+    """
+    asyncio version of RestClient for async endpoints.
+    httpx.AsyncClient is made at first request, so it is bound to the running event loop.
+    Use close in async code and close_soon from synchronous code or other threads.
+    """
+
+    def __init__(self, ip_address: str, port: int, timeout: float = 1, retries: int = 1, pool_size: int = 4) -> None:
+        self.base_url = f"http://{ip_address}:{port}"
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.__client: Optional[httpx.AsyncClient] = None
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __get_client(self) -> httpx.AsyncClient:
+        if self.__client is None:
+            import httpx
+
+            self.__loop = asyncio.get_running_loop()
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            transport = httpx.AsyncHTTPTransport(retries=self.retries, limits=limits)
+            self.__client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, transport=transport)
+        return self.__client
+
+    async def post(
+        self, endpoint: str, payload: Optional[dict[str, Any]] = None, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None
+    ) -> int:
+        """
+        Returns
+        -------
+        int
+            HTTP status code, -1 when the device cannot be connected
+        """
+        response = await self.post_response(endpoint=endpoint, payload=payload, headers=headers, timeout=timeout)
+        if response is None:
+            return -1
+        return response.status_code
+
+    async def post_response(
+        self, endpoint: str, payload: Optional[dict[str, Any]] = None, headers: Optional[dict[str, str]] = None, timeout: Optional[float] = None
+    ) -> Optional[httpx.Response]:
+        import httpx
+
+        content = json.dumps(payload) if payload is not None else None
+        try:
+            with observe_operation(interface="rest", operation="post"):
+                response = await self.__get_client().post(
+                    url=f"/{endpoint}", content=content, headers=headers, timeout=self.timeout if timeout is None else timeout
+                )
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            return None
+        add_bytes(interface="rest", direction="tx", size=0 if content is None else len(content))
+        add_bytes(interface="rest", direction="rx", size=len(response.content))
+        return response
+
+    async def get_response(self, endpoint: str, timeout: Optional[float] = None) -> Optional[httpx.Response]:
+        import httpx
+
+        try:
+            with observe_operation(interface="rest", operation="get"):
+                response = await self.__get_client().get(url=f"/{endpoint}", timeout=self.timeout if timeout is None else timeout)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            return None
+        add_bytes(interface="rest", direction="rx", size=len(response.content))
+        return response
+
+    async def close(self) -> None:
+        if self.__client is not None:
+            await self.__client.aclose()
+            self.__client = None
+
+    def close_soon(self) -> None:
+        """
+        Schedule closing of the client on the event loop which made it, without waiting
+        """
+        client, loop = self.__client, self.__loop
+        self.__client = None
+        if client is not None and loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
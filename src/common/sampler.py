@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+import statistics
+import threading
+import time
+from typing import Callable, Optional, TypedDict
+
+# A deadline passed by more than this ratio of the interval is skipped as missed, a later one is sampled late
+SAMPLER_LATE_TOLERANCE = 0.5
+
+
+class SampledDataDict(TypedDict):
+    # Deadline of each sample from the start, always on the grid of the interval
+    time: list[float]
+    # Just before and after the query, from the start
+    request_time: list[float]
+    response_time: list[float]
+    value: list[float]
+
+
+class SamplerStatsDict(TypedDict):
+    interval: float
+    deadline_count: int
+    sample_count: int
+    missed_count: int
+    error_count: int
+    mean_lateness: Optional[float]
+    max_lateness: Optional[float]
+    mean_latency: Optional[float]
+    max_latency: Optional[float]
+
+
+class PeriodicSampler:
+    """
+    Call func on monotonic deadlines at start + k * interval.
+    Deadlines do not depend on when the previous query returned, so query latency does not make the period drift.
+    When a query overruns following deadlines, they are counted as missed and skipped instead of sampling in a burst,
+    so the time of each sample stays on the uniform grid.
+
+    Parameters
+    ----------
+    func : Callable[[], Optional[float]]
+        Query of the instrument, None is counted as an error
+    interval : float
+        Period in s
+    """
+
+    def __init__(self, func: Callable[[], Optional[float]], interval: float) -> None:
+        self.func = func
+        self.interval = interval
+
+    def run(
+        self, duration: float, cancel_event: Optional[threading.Event] = None, on_sample: Optional[Callable[[Optional[float]], None]] = None
+    ) -> tuple[SampledDataDict, SamplerStatsDict]:
+        """
+        Sample from 0 to duration s, both included, until cancel_event is set.
+        on_sample is called with every response including None.
+        """
+        cancel_event = threading.Event() if cancel_event is None else cancel_event
+        data: SampledDataDict = {"time": [], "request_time": [], "response_time": [], "value": []}
+        latenesses: list[float] = []
+        latencies: list[float] = []
+        deadline_count = 0
+        missed_count = 0
+        error_count = 0
+
+        # Small margin so that the deadline at duration is not lost by rounding
+        last_index = math.floor(duration / self.interval + 1e-9)
+        time_start = time.perf_counter()
+        index = 0
+        while index <= last_index:
+            # Rounded so that times in CSV are exactly on the grid, Ex) 0.3 instead of 0.30000000000000004
+            deadline = round(index * self.interval, 9)
+            if cancel_event.wait(max(deadline - (time.perf_counter() - time_start), 0)):
+                break
+
+            request_time = time.perf_counter() - time_start
+            value = self.func()
+            response_time = time.perf_counter() - time_start
+            deadline_count += 1
+            latenesses.append(request_time - deadline)
+            latencies.append(response_time - request_time)
+            if on_sample is not None:
+                on_sample(value)
+            if value is None:
+                error_count += 1
+            else:
+                data["time"].append(deadline)
+                data["request_time"].append(request_time)
+                data["response_time"].append(response_time)
+                data["value"].append(value)
+
+            next_index = max(index + 1, math.ceil(response_time / self.interval - SAMPLER_LATE_TOLERANCE))
+            missed_count += min(next_index, last_index + 1) - index - 1
+            index = next_index
+
+        stats: SamplerStatsDict = {
+            "interval": self.interval,
+            "deadline_count": deadline_count + missed_count,
+            "sample_count": len(data["value"]),
+            "missed_count": missed_count,
+            "error_count": error_count,
+            "mean_lateness": statistics.mean(latenesses) if len(latenesses) > 0 else None,
+            "max_lateness": max(latenesses) if len(latenesses) > 0 else None,
+            "mean_latency": statistics.mean(latencies) if len(latencies) > 0 else None,
+            "max_latency": max(latencies) if len(latencies) > 0 else None,
+        }
+        return data, stats
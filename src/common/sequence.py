@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Literal, Optional, Type, TypedDict
+
+from pydantic import BaseModel
+
+from src.common.job_scheduler import JobContext
+from src.common.logger import set_logger
+from src.common.tracing import tracer
+
+logger = set_logger(__name__)
+
+SEQUENCE_MAX_STEPS = 100
+
+StepState = Literal["pending", "running", "succeeded", "failed", "skipped", "cancelled"]
+
+
+class SequenceStep(BaseModel):
+    name: str
+    action: str
+    params: Dict[str, Any] = {}
+    # Names of steps which must succeed before this step
+    after: List[str] = []
+    # Earliest start in s from the start of the sequence
+    at: Optional[float] = None
+    # Wait in s after the steps in after finished
+    delay: float = 0
+    # The step fails instead of starting later than planned by more than this in s
+    max_lateness: Optional[float] = None
+    # The step fails when the action takes longer than this in s. The action itself is not interrupted,
+    # and the sequence finishes after the action returns, so its resources stay reserved until then
+    timeout: Optional[float] = None
+
+
+class SequenceDefinition(BaseModel):
+    name: str = "sequence"
+    steps: List[SequenceStep]
+    # Steps which have not started yet are skipped after a failure
+    stop_on_error: bool = True
+
+
+class SequenceActionDict(TypedDict):
+    func: Callable[[Any, JobContext], Any]
+    params_model: Optional[Type[BaseModel]]
+    resources: list[str]
+
+
+class StepStatusDict(TypedDict):
+    name: str
+    action: str
+    state: StepState
+    planned_start: Optional[float]
+    start: Optional[float]
+    end: Optional[float]
+    lateness: Optional[float]
+    # True while the action is called, which continues after the step failed by timeout
+    is_action_running: bool
+    result: Any
+    error: Optional[str]
+
+
+class SequenceStatusDict(TypedDict):
+    name: str
+    is_running: bool
+    elapsed: Optional[float]
+    steps: list[StepStatusDict]
+
+
+class SequenceError(Exception):
+    pass
+
+
+def parse_sequence(text: str, is_yaml: bool = False) -> SequenceDefinition:
+    """
+    Parse a sequence in JSON or YAML. YAML needs PyYAML package.
+    """
+    if is_yaml:
+        try:
+            import yaml
+        except ImportError:
+            raise SequenceError("Not installed: PyYAML") from None
+
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as error:
+            raise SequenceError(str(error)) from error
+    else:
+        data = json.loads(text)
+    return SequenceDefinition.parse_obj(data)
+
+
+def sort_steps(steps: list[SequenceStep]) -> list[SequenceStep]:
+    """
+    Topological order of steps, raise SequenceError for unknown or circular dependencies
+    """
+    steps_by_name = {step.name: step for step in steps}
+    if len(steps_by_name) != len(steps):
+        raise SequenceError("Step names are not unique")
+    for step in steps:
+        for name in step.after:
+            if name not in steps_by_name:
+                raise SequenceError(f"Not exist: step {name} in after of {step.name}")
+
+    sorted_steps: list[SequenceStep] = []
+    visiting: set[str] = set()
+    visited: set[str] = set()
+
+    def visit(step: SequenceStep) -> None:
+        if step.name in visited:
+            return
+        if step.name in visiting:
+            raise SequenceError(f"Circular dependency: {step.name}")
+        visiting.add(step.name)
+        for name in step.after:
+            visit(steps_by_name[name])
+        visiting.remove(step.name)
+        visited.add(step.name)
+        sorted_steps.append(step)
+
+    for step in steps:
+        visit(step)
+    return sorted_steps
+
+
+class SequenceRun:
+    """
+    Run steps of a sequence as one job of job_scheduler.
+    Each step has its own thread, so independent steps run concurrently and start on time,
+    and a step starts when the steps in after succeeded and both at and delay have passed.
+    Planned and actual start times are kept for each step to check timing.
+    """
+
+    def __init__(self, definition: SequenceDefinition, actions: dict[str, SequenceActionDict]) -> None:
+        if len(definition.steps) > SEQUENCE_MAX_STEPS:
+            raise SequenceError(f"Too many steps: {len(definition.steps)} > {SEQUENCE_MAX_STEPS}")
+        self.name = definition.name
+        self.stop_on_error = definition.stop_on_error
+        self.steps = sort_steps(definition.steps)
+        self.__actions = actions
+        self.__params: dict[str, Any] = {}
+        for step in self.steps:
+            action = actions.get(step.action)
+            if action is None:
+                raise SequenceError(f"Not supported: action {step.action} in {step.name}")
+            params_model = action["params_model"]
+            # Parameters are validated before the sequence starts
+            self.__params[step.name] = step.params if params_model is None else params_model.parse_obj(step.params)
+
+        self.__lock = threading.Lock()
+        self.__status: dict[str, StepStatusDict] = {
+            step.name: {
+                "name": step.name,
+                "action": step.action,
+                "state": "pending",
+                "planned_start": None,
+                "start": None,
+                "end": None,
+                "lateness": None,
+                "is_action_running": False,
+                "result": None,
+                "error": None,
+            }
+            for step in self.steps
+        }
+        self.__done_events = {step.name: threading.Event() for step in self.steps}
+        self.__failed_event = threading.Event()
+        # Threads of actions with timeout, joined before the sequence finishes
+        self.__action_threads: list[threading.Thread] = []
+        self.__time_start: Optional[float] = None
+        self.__time_end: Optional[float] = None
+
+    def get_resources(self) -> list[str]:
+        return sorted({resource for step in self.steps for resource in self.__actions[step.action]["resources"]})
+
+    def __elapsed(self) -> float:
+        return 0.0 if self.__time_start is None else time.perf_counter() - self.__time_start
+
+    def __update(self, name: str, **kwargs: Any) -> None:
+        with self.__lock:
+            self.__status[name].update(kwargs)  # type: ignore
+
+    def __finish(self, name: str, state: StepState, error: Optional[str] = None) -> None:
+        self.__update(name, state=state, end=self.__elapsed(), error=error)
+        if state == "failed":
+            self.__failed_event.set()
+
+    def __call_action(self, step: SequenceStep, context: JobContext) -> Any:
+        action = self.__actions[step.action]
+        params = self.__params[step.name]
+        self.__update(step.name, is_action_running=True)
+        if step.timeout is None:
+            try:
+                return action["func"](params, context)
+            finally:
+                self.__update(step.name, is_action_running=False)
+
+        results: dict[str, Any] = {}
+
+        def target() -> None:
+            try:
+                results["result"] = action["func"](params, context)
+            except Exception as error:
+                results["error"] = error
+            finally:
+                self.__update(step.name, is_action_running=False)
+
+        thread = threading.Thread(target=target, name=f"sequence_{step.name}_action", daemon=True)
+        with self.__lock:
+            self.__action_threads.append(thread)
+        thread.start()
+        thread.join(step.timeout)
+        if thread.is_alive():
+            raise TimeoutError(f"Timeout: {step.timeout} s, the action is still running")
+        if "error" in results:
+            raise results["error"]
+        return results.get("result")
+
+    def __run_step(self, step: SequenceStep, context: JobContext) -> None:
+        try:
+            for name in step.after:
+                self.__done_events[name].wait()
+            with self.__lock:
+                dependency_states = [self.__status[name]["state"] for name in step.after]
+                dependency_ends = [self.__status[name]["end"] or 0.0 for name in step.after]
+            if any(state != "succeeded" for state in dependency_states):
+                self.__finish(step.name, "skipped")
+                return
+
+            planned_start = max([step.at or 0.0] + [end + step.delay for end in dependency_ends])
+            self.__update(step.name, planned_start=planned_start)
+            if context.cancel_event.wait(max(planned_start - self.__elapsed(), 0)) or context.is_cancelled():
+                self.__finish(step.name, "cancelled")
+                return
+            if self.stop_on_error and self.__failed_event.is_set():
+                self.__finish(step.name, "skipped")
+                return
+
+            start = self.__elapsed()
+            lateness = start - planned_start
+            self.__update(step.name, state="running", start=start, lateness=lateness)
+            if step.max_lateness is not None and lateness > step.max_lateness:
+                self.__finish(step.name, "failed", error=f"Late: {lateness:.3f} s > {step.max_lateness} s")
+                return
+
+            with tracer.span(f"sequence.{step.action}", category="sequence", step=step.name):
+                result = self.__call_action(step, context)
+            self.__update(step.name, result=None if isinstance(result, bool) else result)
+            if result is False:
+                self.__finish(step.name, "failed", error="Action returned false")
+            else:
+                self.__finish(step.name, "succeeded")
+        except Exception as error:
+            logger.error(error)
+            self.__finish(step.name, "failed", error=str(error))
+        finally:
+            self.__done_events[step.name].set()
+
+    def run(self, context: JobContext) -> SequenceStatusDict:
+        """
+        Job function, raise SequenceError if any step failed so that the job fails.
+        Returns after actions which timed out have returned, so the job keeps their resources reserved until then.
+        """
+        self.__time_start = time.perf_counter()
+        threads = [threading.Thread(target=self.__run_step, args=(step, context), name=f"sequence_{step.name}", daemon=True) for step in self.steps]
+        with tracer.span(f"sequence.{self.name}", category="sequence"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with self.__lock:
+                action_threads = list(self.__action_threads)
+            for thread in action_threads:
+                thread.join()
+        self.__time_end = time.perf_counter()
+
+        status = self.get_status()
+        failed_steps = [step["name"] for step in status["steps"] if step["state"] == "failed"]
+        if len(failed_steps) > 0:
+            raise SequenceError(f"Failed steps: {', '.join(failed_steps)}")
+        return status
+
+    def get_status(self) -> SequenceStatusDict:
+        with self.__lock:
+            steps = [self.__status[step.name].copy() for step in self.steps]
+        if self.__time_start is None:
+            elapsed = None
+        elif self.__time_end is None:
+            elapsed = self.__elapsed()
+        else:
+            elapsed = self.__time_end - self.__time_start
+        return {
+            "name": self.name,
+            "is_running": self.__time_start is not None and self.__time_end is None,
+            "elapsed": elapsed,
+            "steps": steps,  # type: ignore
+        }
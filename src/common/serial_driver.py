@@ -2,23 +2,26 @@ from __future__ import annotations
 
 import re
 import struct
-from typing import Optional
-
-import serial
-from serial.serialutil import SerialTimeoutException
+from typing import TYPE_CHECKING, Optional
 
 import src.common.settings
 from src.common.logger import set_logger
+from src.common.metrics import add_bytes, observe_operation
+
+if TYPE_CHECKING:
+    import serial
 
 LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
 logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
 
 COM_PATTERN = r"COM([1-9]+)([0-9]?)"
+# Serial devices on Linux, including pty of the simulators
+DEV_PATTERN = r"/dev/[A-Za-z0-9_./-]+"
 
 
 class SerialDriver:
     def __init__(self) -> None:
-        self.__ser = None
+        self.__ser: Optional[serial.Serial] = None
         self.__is_connection_error = False
 
     def set_port(
@@ -32,9 +35,13 @@ class SerialDriver:
         write_timeout: float = 1,
         txrx_size: int = 4096,
     ) -> bool:
+        # pyserial is imported at first connection to shorten startup time
+        import serial
 
-        regex_pattern = re.compile(COM_PATTERN)
-        if regex_pattern.fullmatch(port) is None:
+        # COM port names are case-insensitive, device paths are not
+        if re.fullmatch(COM_PATTERN, port.upper()) is not None:
+            port = port.upper()
+        elif re.fullmatch(DEV_PATTERN, port) is None:
             return False
 
         if self.__ser is not None and self.__ser.is_open:
@@ -48,7 +55,8 @@ class SerialDriver:
             timeout=timeout,
             writeTimeout=write_timeout,
         )
-        if self.__ser is not None:
+        # Buffer size can be set only on Windows
+        if self.__ser is not None and hasattr(self.__ser, "set_buffer_size"):
             self.__ser.set_buffer_size(rx_size=txrx_size, tx_size=txrx_size)
 
         return True
@@ -58,6 +66,7 @@ class SerialDriver:
             self.__ser.close()
 
     def send_binary_array(self, data: list[int]) -> None:
+        from serial.serialutil import SerialTimeoutException
 
         if self.__ser is None:
             self.__is_connection_error = False
@@ -67,15 +76,19 @@ class SerialDriver:
                 if self.__ser.out_waiting == 0:
                     break
             try:
-                for c in data:
-                    self.__ser.write(struct.pack("B", c))
+                with observe_operation(interface="serial", operation="send_binary_array"):
+                    for c in data:
+                        self.__ser.write(struct.pack("B", c))
+                    self.__ser.flush()
+                add_bytes(interface="serial", direction="tx", size=len(data))
                 self.__is_connection_error = False
-                self.__ser.flush()
             except SerialTimeoutException:
                 self.__is_connection_error = True
                 logger.error("Serial write timeout!")
 
     def send_ascii(self, data: str, termination: str = "\r\n") -> None:
+        from serial.serialutil import SerialTimeoutException
+
         if self.__ser is None:
             self.__is_connection_error = False
             logger.error("Serial is None!")
@@ -84,14 +97,17 @@ class SerialDriver:
                 if self.__ser.out_waiting == 0:
                     break
             try:
-                self.__ser.write((data + termination).encode())
+                with observe_operation(interface="serial", operation="send_ascii"):
+                    size = self.__ser.write((data + termination).encode())
+                    self.__ser.flush()
+                add_bytes(interface="serial", direction="tx", size=size or 0)
                 self.__is_connection_error = False
-                self.__ser.flush()
             except SerialTimeoutException:
                 self.__is_connection_error = True
                 logger.error("Serial write timeout!")
 
     def receive_binary(self) -> Optional[str]:
+        from serial.serialutil import SerialTimeoutException
 
         if self.__ser is None:
             self.__is_connection_error = False
@@ -103,7 +119,9 @@ class SerialDriver:
                     if self.__ser.in_waiting > 0:
                         break
 
-                data_bytes: bytes = self.__ser.read(self.__ser.in_waiting)
+                with observe_operation(interface="serial", operation="receive_binary"):
+                    data_bytes: bytes = self.__ser.read(self.__ser.in_waiting)
+                add_bytes(interface="serial", direction="rx", size=len(data_bytes))
                 self.__is_connection_error = False
                 return data_bytes.hex()
             except struct.error:
@@ -114,6 +132,8 @@ class SerialDriver:
                 return None
 
     def receive_ascii(self) -> Optional[str]:
+        from serial.serialutil import SerialTimeoutException
+
         if self.__ser is None:
             self.__is_connection_error = False
             logger.error("Serial is None!")
@@ -124,8 +144,11 @@ class SerialDriver:
                     if self.__ser.in_waiting > 0:
                         break
 
+                with observe_operation(interface="serial", operation="receive_ascii"):
+                    data_bytes = self.__ser.read(self.__ser.in_waiting)
+                add_bytes(interface="serial", direction="rx", size=len(data_bytes))
                 self.__is_connection_error = False
-                return self.__ser.read(self.__ser.in_waiting).decode()
+                return data_bytes.decode()
 
             except SerialTimeoutException:
                 self.__is_connection_error = True
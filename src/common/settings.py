@@ -29,3 +29,24 @@ connect_signal_analyzer = True
 CONNECT_SIGNAL_ANALYZER = os.getenv("CONNECT_SIGNAL_ANALYZER")
 if CONNECT_SIGNAL_ANALYZER is not None and CONNECT_SIGNAL_ANALYZER.lower() == "false":
     connect_signal_analyzer = False
+
+logger_is_json = False
+LOGGER_IS_JSON = os.getenv("LOGGER_IS_JSON")
+if LOGGER_IS_JSON is not None and LOGGER_IS_JSON.lower() == "true":
+    logger_is_json = True
+
+sync_staging_path = p_parent / ".staging"
+SYNC_STAGING_PATH = os.getenv("SYNC_STAGING_PATH")
+if SYNC_STAGING_PATH is not None:
+    sync_staging_path = Path(SYNC_STAGING_PATH)
+
+# Bandwidth limit of uploads to shared drives, 0 is no limit
+sync_max_bytes_per_second = 10 * 1024 * 1024
+SYNC_MAX_BYTES_PER_SECOND = os.getenv("SYNC_MAX_BYTES_PER_SECOND")
+if SYNC_MAX_BYTES_PER_SECOND is not None:
+    sync_max_bytes_per_second = int(SYNC_MAX_BYTES_PER_SECOND)
+
+pid_registry_path = p_parent / ".pids"
+PID_REGISTRY_PATH = os.getenv("PID_REGISTRY_PATH")
+if PID_REGISTRY_PATH is not None:
+    pid_registry_path = Path(PID_REGISTRY_PATH)
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, TypedDict
+
+import src.common.settings
+from src.common.logger import set_logger
+from src.common.tracing import tracer
+
+logger = set_logger(__name__)
+
+SYNC_DB_NAME = "sync_queue.sqlite3"
+SYNC_CHUNK_SIZE = 1024 * 1024
+SYNC_POLL_INTERVAL = 1  # s
+# Retries wait SYNC_RETRY_INTERVAL * 2 ** (attempts - 1) s up to SYNC_RETRY_INTERVAL_MAX s
+SYNC_RETRY_INTERVAL = 5  # s
+SYNC_RETRY_INTERVAL_MAX = 300  # s
+SYNC_MAX_ATTEMPTS = 10
+SYNC_PART_SUFFIX = ".part"
+
+
+class SyncBacklogDict(TypedDict):
+    pending_count: int
+    pending_bytes: int
+    failed_count: int
+    oldest_pending_age: Optional[float]
+    uploading: Optional[str]
+    uploaded_count: int
+    uploaded_bytes: int
+    max_bytes_per_second: int
+    last_error: Optional[str]
+
+
+class SyncItemDict(TypedDict):
+    id: int
+    local_path: str
+    dest_path: str
+    size: int
+    mtime_ns: int
+    enqueued_at: float
+    attempts: int
+
+
+class SyncUploader:
+    """
+    Results are written to a local staging directory first and copied to the shared drive in one background thread.
+    The queue is kept in SQLite in the staging directory, so files not uploaded yet are uploaded after a restart.
+    A local file is deleted after its upload.
+
+    Parameters
+    ----------
+    p_staging : Path
+        Local staging directory, the shared drive path without its drive is reproduced under it
+    max_bytes_per_second : int
+        Bandwidth limit of uploads, 0 is no limit
+    """
+
+    def __init__(self, p_staging: Path, max_bytes_per_second: int = 0) -> None:
+        self.p_staging = p_staging
+        self.max_bytes_per_second = max_bytes_per_second
+        self.__lock = threading.Lock()
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__stop_event = threading.Event()
+        self.__wake_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+        self.__uploading: Optional[str] = None
+        self.__uploaded_count = 0
+        self.__uploaded_bytes = 0
+        self.__last_error: Optional[str] = None
+        self.__next_send_time = 0.0
+
+    def __get_connection(self) -> sqlite3.Connection:
+        """
+        Opened at first use, call with self.__lock
+        """
+        if self.__connection is None:
+            self.p_staging.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.p_staging / SYNC_DB_NAME), check_same_thread=False)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync_queue ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "local_path TEXT NOT NULL UNIQUE, "
+                "dest_path TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, "
+                "enqueued_at REAL NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_try REAL NOT NULL, "
+                "state TEXT NOT NULL DEFAULT 'pending', "
+                "error TEXT)"
+            )
+            connection.commit()
+            self.__connection = connection
+        return self.__connection
+
+    def start(self) -> None:
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__run, name="sync_uploader", daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        The file being uploaded is aborted and stays in the queue
+        """
+        self.__stop_event.set()
+        self.__wake_event.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout=timeout)
+            self.__thread = None
+
+    def stage_path(self, p_dest: Path) -> Path:
+        """
+        Local path where a file or a directory for p_dest is written, its parent directory is made
+        """
+        parts = p_dest.parts[1:] if p_dest.anchor else p_dest.parts
+        p_local = self.p_staging.joinpath(*parts)
+        p_local.parent.mkdir(parents=True, exist_ok=True)
+        return p_local
+
+    def enqueue(self, p_dest: Path) -> int:
+        """
+        Queue the staged file of p_dest, or all files in it for a directory.
+        A file queued again before its upload is uploaded once with the latest content.
+
+        Returns
+        -------
+        int
+            Number of queued files
+        """
+        p_local = self.stage_path(p_dest)
+        if p_local.is_dir():
+            files = [(p, p_dest / p.relative_to(p_local)) for p in sorted(p_local.rglob("*")) if p.is_file() and p.suffix != SYNC_PART_SUFFIX]
+        elif p_local.is_file():
+            files = [(p_local, p_dest)]
+        else:
+            logger.error(f"Not exist: staged {p_local}")
+            return 0
+
+        now = time.time()
+        with self.__lock:
+            connection = self.__get_connection()
+            connection.executemany(
+                "INSERT INTO sync_queue (local_path, dest_path, size, mtime_ns, enqueued_at, next_try) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(local_path) DO UPDATE SET dest_path = excluded.dest_path, size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "enqueued_at = excluded.enqueued_at, attempts = 0, next_try = excluded.next_try, state = 'pending', error = NULL",
+                [(str(p_from), str(p_to), p_from.stat().st_size, p_from.stat().st_mtime_ns, now, now) for p_from, p_to in files],
+            )
+            connection.commit()
+        self.__wake_event.set()
+        return len(files)
+
+    def retry_failed(self) -> int:
+        """
+        Queue again the files which failed SYNC_MAX_ATTEMPTS times
+        """
+        with self.__lock:
+            connection = self.__get_connection()
+            cursor = connection.execute("UPDATE sync_queue SET state = 'pending', attempts = 0, next_try = ? WHERE state = 'failed'", (time.time(),))
+            connection.commit()
+        self.__wake_event.set()
+        return cursor.rowcount
+
+    def get_backlog(self) -> SyncBacklogDict:
+        with self.__lock:
+            connection = self.__get_connection()
+            pending_count, pending_bytes, oldest = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(enqueued_at) FROM sync_queue WHERE state = 'pending'"
+            ).fetchone()
+            (failed_count,) = connection.execute("SELECT COUNT(*) FROM sync_queue WHERE state = 'failed'").fetchone()
+            return {
+                "pending_count": pending_count,
+                "pending_bytes": pending_bytes,
+                "failed_count": failed_count,
+                "oldest_pending_age": None if oldest is None else time.time() - oldest,
+                "uploading": self.__uploading,
+                "uploaded_count": self.__uploaded_count,
+                "uploaded_bytes": self.__uploaded_bytes,
+                "max_bytes_per_second": self.max_bytes_per_second,
+                "last_error": self.__last_error,
+            }
+
+    def __get_next_item(self) -> Optional[SyncItemDict]:
+        with self.__lock:
+            row = (
+                self.__get_connection()
+                .execute(
+                    "SELECT id, local_path, dest_path, size, mtime_ns, enqueued_at, attempts FROM sync_queue "
+                    "WHERE state = 'pending' AND next_try <= ? ORDER BY id LIMIT 1",
+                    (time.time(),),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        return {"id": row[0], "local_path": row[1], "dest_path": row[2], "size": row[3], "mtime_ns": row[4], "enqueued_at": row[5], "attempts": row[6]}
+
+    def __throttle(self, size: int) -> bool:
+        """
+        Wait so that the upload rate stays under max_bytes_per_second, False if stopped
+        """
+        if self.max_bytes_per_second <= 0:
+            return not self.__stop_event.is_set()
+        now = time.perf_counter()
+        self.__next_send_time = max(self.__next_send_time, now) + size / self.max_bytes_per_second
+        return not self.__stop_event.wait(max(self.__next_send_time - now, 0))
+
+    def __copy(self, p_from: Path, p_to: Path) -> bool:
+        """
+        Copy through a temporary file, so that the shared drive never has a partial file
+        """
+        p_to.parent.mkdir(parents=True, exist_ok=True)
+        p_part = p_to.with_name(p_to.name + SYNC_PART_SUFFIX)
+        try:
+            with open(p_from, "rb") as f_from, open(p_part, "wb") as f_to:
+                while True:
+                    chunk = f_from.read(SYNC_CHUNK_SIZE)
+                    if len(chunk) == 0:
+                        break
+                    f_to.write(chunk)
+                    if not self.__throttle(len(chunk)):
+                        break
+            if self.__stop_event.is_set():
+                p_part.unlink()
+                return False
+            os.replace(p_part, p_to)
+        except Exception:
+            if p_part.exists():
+                p_part.unlink()
+            raise
+        return True
+
+    def __upload(self, item: SyncItemDict) -> None:
+        p_from = Path(item["local_path"])
+        p_to = Path(item["dest_path"])
+        self.__uploading = item["dest_path"]
+        try:
+            with tracer.span("sync.upload", category="sync", path=item["dest_path"], size=item["size"]):
+                is_copied = self.__copy(p_from, p_to)
+        except Exception as error:
+            attempts = item["attempts"] + 1
+            state = "failed" if attempts >= SYNC_MAX_ATTEMPTS or not p_from.exists() else "pending"
+            next_try = time.time() + min(SYNC_RETRY_INTERVAL * 2 ** (attempts - 1), SYNC_RETRY_INTERVAL_MAX)
+            logger.error(f"Upload {item['local_path']} (attempt {attempts}): {error}")
+            with self.__lock:
+                self.__last_error = f"{item['dest_path']}: {error}"
+                connection = self.__get_connection()
+                connection.execute(
+                    "UPDATE sync_queue SET attempts = ?, next_try = ?, state = ?, error = ? WHERE id = ? AND enqueued_at = ?",
+                    (attempts, next_try, state, str(error), item["id"], item["enqueued_at"]),
+                )
+                connection.commit()
+            return
+        finally:
+            self.__uploading = None
+
+        if not is_copied:
+            return
+        with self.__lock:
+            connection = self.__get_connection()
+            # Not deleted when the file was queued again during the upload, it is uploaded again
+            cursor = connection.execute("DELETE FROM sync_queue WHERE id = ? AND enqueued_at = ?", (item["id"], item["enqueued_at"]))
+            connection.commit()
+            self.__uploaded_count += 1
+            self.__uploaded_bytes += item["size"]
+        # Kept when the file is being written again, it is uploaded after it is queued again
+        if cursor.rowcount == 1 and p_from.exists() and p_from.stat().st_mtime_ns == item["mtime_ns"]:
+            p_from.unlink()
+
+    def __run(self) -> None:
+        while not self.__stop_event.is_set():
+            try:
+                item = self.__get_next_item()
+            except Exception as error:
+                logger.error(error)
+                item = None
+            if item is None:
+                self.__wake_event.wait(SYNC_POLL_INTERVAL)
+                self.__wake_event.clear()
+                continue
+            self.__upload(item)
+
+
+sync_uploader = SyncUploader(
+    p_staging=src.common.settings.sync_staging_path,
+    max_bytes_per_second=src.common.settings.sync_max_bytes_per_second,
+)
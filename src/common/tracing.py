@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, TypedDict, TypeVar, cast
+
+FuncType = TypeVar("FuncType", bound=Callable[..., Any])
+
+TRACE_MAX_SPANS = 50000
+
+
+class SpanDict(TypedDict):
+    name: str
+    category: str
+    start: float  # us from the tracer epoch
+    duration: float  # us
+    thread_id: int
+    thread_name: str
+    args: dict[str, Any]
+
+
+class Tracer:
+    """
+    Record spans into a ring buffer, so only the last max_spans spans are kept.
+    Spans can be nested and overlap between threads, which is shown as a timeline by Chrome trace viewers.
+    """
+
+    def __init__(self, max_spans: int = TRACE_MAX_SPANS) -> None:
+        self.enabled = True
+        self.__lock = threading.Lock()
+        self.__spans: deque[SpanDict] = deque(maxlen=max_spans)
+        self.__epoch = time.perf_counter()
+        self.__epoch_unix = time.time()
+
+    @contextmanager
+    def span(self, name: str, category: str = "app", **args: Any) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            time_end = time.perf_counter()
+            thread = threading.current_thread()
+            span: SpanDict = {
+                "name": name,
+                "category": category,
+                "start": (time_start - self.__epoch) * 1e6,
+                "duration": (time_end - time_start) * 1e6,
+                "thread_id": thread.ident or 0,
+                "thread_name": thread.name,
+                "args": args,
+            }
+            with self.__lock:
+                self.__spans.append(span)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__spans.clear()
+
+    def get_spans(self, category: Optional[str] = None) -> list[SpanDict]:
+        with self.__lock:
+            spans = list(self.__spans)
+        if category is not None:
+            spans = [span for span in spans if span["category"] == category]
+        return spans
+
+    def to_chrome_trace(self, category: Optional[str] = None) -> dict[str, Any]:
+        """
+        Trace Event Format of Chrome. Save it as .json and open it in Perfetto UI or chrome://tracing.
+        """
+        pid = os.getpid()
+        spans = self.get_spans(category=category)
+        events: list[dict[str, Any]] = []
+        thread_names: dict[int, str] = {}
+        for span in spans:
+            thread_names[span["thread_id"]] = span["thread_name"]
+            events.append(
+                {
+                    "name": span["name"],
+                    "cat": span["category"],
+                    "ph": "X",
+                    "ts": span["start"],
+                    "dur": span["duration"],
+                    "pid": pid,
+                    "tid": span["thread_id"],
+                    "args": {key: str(value) for key, value in span["args"].items()},
+                }
+            )
+        for thread_id, thread_name in thread_names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"epoch": self.__epoch_unix}}
+
+
+tracer = Tracer()
+
+
+def traced(name: str, category: str = "app") -> Callable[[FuncType], FuncType]:
+    """
+    Decorator version of tracer.span
+    """
+
+    def _traced(func: FuncType) -> FuncType:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with tracer.span(name, category=category):
+                return func(*args, **kwargs)
+
+        return cast(FuncType, wrapper)
+
+    return _traced
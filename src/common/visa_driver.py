@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import re
-from typing import Optional, cast
+import threading
+from typing import TYPE_CHECKING, Optional, cast
 
-from pyvisa.highlevel import ResourceManager
-from pyvisa.resources.tcpip import TCPIPSocket
+from src.common.metrics import add_bytes, observe_operation
+
+if TYPE_CHECKING:
+    from pyvisa.highlevel import ResourceManager
+    from pyvisa.resources.tcpip import TCPIPSocket
+
+# Special characters of VISA resource regular expression
+VISA_QUERY_SPECIAL_PATTERN = r"([\\?*+\[\]()|^])"
 
 
 class VisaDriver:
@@ -12,8 +19,28 @@ class VisaDriver:
         self.__rm: Optional[ResourceManager] = None
         self.__inst: Optional[TCPIPSocket] = None
         self.__is_open = False
+        # Connections of the same instrument from several threads, Ex) bench connect and a router, are serialized
+        self.__lock = threading.Lock()
 
     def set_resource(self, address: str, idn_pattern: str, read_termination: str = "\r\n", write_termination: str = "\r\n") -> bool:
+        """
+        Open the instrument, the previous socket is closed first so that reconnecting does not leak it.
+        ResourceManager is shared by all instruments in pyvisa, so it is kept open.
+        """
+        with self.__lock:
+            self.__close_inst()
+            return self.__open_inst(address=address, idn_pattern=idn_pattern, read_termination=read_termination, write_termination=write_termination)
+
+    def __close_inst(self) -> None:
+        self.__is_open = False
+        if self.__rm is not None and self.__inst is not None:
+            self.__inst.close()
+
+    def __open_inst(self, address: str, idn_pattern: str, read_termination: str, write_termination: str) -> bool:
+        # pyvisa is imported at first connection to shorten startup time
+        from pyvisa.highlevel import ResourceManager
+        from pyvisa.resources.tcpip import TCPIPSocket
+
         self.__rm = ResourceManager()
         self.__inst = TCPIPSocket(resource_manager=self.__rm, resource_name=address)
         self.__inst.open()
@@ -39,9 +66,8 @@ class VisaDriver:
             self.__rm.close()
 
     def disconnect(self) -> bool:
-        self.__is_open = False
-        if self.__rm is not None and self.__inst is not None:
-            self.__inst.close()
+        with self.__lock:
+            self.__close_inst()
 
         return self.__is_open
 
@@ -53,17 +79,45 @@ class VisaDriver:
 
     def write(self, data: str) -> None:
         if self.__inst is not None:
-            self.__inst.write(data)
+            with observe_operation(interface="visa", operation="write"):
+                add_bytes(interface="visa", direction="tx", size=self.__inst.write(data))
 
     def query(self, data: str) -> Optional[str]:
         if self.__inst is not None:
-            return self.__inst.query(data)
+            with observe_operation(interface="visa", operation="query"):
+                response = self.__inst.query(data)
+            add_bytes(interface="visa", direction="tx", size=len(data) + len(self.__inst.write_termination))
+            add_bytes(interface="visa", direction="rx", size=len(response))
+            return response
         else:
             return None
 
     def query_binary_values(self, data: str) -> Optional[list[int | float]]:
         if self.__inst is not None:
-            response = self.__inst.query_binary_values(message=data, datatype="s")
+            with observe_operation(interface="visa", operation="query_binary_values"):
+                response = self.__inst.query_binary_values(message=data, datatype="s")
+            add_bytes(interface="visa", direction="tx", size=len(data) + len(self.__inst.write_termination))
+            # datatype "s" is a 1 byte char per value
+            add_bytes(interface="visa", direction="rx", size=len(response))
             return cast("list[int | float]", response)
         else:
             return None
+
+
+def exists_resource(address: str) -> bool:
+    """
+    Check whether the resource is listed by VISA without opening it.
+    It is used for USB instruments which cannot be pinged.
+    Only the address is queried instead of listing all resources, which includes slow discovery of LAN instruments.
+    ResourceManager is shared by all instruments in pyvisa, so it is not closed here.
+    """
+    from pyvisa import constants, errors
+    from pyvisa.highlevel import ResourceManager
+
+    query = re.sub(VISA_QUERY_SPECIAL_PATTERN, r"\\\1", address)
+    try:
+        return len(ResourceManager().list_resources(query=query)) > 0
+    except errors.VisaIOError as error:
+        if error.error_code == constants.StatusCode.error_resource_not_found:
+            return False
+        raise
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Literal, Optional, TypedDict
+
+from src.common.logger import set_logger
+
+logger = set_logger(__name__)
+
+BENCH_DEFAULT_DEADLINE = 5  # s
+
+# "busy": skipped because a job has reserved the device
+BenchStatusType = Literal["ok", "failed", "error", "timeout", "busy"]
+
+
+class BenchResultDict(TypedDict):
+    is_open: bool
+    status: BenchStatusType
+    elapsed: Optional[float]
+    error: Optional[str]
+
+
+def run_concurrently(tasks: dict[str, Callable[[], bool]], deadline: float = BENCH_DEFAULT_DEADLINE) -> dict[str, BenchResultDict]:
+    """
+    Run all tasks at once and wait for them until deadline.
+    Total time is bounded by the slowest task or deadline.
+    A task over deadline is reported as "timeout" and left running in background, because blocking VISA or serial calls cannot be interrupted.
+
+    Parameters
+    ----------
+    tasks : dict[str, Callable[[], bool]]
+        Device name and function returning whether the device is open
+    deadline : float, optional
+        Deadline for each device in s
+    """
+    results: dict[str, BenchResultDict] = {}
+    if len(tasks) == 0:
+        return results
+
+    elapsed_dict: dict[str, float] = {}
+
+    def measure(name: str, task: Callable[[], bool]) -> bool:
+        time_start = time.perf_counter()
+        try:
+            return task()
+        finally:
+            elapsed_dict[name] = time.perf_counter() - time_start
+
+    executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="bench")
+    futures: dict[str, Future[bool]] = {name: executor.submit(measure, name, task) for name, task in tasks.items()}
+    wait(futures.values(), timeout=deadline)
+    executor.shutdown(wait=False)
+
+    for name, future in futures.items():
+        if not future.done():
+            results[name] = {"is_open": False, "status": "timeout", "elapsed": None, "error": f"Not finished in {deadline} s"}
+            continue
+
+        error = future.exception()
+        if error is not None:
+            logger.error(f"{name}: {error}")
+            results[name] = {"is_open": False, "status": "error", "elapsed": elapsed_dict.get(name), "error": str(error)}
+        else:
+            is_open = future.result()
+            results[name] = {"is_open": is_open, "status": "ok" if is_open else "failed", "elapsed": elapsed_dict.get(name), "error": None}
+
+    return results
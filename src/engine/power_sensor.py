@@ -6,11 +6,12 @@ POWER_SENSOR_IDN_PATTERN = "Keysight Technologies,U([0-9]{4})X*(A|B),MY([0-9]+),
 
 
 class PowerSensor(VisaDriver):
-    def __init__(self) -> None:
+    def __init__(self, read_termination: str = "") -> None:
         super().__init__()
+        self.read_termination = read_termination
 
     def connect(self, address: str) -> bool:
-        return self.set_resource(address=address, idn_pattern=POWER_SENSOR_IDN_PATTERN, read_termination="")
+        return self.set_resource(address=address, idn_pattern=POWER_SENSOR_IDN_PATTERN, read_termination=self.read_termination)
 
     def get_data(self) -> Optional[float]:
         self.write(data="init")  # necessary before sending fetc?
@@ -1,45 +1,162 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
-
-import paramiko
-import requests
-
-
-def record_start(ip_address: str, port: int, session_name: str, session_desc: str, duration: int, timeout: int = 1) -> int:
-
-    record_stop(ip_address, port)
-
-    endpoint = "rest/dataRecorder5/_procedure/startRecording"
-    url = f"http://{ip_address}:{port}/{endpoint}"
-    payload = {
+import codecs
+import socket
+import stat
+import tarfile
+import threading
+from collections import deque
+from pathlib import Path, PureWindowsPath
+from typing import IO, TYPE_CHECKING, Any, Callable, Literal, Optional, TypedDict, cast
+
+from src.common.job_scheduler import FINISHED_STATES, JobState, JobStatusDict
+from src.common.logger import set_logger
+from src.common.metrics import add_bytes, measure
+from src.common.rest_client import AsyncRestClient, RestClient
+
+if TYPE_CHECKING:
+    import paramiko
+
+logger = set_logger(__name__)
+
+TransferMode = Literal["sftp", "tar"]
+CompressionType = Literal["none", "gzip", "zstd"]
+
+# Compression option of remote tar
+TAR_COMPRESSION_OPTION = {"none": "", "gzip": "-z ", "zstd": "-I zstd "}
+
+STREAM_POLL_INTERVAL = 0.5  # s
+STREAM_CHUNK_SIZE = 4096
+PROCESSING_OUTPUT_MAX_LINES = 10000
+
+
+def is_within(path: Path, p_root: Path) -> bool:
+    return path == p_root or p_root in path.parents
+
+
+def check_tar_member(member: tarfile.TarInfo, p_root: Path) -> None:
+    """
+    Raise tarfile.TarError if the member is written outside p_root.
+    Absolute names, ".." and links pointing outside p_root are refused, so are device files and FIFOs.
+
+    Parameters
+    ----------
+    member : tarfile.TarInfo
+        Member of the archive
+    p_root : Path
+        Resolved directory to extract into
+    """
+    name = member.name.replace("\\", "/")
+    if name.startswith("/") or PureWindowsPath(name).drive != "":
+        raise tarfile.TarError(f"Absolute path: {member.name}")
+    if ".." in name.split("/"):
+        raise tarfile.TarError(f"Parent directory: {member.name}")
+    if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+        raise tarfile.TarError(f"Not supported type: {member.name}")
+
+    p_member = p_root / name
+    if not is_within(p_member.resolve(), p_root):
+        raise tarfile.TarError(f"Outside of destination: {member.name}")
+    if member.issym() or member.islnk():
+        linkname = member.linkname.replace("\\", "/")
+        if linkname.startswith("/") or PureWindowsPath(linkname).drive != "":
+            raise tarfile.TarError(f"Absolute link: {member.name} -> {member.linkname}")
+        # Target of a symbolic link is relative to the link, of a hard link to the archive root
+        p_link = (p_member.parent if member.issym() else p_root) / linkname
+        if not is_within(p_link.resolve(), p_root):
+            raise tarfile.TarError(f"Link outside of destination: {member.name} -> {member.linkname}")
+
+
+def extract_tar(tar: tarfile.TarFile, p_save: Path) -> None:
+    """
+    Extract all members into p_save.
+    "data" filter of tarfile is used where it exists (Python 3.8.17, 3.9.17, 3.10.12 or later), otherwise each member is checked before extraction.
+    """
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(path=p_save, filter="data")
+        return
+
+    p_root = p_save.resolve()
+    # Members are checked one by one, because a stream is read only once
+    for member in tar:
+        check_tar_member(member, p_root)
+        tar.extract(member, path=p_save)
+
+
+RECORD_START_ENDPOINT = "rest/dataRecorder5/_procedure/startRecording"
+RECORD_STOP_ENDPOINT = "rest/dataRecorder5/_procedure/stopRecording"
+
+
+def make_record_start_payload(session_name: str, session_desc: str, duration: int) -> dict[str, Any]:
+    return {
         "sessionName": {"factory": "Attribute", "factoryType": "string", "value": session_name},
         "sessionDesc": {"factory": "Attribute", "factoryType": "string", "value": session_desc},
         "startTime": {"factory": "Attribute", "factoryType": "time", "value": "1970-01-01 00:00:00"},
         "duration": {"factory": "Attribute", "factoryType": "int64", "value": duration},
     }
-    try:
-        request_post = requests.post(url=url, data=json.dumps(payload), timeout=timeout)
-        request = request_post.json()
-        if request["startRecordingResponse"]["value"]:
-            return request_post.status_code
+
+
+class QdraRest(RestClient):
+    def record_start(self, session_name: str, session_desc: str, duration: int, timeout: Optional[float] = None) -> int:
+
+        self.record_stop(timeout=timeout)
+
+        payload = make_record_start_payload(session_name=session_name, session_desc=session_desc, duration=duration)
+        response = self.post_response(endpoint=RECORD_START_ENDPOINT, payload=payload, timeout=timeout)
+        if response is None:
+            return -1
+        if response.json()["startRecordingResponse"]["value"]:
+            return response.status_code
         else:
             return -1
-    except requests.exceptions.ConnectTimeout:
-        return -1
 
+    def record_stop(self, timeout: Optional[float] = None) -> int:
 
-def record_stop(ip_address: str, port: int, timeout: int = 1) -> int:
+        return self.post(endpoint=RECORD_STOP_ENDPOINT, timeout=timeout)
 
-    endpoint = "rest/dataRecorder5/_procedure/stopRecording"
-    url = f"http://{ip_address}:{port}/{endpoint}"
 
-    try:
-        request_post = requests.post(url=url, timeout=timeout)
-        return request_post.status_code
-    except requests.exceptions.ConnectTimeout:
-        return -1
+class QdraAsyncRest(AsyncRestClient):
+    async def record_start(self, session_name: str, session_desc: str, duration: int, timeout: Optional[float] = None) -> int:
+
+        await self.record_stop(timeout=timeout)
+
+        payload = make_record_start_payload(session_name=session_name, session_desc=session_desc, duration=duration)
+        response = await self.post_response(endpoint=RECORD_START_ENDPOINT, payload=payload, timeout=timeout)
+        if response is None:
+            return -1
+        if response.json()["startRecordingResponse"]["value"]:
+            return response.status_code
+        else:
+            return -1
+
+    async def record_stop(self, timeout: Optional[float] = None) -> int:
+
+        return await self.post(endpoint=RECORD_STOP_ENDPOINT, timeout=timeout)
+
+
+rest_clients: dict[tuple[str, int], QdraRest] = {}
+
+
+def get_rest_client(ip_address: str, port: int) -> QdraRest:
+    """
+    Get keep-alive client shared by record_start and record_stop
+    """
+    key = (ip_address, port)
+    if key not in rest_clients:
+        rest_clients[key] = QdraRest(ip_address=ip_address, port=port)
+    return rest_clients[key]
+
+
+def record_start(ip_address: str, port: int, session_name: str, session_desc: str, duration: int, timeout: int = 1) -> int:
+
+    client = get_rest_client(ip_address=ip_address, port=port)
+    return client.record_start(session_name=session_name, session_desc=session_desc, duration=duration, timeout=timeout)
+
+
+def record_stop(ip_address: str, port: int, timeout: int = 1) -> int:
+
+    client = get_rest_client(ip_address=ip_address, port=port)
+    return client.record_stop(timeout=timeout)
 
 
 class QdraSsh:
@@ -49,22 +166,106 @@ class QdraSsh:
         self.username = username
         self.password = password
 
-    def get_file(self, p_server: Path, p_save: Path) -> None:
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    @measure(interface="ssh", operation="connect")
+    def connect(self) -> paramiko.SSHClient:
+        """
+        Make connected SSH client. Use it with with statement to close it.
+        """
+        # paramiko is imported at first connection to shorten startup time
+        import paramiko
+
+        ssh = paramiko.SSHClient()
+        # Are you sure you want to continue connecting (yes/no)? -> Yes
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
             ssh.connect(self.host, self.port, self.username, self.password)
+        except Exception:
+            ssh.close()
+            raise
+        return ssh
+
+    @measure(interface="ssh", operation="get_file")
+    def get_file(self, p_server: Path, p_save: Path) -> None:
+        with self.connect() as ssh:
             sftp = ssh.open_sftp()
             sftp.get(str(p_server).replace("\\", "/"), str(p_save))
+        add_bytes(interface="ssh", direction="rx", size=p_save.stat().st_size)
+
+    @measure(interface="ssh", operation="get_dir")
+    def get_dir(self, p_server: Path, p_save: Path, transfer_mode: TransferMode = "sftp", compression: CompressionType = "gzip") -> bool:
+        """
+        Download all files in p_server into p_save.
+
+        Parameters
+        ----------
+        p_server : Path
+            Directory on qDRA (relative to home directory)
+        p_save : Path
+            Local directory, it is made if not exists
+        transfer_mode : "sftp" | "tar", optional
+            "sftp": Get regular files one by one over one SFTP session.
+            "tar": Stream a remote tar over the SSH channel and unpack it on the fly.
+                   No temporary archive is made on either side.
+        compression : "none" | "gzip" | "zstd", optional
+            Only used in "tar" mode. "zstd" needs zstd on qDRA and the zstd extra (zstandard package) on local.
+
+        Returns
+        -------
+        bool
+            True if all files are transferred
+        """
+        if not p_save.exists():
+            p_save.mkdir(parents=True)
+
+        if transfer_mode == "tar":
+            return self.__get_dir_tar(p_server=p_server, p_save=p_save, compression=compression)
+        else:
+            return self.__get_dir_sftp(p_server=p_server, p_save=p_save)
+
+    def __get_dir_sftp(self, p_server: Path, p_save: Path) -> bool:
+
+        with self.connect() as ssh:
+            sftp = ssh.open_sftp()
+            p_server_str = str(p_server).replace("\\", "/")
+            for attr in sftp.listdir_attr(path=p_server_str):
+                if attr.st_mode is not None and stat.S_ISREG(attr.st_mode):
+                    sftp.get(f"{p_server_str}/{attr.filename}", str(p_save / attr.filename))
+                    add_bytes(interface="ssh", direction="rx", size=attr.st_size or 0)
+
+        return True
+
+    def __get_dir_tar(self, p_server: Path, p_save: Path, compression: CompressionType) -> bool:
+
+        with self.connect() as ssh:
+            path_str = str(p_server).replace("\\", "/")
+            _, stdout, stderr = ssh.exec_command(f"tar {TAR_COMPRESSION_OPTION[compression]}-C ~/{path_str} -cf - .")
+
+            fileobj = cast("IO[bytes]", stdout)
+            if compression == "zstd":
+                import zstandard
+
+                fileobj = zstandard.ZstdDecompressor().stream_reader(stdout)
+
+            # zstd is decompressed by zstandard, so tarfile reads a plain tar stream
+            tar_mode: Literal["r|", "r|gz"] = "r|gz" if compression == "gzip" else "r|"
+            with tarfile.open(fileobj=fileobj, mode=tar_mode) as tar:
+                extract_tar(tar, p_save)
+                # Size of extracted files, not of the compressed stream
+                add_bytes(interface="ssh", direction="rx", size=sum(member.size for member in tar.getmembers()))
+
+            exit_status = stdout.channel.recv_exit_status()
+            if exit_status != 0:
+                logger.error(f"tar exit status {exit_status}: {stderr.read().decode(errors='replace')}")
+                return False
 
+        return True
+
+    @measure(interface="ssh", operation="exec_sh")
     def exec_sh(self, session_name: str, path: Path, p_script: Path) -> tuple[str, str]:
 
         stdout_list: list[str] = []
         stderr_list: list[str] = []
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.host, self.port, self.username, self.password)
+        with self.connect() as ssh:
             path_str = str(path).replace("\\", "/")
             p_script_str = str(p_script).replace("\\", "/")
             stdin, stdout, stderr = ssh.exec_command(f"cd ~/{path_str} ; ~/{p_script_str} {session_name}", get_pty=True)
@@ -76,14 +277,57 @@ class QdraSsh:
 
         return "".join(stdout_list), "".join(stderr_list)
 
+    @measure(interface="ssh", operation="exec_sh_stream")
+    def exec_sh_stream(self, session_name: str, path: Path, p_script: Path, on_line: Callable[[str], None], cancel_event: threading.Event) -> Optional[int]:
+        """
+        Same as exec_sh, but each output line is passed to on_line as soon as it arrives.
+        stderr is merged into stdout because of pty.
+
+        Returns
+        -------
+        Optional[int]
+            Exit status of the script, None when cancelled by cancel_event.
+            The remote script gets SIGHUP when cancelled because the pty is closed.
+        """
+        with self.connect() as ssh:
+            path_str = str(path).replace("\\", "/")
+            p_script_str = str(p_script).replace("\\", "/")
+            stdin, stdout, _ = ssh.exec_command(f"cd ~/{path_str} ; ~/{p_script_str} {session_name}", get_pty=True)
+            stdin.write(f"{self.password}\n")
+            stdin.flush()
+
+            channel = stdout.channel
+            channel.settimeout(STREAM_POLL_INTERVAL)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            line_buffer = ""
+            while not cancel_event.is_set():
+                try:
+                    chunk = channel.recv(STREAM_CHUNK_SIZE)
+                except socket.timeout:
+                    continue
+                if len(chunk) == 0:
+                    break
+                add_bytes(interface="ssh", direction="rx", size=len(chunk))
+                *lines, line_buffer = (line_buffer + decoder.decode(chunk)).split("\n")
+                for line in lines:
+                    on_line(line.rstrip("\r"))
+
+            line_buffer += decoder.decode(b"", final=True)
+            if line_buffer != "":
+                on_line(line_buffer.rstrip("\r"))
+
+            if cancel_event.is_set():
+                channel.close()
+                return None
+
+            return channel.recv_exit_status()
+
+    @measure(interface="ssh", operation="delete_dir")
     def delete_dir(self, path: Path) -> tuple[list[str], list[str]]:
 
         stdout_list: list[str] = []
         stderr_list: list[str] = []
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.host, self.port, self.username, self.password)
+        with self.connect() as ssh:
             path_str = str(path).replace("\\", "/")
             stdin, stdout, stderr = ssh.exec_command(f"rm -r ~/{path_str}", get_pty=True)
             stdin.write(f"{self.password}\n")
@@ -94,23 +338,19 @@ class QdraSsh:
 
         return stdout_list, stderr_list
 
+    @measure(interface="ssh", operation="get_list_dir")
     def get_list_dir(self, path: Path) -> list[str]:
 
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.host, self.port, self.username, self.password)
+        with self.connect() as ssh:
             sftp = ssh.open_sftp()
             list_dir = sftp.listdir(path=str(path).replace("\\", "/"))
 
         return list_dir
 
+    @measure(interface="ssh", operation="exists")
     def exists(self, path: Path) -> bool:
 
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.host, self.port, self.username, self.password)
+        with self.connect() as ssh:
             sftp = ssh.open_sftp()
             try:
                 sftp.stat(str(path).replace("\\", "/"))
@@ -118,12 +358,10 @@ class QdraSsh:
             except FileNotFoundError:
                 return False
 
+    @measure(interface="ssh", operation="mkdir")
     def mkdir(self, path: Path) -> bool:
 
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.host, self.port, self.username, self.password)
+        with self.connect() as ssh:
             sftp = ssh.open_sftp()
 
             path_tmp = path
@@ -144,14 +382,12 @@ class QdraSsh:
 
         return self.exists(path)
 
+    @measure(interface="ssh", operation="screenshot")
     def screenshot(self, path: Path) -> tuple[list[str], list[str]]:
 
         stdout_list: list[str] = []
         stderr_list: list[str] = []
-        with paramiko.SSHClient() as ssh:
-            # Are you sure you want to continue connecting (yes/no)? -> Yes
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(self.host, self.port, self.username, self.password)
+        with self.connect() as ssh:
             path_str = str(path).replace("\\", "/")
 
             _, stdout, _ = ssh.exec_command("ps -C firefox")
@@ -173,3 +409,94 @@ class QdraSsh:
             stderr_list.extend(stderr)
 
         return stdout_list, stderr_list
+
+
+class ProcessingStatusDict(TypedDict):
+    session_name: str
+    state: JobState
+    is_cancel_requested: bool
+    exit_status: Optional[int]
+    line_count: int
+    error: Optional[str]
+
+
+class QdraProcessingJob:
+    """
+    Processing script on qDRA, run as a job of job_scheduler by passing run and finish.
+    Output lines are kept in a bounded buffer, so only the last max_lines lines can be read.
+    The final state of the job is kept here, so it is read after job_scheduler has forgotten the job.
+    """
+
+    def __init__(self, qdra_ssh: QdraSsh, session_name: str, path: Path, p_script: Path, max_lines: int = PROCESSING_OUTPUT_MAX_LINES) -> None:
+        self.session_name = session_name
+        self.__qdra_ssh = qdra_ssh
+        self.__path = path
+        self.__p_script = p_script
+        self.__lock = threading.Lock()
+        self.__lines: deque[tuple[int, str]] = deque(maxlen=max_lines)
+        self.__line_count = 0
+        self.__exit_status: Optional[int] = None
+        self.__state: JobState = "queued"
+        self.__cancel_event: Optional[threading.Event] = None
+        self.__is_cancel_requested = False
+        self.__error: Optional[str] = None
+
+    def __append_line(self, line: str) -> None:
+        with self.__lock:
+            self.__lines.append((self.__line_count, line))
+            self.__line_count += 1
+
+    def run(self, cancel_event: threading.Event) -> Optional[int]:
+        """
+        Run the script until it exits or cancel_event is set
+
+        Returns
+        -------
+        Optional[int]
+            Exit status
+        """
+        with self.__lock:
+            self.__state = "running"
+            self.__cancel_event = cancel_event
+        self.__exit_status = self.__qdra_ssh.exec_sh_stream(
+            session_name=self.session_name, path=self.__path, p_script=self.__p_script, on_line=self.__append_line, cancel_event=cancel_event
+        )
+        return self.__exit_status
+
+    def finish(self, status: JobStatusDict) -> None:
+        """
+        on_finish of the job
+        """
+        with self.__lock:
+            self.__state = status["state"]
+            self.__is_cancel_requested = status["is_cancel_requested"]
+            self.__error = status["error"]
+
+    def is_finished(self) -> bool:
+        with self.__lock:
+            return self.__state in FINISHED_STATES
+
+    def get_output(self, since: int = 0) -> tuple[list[str], int]:
+        """
+        Get output lines whose line number is since or later.
+
+        Returns
+        -------
+        tuple[list[str], int]
+            Lines and line number to pass as since next time.
+            Lines dropped from the buffer are skipped.
+        """
+        with self.__lock:
+            lines = [line for num, line in self.__lines if num >= since]
+            return lines, self.__line_count
+
+    def get_status(self) -> ProcessingStatusDict:
+        with self.__lock:
+            return {
+                "session_name": self.session_name,
+                "state": self.__state,
+                "is_cancel_requested": self.__is_cancel_requested or (self.__cancel_event is not None and self.__cancel_event.is_set()),
+                "exit_status": self.__exit_status,
+                "line_count": self.__line_count,
+                "error": self.__error,
+            }
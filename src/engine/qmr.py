@@ -1,31 +1,300 @@
-import json
-from typing import Literal
+from __future__ import annotations
 
-import requests
+import itertools
+import threading
+import time
+from typing import Any, Literal, Optional, TypedDict, Union
+
+from src.common.rest_client import HEADERS_JSON, AsyncRestClient, RestClient
 
 ModcodType = Literal[13, 15]
+AttributeValue = Union[str, int, float, bool]
+FactoryType = Literal["string", "int64", "double", "bool"]
 
+MODCOD_VALUE = {13: "8PSK 2/3", 15: "8PSK 5/6"}
+DEFAULT_COMPONENT = "demodulatorWb1"
+MODCOD_ATTRIBUTE = "dvbs2ModCodExpected"
+
+
+class QmrAttributeDict(TypedDict):
+    component: str
+    name: str
+    value: AttributeValue
+    factory_type: FactoryType
+
+
+class QmrSweepAxisDict(TypedDict):
+    component: str
+    name: str
+    values: list[AttributeValue]
+    factory_type: FactoryType
+
+
+class QmrSweepStepDict(TypedDict):
+    index: int
+    time: float
+    attributes: dict[str, AttributeValue]
+    status_codes: list[int]
+    read_back: dict[str, Optional[AttributeValue]]
+    is_ok: bool
+
+
+class QmrSweepStatusDict(TypedDict):
+    step_count: int
+    steps: list[QmrSweepStepDict]
+
+
+def guess_factory_type(value: AttributeValue) -> FactoryType:
+    # bool must be checked before int because bool is a subclass of int
+    if isinstance(value, bool):
+        return "bool"
+    elif isinstance(value, int):
+        return "int64"
+    elif isinstance(value, float):
+        return "double"
+    else:
+        return "string"
+
+
+def make_attribute(name: str, value: AttributeValue, component: str = DEFAULT_COMPONENT, factory_type: Optional[FactoryType] = None) -> QmrAttributeDict:
+    return {
+        "component": component,
+        "name": name,
+        "value": value,
+        "factory_type": guess_factory_type(value) if factory_type is None else factory_type,
+    }
 
-def change_modcod(ip_address: str, port: int, modcod: ModcodType, timeout: int = 1) -> int:
 
-    endpoint = "rest/demodulatorWb1/_attribute/dvbs2ModCodExpected"
-    headers = {"Content-Type": "application/json"}
-    url = f"http://{ip_address}:{port}/{endpoint}"
+def make_attribute_endpoint(component: str, name: str) -> str:
+    return f"rest/{component}/_attribute/{name}"
 
-    payload = {
-        "dvbs2ModCodExpected": {
+
+def make_attribute_payload(attribute: QmrAttributeDict) -> dict[str, Any]:
+    return {
+        attribute["name"]: {
             "factory": "Attribute",
-            "factoryType": "string",
+            "factoryType": attribute["factory_type"],
+            "value": attribute["value"],
         }
     }
 
-    if modcod == 13:
-        payload["dvbs2ModCodExpected"]["value"] = "8PSK 2/3"
-    elif modcod == 15:
-        payload["dvbs2ModCodExpected"]["value"] = "8PSK 5/6"
 
-    try:
-        request_post = requests.post(url=url, data=json.dumps(payload), headers=headers, timeout=timeout)
-        return request_post.status_code
-    except requests.exceptions.ConnectTimeout:
-        return -1
+def make_modcod_payload(modcod: ModcodType) -> dict[str, Any]:
+    return make_attribute_payload(make_attribute(name=MODCOD_ATTRIBUTE, value=MODCOD_VALUE[modcod], factory_type="string"))
+
+
+def parse_attribute_response(name: str, response_json: Any) -> Optional[AttributeValue]:
+    """
+    Response of attribute is the same format as the payload
+    Ex) {"dvbs2ModCodExpected": {"factory": "Attribute", "factoryType": "string", "value": "8PSK 2/3"}}
+    """
+    if isinstance(response_json, dict):
+        attribute = response_json.get(name, response_json)
+        if isinstance(attribute, dict) and "value" in attribute:
+            return attribute["value"]  # type: ignore
+    return None
+
+
+class QmrAttributeCache:
+    """
+    Last-known attribute values of qMR.
+    Shared by sync and async clients so that writes through either of them keep the cache consistent.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__values: dict[tuple[str, str], AttributeValue] = {}
+
+    def get(self, component: str, name: str) -> Optional[AttributeValue]:
+        with self.__lock:
+            return self.__values.get((component, name))
+
+    def set(self, component: str, name: str, value: AttributeValue) -> None:
+        with self.__lock:
+            self.__values[(component, name)] = value
+
+    def discard(self, component: str, name: str) -> None:
+        with self.__lock:
+            self.__values.pop((component, name), None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__values.clear()
+
+    def is_same(self, attribute: QmrAttributeDict) -> bool:
+        with self.__lock:
+            key = (attribute["component"], attribute["name"])
+            return key in self.__values and self.__values[key] == attribute["value"]
+
+    def to_dict(self) -> dict[str, AttributeValue]:
+        with self.__lock:
+            return {f"{component}/{name}": value for (component, name), value in self.__values.items()}
+
+
+class QmrRest(RestClient):
+    def __init__(self, ip_address: str, port: int, timeout: float = 1, retries: int = 1, pool_size: int = 4, cache: Optional[QmrAttributeCache] = None) -> None:
+        super().__init__(ip_address=ip_address, port=port, timeout=timeout, retries=retries, pool_size=pool_size)
+        self.cache = QmrAttributeCache() if cache is None else cache
+
+    def change_modcod(self, modcod: ModcodType, timeout: Optional[float] = None) -> int:
+
+        attribute = make_attribute(name=MODCOD_ATTRIBUTE, value=MODCOD_VALUE[modcod], factory_type="string")
+        return self.write_attribute(attribute=attribute, force=True, timeout=timeout)
+
+    def write_attribute(self, attribute: QmrAttributeDict, force: bool = False, timeout: Optional[float] = None) -> int:
+        """
+        Write one attribute. The write is skipped and 200 is returned when the cached value is the same unless force is True.
+        The cached value is discarded when the write fails because the device state is unknown.
+        """
+        if not force and self.cache.is_same(attribute):
+            return 200
+
+        endpoint = make_attribute_endpoint(component=attribute["component"], name=attribute["name"])
+        status_code = self.post(endpoint=endpoint, payload=make_attribute_payload(attribute), headers=HEADERS_JSON, timeout=timeout)
+        if status_code == 200:
+            self.cache.set(component=attribute["component"], name=attribute["name"], value=attribute["value"])
+        else:
+            self.cache.discard(component=attribute["component"], name=attribute["name"])
+        return status_code
+
+    def write_attributes(self, attributes: list[QmrAttributeDict], force: bool = False, timeout: Optional[float] = None) -> list[int]:
+        """
+        Write attributes in order over the same keep-alive connection.
+        Writing stops at the first failure and the rest are reported as -1.
+        """
+        status_codes: list[int] = []
+        for attribute in attributes:
+            if len(status_codes) > 0 and status_codes[-1] != 200:
+                status_codes.append(-1)
+                continue
+            status_codes.append(self.write_attribute(attribute=attribute, force=force, timeout=timeout))
+        return status_codes
+
+    def read_attribute(self, name: str, component: str = DEFAULT_COMPONENT, timeout: Optional[float] = None) -> Optional[AttributeValue]:
+        """
+        Read one attribute from qMR and update the cache
+        """
+        response = self.get_response(endpoint=make_attribute_endpoint(component=component, name=name), timeout=timeout)
+        if response is None or response.status_code != 200:
+            return None
+
+        value = parse_attribute_response(name=name, response_json=response.json())
+        if value is None:
+            self.cache.discard(component=component, name=name)
+        else:
+            self.cache.set(component=component, name=name, value=value)
+        return value
+
+    def read_attributes(self, attributes: list[tuple[str, str]], timeout: Optional[float] = None) -> dict[str, Optional[AttributeValue]]:
+        """
+        attributes: list of (component, name)
+        """
+        return {f"{component}/{name}": self.read_attribute(name=name, component=component, timeout=timeout) for component, name in attributes}
+
+
+class QmrAsyncRest(AsyncRestClient):
+    def __init__(self, ip_address: str, port: int, timeout: float = 1, retries: int = 1, pool_size: int = 4, cache: Optional[QmrAttributeCache] = None) -> None:
+        super().__init__(ip_address=ip_address, port=port, timeout=timeout, retries=retries, pool_size=pool_size)
+        self.cache = QmrAttributeCache() if cache is None else cache
+
+    async def change_modcod(self, modcod: ModcodType, timeout: Optional[float] = None) -> int:
+
+        status_code = await self.post(
+            endpoint=make_attribute_endpoint(component=DEFAULT_COMPONENT, name=MODCOD_ATTRIBUTE),
+            payload=make_modcod_payload(modcod),
+            headers=HEADERS_JSON,
+            timeout=timeout,
+        )
+        if status_code == 200:
+            self.cache.set(component=DEFAULT_COMPONENT, name=MODCOD_ATTRIBUTE, value=MODCOD_VALUE[modcod])
+        else:
+            self.cache.discard(component=DEFAULT_COMPONENT, name=MODCOD_ATTRIBUTE)
+        return status_code
+
+
+class QmrSweep:
+    """
+    Write every combination of axis values, run as a job of job_scheduler by passing run.
+    Only changed attributes are sent thanks to the attribute cache, so the last axis changes fastest.
+    """
+
+    def __init__(self, client: QmrRest, axes: list[QmrSweepAxisDict], dwell: float = 0, reads_back: bool = True) -> None:
+        self.__client = client
+        self.__axes = axes
+        self.__dwell = dwell
+        self.__reads_back = reads_back
+        self.__lock = threading.Lock()
+        self.__steps: list[QmrSweepStepDict] = []
+        self.step_count = 1
+        for axis in axes:
+            self.step_count *= len(axis["values"])
+
+    def run(self, cancel_event: threading.Event) -> int:
+        """
+        Write the combinations until all are written or cancel_event is set
+
+        Returns
+        -------
+        int
+            Number of steps which are not ok
+        """
+        values_list = [axis["values"] for axis in self.__axes]
+        for index, values in enumerate(itertools.product(*values_list)):
+            if cancel_event.is_set():
+                break
+            attributes = [
+                make_attribute(name=axis["name"], value=value, component=axis["component"], factory_type=axis["factory_type"])
+                for axis, value in zip(self.__axes, values)
+            ]
+            status_codes = self.__client.write_attributes(attributes=attributes)
+            is_ok = all(status_code == 200 for status_code in status_codes)
+
+            read_back: dict[str, Optional[AttributeValue]] = {}
+            if self.__reads_back:
+                read_back = self.__client.read_attributes([(attribute["component"], attribute["name"]) for attribute in attributes])
+                for attribute in attributes:
+                    if read_back[f"{attribute['component']}/{attribute['name']}"] != attribute["value"]:
+                        is_ok = False
+
+            step: QmrSweepStepDict = {
+                "index": index,
+                "time": time.time(),
+                "attributes": {f"{attribute['component']}/{attribute['name']}": attribute["value"] for attribute in attributes},
+                "status_codes": status_codes,
+                "read_back": read_back,
+                "is_ok": is_ok,
+            }
+            with self.__lock:
+                self.__steps.append(step)
+
+            cancel_event.wait(self.__dwell)
+        with self.__lock:
+            return sum(1 for step in self.__steps if not step["is_ok"])
+
+    def get_status(self) -> QmrSweepStatusDict:
+        with self.__lock:
+            steps = list(self.__steps)
+
+        return {
+            "step_count": self.step_count,
+            "steps": steps,
+        }
+
+
+rest_clients: dict[tuple[str, int], QmrRest] = {}
+
+
+def get_rest_client(ip_address: str, port: int) -> QmrRest:
+    """
+    Get keep-alive client shared by change_modcod
+    """
+    key = (ip_address, port)
+    if key not in rest_clients:
+        rest_clients[key] = QmrRest(ip_address=ip_address, port=port)
+    return rest_clients[key]
+
+
+def change_modcod(ip_address: str, port: int, modcod: ModcodType, timeout: int = 1) -> int:
+
+    client = get_rest_client(ip_address=ip_address, port=port)
+    return client.change_modcod(modcod=modcod, timeout=timeout)
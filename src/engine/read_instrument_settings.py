@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import sys
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 from pydantic import BaseModel, error_wrappers
 
+from src.common.logger import set_logger
+
+logger = set_logger(__name__)
+
 if getattr(sys, "frozen", False):
     p_this_file = Path(sys.executable)
     p_top = p_this_file.resolve().parent
@@ -14,6 +19,7 @@ else:
     p_top = p_this_file.resolve().parent.parent.parent
 
 P_SETTING = p_top / ".settings/settings.json"
+SETTING_WATCH_INTERVAL = 1  # s
 
 
 class CommonSetting(BaseModel):
@@ -30,6 +36,12 @@ class NetworkSetting(BaseModel):
     port: int
 
 
+class RestSetting(NetworkSetting):
+    timeout: float = 1
+    retries: int = 1
+    pool_size: int = 4
+
+
 class SshSetting(NetworkSetting):
     username: str
     password: str
@@ -70,21 +82,24 @@ class BusJigSetting(BaseModel):
 
 
 class QmrSetting(BaseModel):
-    network: NetworkSetting
+    network: RestSetting
 
 
 class QdraSetting(BaseModel):
-    network: NetworkSetting
+    network: RestSetting
     ssh: SshSetting
 
 
 class PowerSensorSetting(BaseModel):
     visa: str
+    # Used at next connection, the instrument itself ends responses by EOI
+    read_termination: str = ""
 
 
 class SignalAnalyzerSetting(BaseModel):
     visa: str
     capture_path: str
+    read_termination: str = ""
 
 
 class InstrumentSetting(BaseModel):
@@ -107,5 +122,104 @@ def read_json_file() -> Optional[InstrumentSetting]:
     return json_load
 
 
+class SettingService:
+    """
+    Parse settings once and share them.
+    The file is watched by mtime, and new settings are swapped in only after validation, so invalid edits keep the current settings.
+    Subscribers are called with new settings after each reload.
+    """
+
+    def __init__(self, path: Path = P_SETTING, interval: float = SETTING_WATCH_INTERVAL) -> None:
+        self.path = path
+        self.interval = interval
+        self.__lock = threading.Lock()
+        self.__settings: Optional[InstrumentSetting] = None
+        self.__mtime: Optional[float] = None
+        self.__subscribers: list[Callable[[InstrumentSetting], None]] = []
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+        self.reload()
+
+    def get(self) -> Optional[InstrumentSetting]:
+        with self.__lock:
+            return self.__settings
+
+    def subscribe(self, callback: Callable[[InstrumentSetting], None]) -> None:
+        with self.__lock:
+            self.__subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[InstrumentSetting], None]) -> None:
+        with self.__lock:
+            if callback in self.__subscribers:
+                self.__subscribers.remove(callback)
+
+    def get_mtime(self) -> Optional[float]:
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    def reload(self) -> bool:
+        """
+        Returns
+        -------
+        bool
+            True if new settings are swapped in
+        """
+        mtime = self.get_mtime()
+        try:
+            settings = InstrumentSetting.parse_file(self.path)
+        except (error_wrappers.ValidationError, ValueError, OSError) as error:
+            logger.error(error)
+            with self.__lock:
+                # Same invalid file is not parsed again until it is modified
+                self.__mtime = mtime
+            return False
+
+        with self.__lock:
+            self.__settings = settings
+            self.__mtime = mtime
+            subscribers = list(self.__subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(settings)
+            except Exception as error:
+                logger.error(error)
+
+        return True
+
+    def check(self) -> bool:
+        """
+        Reload when the file is modified
+        """
+        mtime = self.get_mtime()
+        with self.__lock:
+            is_modified = mtime is not None and mtime != self.__mtime
+        if is_modified:
+            return self.reload()
+        return False
+
+    def start(self) -> None:
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __run(self) -> None:
+        while not self.__stop_event.wait(self.interval):
+            self.check()
+
+
+setting_service = SettingService()
+
+
 if __name__ == "__main__":
     print(read_json_file())
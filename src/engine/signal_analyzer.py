@@ -17,13 +17,14 @@ class FreqResponse(TypedDict):
 
 
 class SignalAnalyzer(VisaDriver):
-    def __init__(self, p_capture: Path) -> None:
+    def __init__(self, p_capture: Path, read_termination: str = "") -> None:
         super().__init__()
+        self.read_termination = read_termination
         today_str = get_today_string()
         self.p_capture = p_capture / today_str
 
     def connect(self, address: str) -> bool:
-        return self.set_resource(address=address, idn_pattern=SIGNAL_ANALYZER_IDN_PATTERN, read_termination="")
+        return self.set_resource(address=address, idn_pattern=SIGNAL_ANALYZER_IDN_PATTERN, read_termination=self.read_termination)
 
     def get_freq_start(self) -> Optional[float]:
         freq_start_str = self.query(data="freq:start?")
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional, TypedDict
+
+from src.engine.signal_analyzer import FreqResponse
+
+if TYPE_CHECKING:
+    import numpy as np
+
+OBW_PERCENT_DEFAULT = 99.0
+
+
+class SpectrumMetricsDict(TypedDict):
+    point_count: int
+    peak_frequency: float
+    peak_power: float
+    # Median of points outside the occupied band in dBm per point
+    noise_floor: float
+    snr: float
+    obw: float
+    obw_low: float
+    obw_high: float
+    obw_center: float
+    obw_percent: float
+    channel_power: Optional[float]
+    channel_center: float
+    channel_bandwidth: float
+
+
+def dbm_to_mw(power: np.ndarray) -> np.ndarray:
+    import numpy as np
+
+    return np.power(10.0, power / 10)
+
+
+def mw_to_dbm(power: np.ndarray | float) -> np.ndarray | float:
+    import numpy as np
+
+    return 10 * np.log10(power)
+
+
+def get_occupied_band(frequency: np.ndarray, power_mw: np.ndarray, obw_percent: float) -> tuple[float, float]:
+    """
+    Frequencies between which obw_percent % of the total power is, with (100 - obw_percent) / 2 % outside on each side
+    """
+    import numpy as np
+
+    cumulative = np.cumsum(power_mw)
+    total = cumulative[-1]
+    outside = (1 - obw_percent / 100) / 2
+    low = float(np.interp(outside * total, cumulative, frequency))
+    high = float(np.interp((1 - outside) * total, cumulative, frequency))
+    return low, high
+
+
+def analyze_spectrum(
+    freq_response: FreqResponse,
+    obw_percent: float = OBW_PERCENT_DEFAULT,
+    channel_center: Optional[float] = None,
+    channel_bandwidth: Optional[float] = None,
+    rbw: Optional[float] = None,
+) -> SpectrumMetricsDict:
+    """
+    Metrics of a trace of SignalAnalyzer.get_data, power in dBm and frequency in Hz.
+
+    Parameters
+    ----------
+    obw_percent : float, optional
+        Percentage of power in the occupied bandwidth
+    channel_center : Optional[float]
+        Center of the channel for channel power, the center of the occupied band without it
+    channel_bandwidth : Optional[float]
+        Width of the channel for channel power, the whole span without it
+    rbw : Optional[float]
+        Resolution bandwidth of the trace. Channel power is scaled by the point spacing / rbw with it,
+        which is needed when points are closer than rbw, otherwise it is the sum of points
+
+    Raises
+    ------
+    ValueError
+        For an empty trace, different lengths of frequency and power or obw_percent out of (0, 100)
+    """
+    import numpy as np
+
+    frequency = np.asarray(freq_response["frequency"], dtype=float)
+    power = np.asarray(freq_response["power"], dtype=float)
+    if len(frequency) == 0 or len(frequency) != len(power):
+        raise ValueError(f"Invalid trace: {len(frequency)} frequencies and {len(power)} powers")
+    if not 0 < obw_percent < 100:
+        raise ValueError(f"obw_percent must be in (0, 100): {obw_percent}")
+
+    power_mw = dbm_to_mw(power)
+    i_peak = int(np.argmax(power))
+    obw_low, obw_high = get_occupied_band(frequency, power_mw, obw_percent)
+
+    is_outside = (frequency < obw_low) | (frequency > obw_high)
+    # A band over the whole span leaves no points for the noise floor
+    noise_mw = power_mw[is_outside] if np.count_nonzero(is_outside) > 0 else power_mw
+    noise_floor = float(mw_to_dbm(np.median(noise_mw)))
+
+    span = float(frequency[-1] - frequency[0])
+    center = (obw_low + obw_high) / 2 if channel_center is None else channel_center
+    bandwidth = span if channel_bandwidth is None else channel_bandwidth
+    is_in_channel = np.abs(frequency - center) <= bandwidth / 2
+    channel_power: Optional[float] = None
+    if np.count_nonzero(is_in_channel) > 0:
+        channel_mw = float(np.sum(power_mw[is_in_channel]))
+        if rbw is not None and len(frequency) > 1:
+            channel_mw *= span / (len(frequency) - 1) / rbw
+        channel_power = float(mw_to_dbm(channel_mw))
+
+    return {
+        "point_count": len(frequency),
+        "peak_frequency": float(frequency[i_peak]),
+        "peak_power": float(power[i_peak]),
+        "noise_floor": noise_floor,
+        "snr": float(power[i_peak]) - noise_floor,
+        "obw": obw_high - obw_low,
+        "obw_low": obw_low,
+        "obw_high": obw_high,
+        "obw_center": (obw_low + obw_high) / 2,
+        "obw_percent": obw_percent,
+        "channel_power": channel_power,
+        "channel_center": center,
+        "channel_bandwidth": bandwidth,
+    }
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, Literal, Optional, TypedDict
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# log averages dBm values like the log-power average of analyzers, power averages mW and is reported in dBm
+AverageType = Literal["log", "power"]
+
+
+class TraceAccumulationDict(TypedDict):
+    count: int
+    average_type: AverageType
+    started_at: Optional[float]
+    updated_at: Optional[float]
+    restart_count: int
+    frequency: list[float]
+    # dBm, variance is of values in the average type, dB^2 for log and mW^2 for power
+    mean: list[float]
+    max: list[float]
+    min: list[float]
+    variance: list[float]
+
+
+class TraceAccumulator:
+    """
+    Running mean and variance by Welford's algorithm, max hold and min hold of traces in preallocated arrays.
+    Arrays are allocated at the first trace and updated in place, so memory does not grow with the number of sweeps.
+    """
+
+    def __init__(self, average_type: AverageType = "log") -> None:
+        self.average_type = average_type
+        self.__lock = threading.Lock()
+        self.__count = 0
+        self.__restart_count = 0
+        self.__started_at: Optional[float] = None
+        self.__updated_at: Optional[float] = None
+        self.__frequency: Optional[np.ndarray] = None
+        self.__mean: Optional[np.ndarray] = None
+        self.__m2: Optional[np.ndarray] = None
+        self.__max: Optional[np.ndarray] = None
+        self.__min: Optional[np.ndarray] = None
+        self.__delta: Optional[np.ndarray] = None
+        self.__value: Optional[np.ndarray] = None
+
+    def reset(self, average_type: Optional[AverageType] = None) -> None:
+        with self.__lock:
+            if average_type is not None:
+                self.average_type = average_type
+            self.__count = 0
+            self.__restart_count = 0
+            self.__started_at = None
+            self.__updated_at = None
+            self.__frequency = None
+
+    def get_count(self) -> int:
+        return self.__count
+
+    def add(self, frequency: list[float], power: list[float]) -> bool:
+        """
+        Accumulate a trace in dBm. When the frequencies differ from the accumulated ones, for example after the span is changed,
+        the accumulation restarts from this trace.
+
+        Returns
+        -------
+        bool
+            False if the accumulation restarted
+        """
+        import numpy as np
+
+        with self.__lock:
+            is_same = (
+                self.__frequency is not None
+                and len(frequency) == len(self.__frequency)
+                and len(power) == len(self.__frequency)
+                and np.array_equal(self.__frequency, frequency)
+            )
+            is_restarted = False
+            if not is_same:
+                if len(frequency) != len(power):
+                    raise ValueError(f"Invalid trace: {len(frequency)} frequencies and {len(power)} powers")
+                n = len(frequency)
+                is_restarted = self.__frequency is not None
+                if is_restarted:
+                    self.__restart_count += 1
+                self.__count = 0
+                self.__started_at = time.time()
+                self.__frequency = np.asarray(frequency, dtype=float)
+                if self.__mean is None or len(self.__mean) != n:
+                    self.__mean = np.empty(n)
+                    self.__m2 = np.empty(n)
+                    self.__max = np.empty(n)
+                    self.__min = np.empty(n)
+                    self.__delta = np.empty(n)
+                    self.__value = np.empty(n)
+
+            assert self.__mean is not None and self.__m2 is not None and self.__max is not None and self.__min is not None
+            assert self.__delta is not None and self.__value is not None
+            value = self.__value
+            value[:] = power
+            if self.__count == 0:
+                self.__max[:] = value
+                self.__min[:] = value
+            else:
+                np.maximum(self.__max, value, out=self.__max)
+                np.minimum(self.__min, value, out=self.__min)
+            if self.average_type == "power":
+                np.divide(value, 10, out=value)
+                np.power(10.0, value, out=value)
+
+            self.__count += 1
+            if self.__count == 1:
+                self.__mean[:] = value
+                self.__m2.fill(0)
+            else:
+                # m2 += delta * (value - new mean) = delta^2 * (count - 1) / count, mean += delta / count
+                delta = self.__delta
+                np.subtract(value, self.__mean, out=delta)
+                np.multiply(delta, delta, out=value)
+                value *= (self.__count - 1) / self.__count
+                self.__m2 += value
+                delta /= self.__count
+                self.__mean += delta
+            self.__updated_at = time.time()
+            return not is_restarted
+
+    def get_result(self) -> Optional[TraceAccumulationDict]:
+        """
+        None before the first trace
+        """
+        import numpy as np
+
+        with self.__lock:
+            if self.__frequency is None or self.__count == 0:
+                return None
+            assert self.__mean is not None and self.__m2 is not None and self.__max is not None and self.__min is not None
+            mean = 10 * np.log10(self.__mean) if self.average_type == "power" else self.__mean.copy()
+            variance = self.__m2 / (self.__count - 1) if self.__count > 1 else np.zeros(len(self.__m2))
+            return {
+                "count": self.__count,
+                "average_type": self.average_type,
+                "started_at": self.__started_at,
+                "updated_at": self.__updated_at,
+                "restart_count": self.__restart_count,
+                "frequency": self.__frequency.tolist(),
+                "mean": mean.tolist(),
+                "max": self.__max.tolist(),
+                "min": self.__min.tolist(),
+                "variance": variance.tolist(),
+            }
@@ -1,19 +1,36 @@
 from __future__ import annotations
 
-import psutil
+from typing import Any, Optional
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
 
 import src.common.settings
+import src.routers.bench
 import src.routers.bus
+import src.routers.jobs
 import src.routers.obs
+import src.routers.sequence
 import src.routers.trans
 from src.common.decorator import exception
+from src.common.health_monitor import DeviceHealthDict, health_monitor
+from src.common.job_scheduler import job_scheduler
 from src.common.logger import set_logger
+from src.common.metrics import MetricsMiddleware, render_metrics
+from src.common.path_cache import shared_drives_cache
+from src.common.pid_registry import PidRegistry, scan_pids
+from src.common.response_encoding import LAYOUT_HEADER, METADATA_HEADER
+from src.common.sync_uploader import SyncBacklogDict, sync_uploader
+from src.common.tracing import tracer
+from src.engine.read_instrument_settings import setting_service
 
 API_NAME = "sat_auto_test_api"
+JOB_SHUTDOWN_TIMEOUT = 10  # s
+SYNC_SHUTDOWN_TIMEOUT = 10  # s
 LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
 logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
+pid_registry = PidRegistry(p_dir=src.common.settings.pid_registry_path, name=API_NAME)
 
 app = FastAPI()
 
@@ -21,8 +38,18 @@ origins = [
     "http://localhost:3000",
 ]
 
-app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    # Read by the frontend to decode binary responses
+    expose_headers=[LAYOUT_HEADER, METADATA_HEADER],
+)
+app.add_middleware(MetricsMiddleware, routes=app.routes)
 
+app.include_router(src.routers.bench.router, prefix="/bench", tags=["bench"])
 app.include_router(src.routers.bus.router, prefix="/bus", tags=["bus"])
 app.include_router(src.routers.bus.router_bus_jig, prefix="/bus/busJig", tags=["bus"])
 app.include_router(src.routers.bus.router_sas, prefix="/bus/sas", tags=["bus"])
@@ -37,6 +64,32 @@ app.include_router(src.routers.trans.router_common, prefix="/trans/common", tags
 app.include_router(src.routers.trans.router_qdra, prefix="/trans/qdra", tags=["trans"])
 app.include_router(src.routers.trans.router_qmr, prefix="/trans/qmr", tags=["trans"])
 app.include_router(src.routers.trans.router_test, prefix="/trans/test", tags=["trans"])
+app.include_router(src.routers.jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(src.routers.sequence.router, prefix="/sequence", tags=["sequence"])
+
+
+@app.on_event("startup")
+async def start_background_services() -> None:
+    try:
+        pid_registry.register()
+        pid_registry.register_parent()
+    except Exception as error:
+        logger.error(error)
+    setting_service.start()
+    health_monitor.start()
+    sync_uploader.start()
+    shared_drives_cache.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_services() -> None:
+    job_scheduler.shutdown(timeout=JOB_SHUTDOWN_TIMEOUT)
+    # Files not uploaded yet stay in the queue and are uploaded after the next startup
+    sync_uploader.stop(timeout=SYNC_SHUTDOWN_TIMEOUT)
+    health_monitor.stop()
+    setting_service.stop()
+    shared_drives_cache.stop()
+    pid_registry.unregister()
 
 
 @app.get("/")
@@ -45,19 +98,65 @@ async def read_root() -> dict[str, bool]:
 
 
 @app.get("/getPid")
-async def get_pid() -> dict[str, bool | list[int]]:
+async def get_pid(fullScan: bool = False) -> dict[str, bool | list[int]]:  # noqa
+    """
+    PIDs of the API from the registry. fullScan walks all processes instead, slow but finds processes not registered.
+    """
+
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | list[int]]:
-        pid_list: list[int] = []
-        for proc in psutil.process_iter():
-            try:
-                for c in proc.cmdline():
-                    if API_NAME in str(c) and "python" in str(proc.exe()):
-                        pid_list.append(proc.pid)
-                        break
-            except psutil.AccessDenied:
-                pass
-
-        return {"success": True, "data": pid_list}
+        if fullScan:
+            return {"success": True, "data": scan_pids(API_NAME)}
+        return {"success": True, "data": pid_registry.get_pids()}
 
     return wrapper()
+
+
+@app.get("/health")
+async def get_health() -> dict[str, bool | dict[str, DeviceHealthDict]]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | dict[str, DeviceHealthDict]]:
+        return {"success": True, "data": health_monitor.get_all()}
+
+    return wrapper()
+
+
+@app.get("/sync")
+async def get_sync_backlog() -> dict[str, bool | SyncBacklogDict]:
+    """
+    Backlog of uploads from the local staging directory to shared drives
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | SyncBacklogDict]:
+        return {"success": True, "data": sync_uploader.get_backlog()}
+
+    return wrapper()
+
+
+@app.get("/sync/retry")
+async def retry_sync() -> dict[str, bool | int]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | int]:
+        return {"success": True, "data": sync_uploader.retry_failed()}
+
+    return wrapper()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> str:
+    return render_metrics()
+
+
+@app.get("/trace")
+async def get_trace(category: Optional[str] = None) -> dict[str, Any]:
+    """
+    Recorded spans in Chrome trace-event format. Save the response as .json and open it in Perfetto UI.
+    """
+    return tracer.to_chrome_trace(category=category)
+
+
+@app.get("/trace/clear")
+async def clear_trace() -> dict[str, bool]:
+    tracer.clear()
+    return {"success": True}
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+
+import src.common.settings
+import src.routers.bus
+import src.routers.obs
+import src.routers.trans
+from src.common.decorator import exception
+from src.common.health_monitor import health_monitor
+from src.common.job_scheduler import job_scheduler
+from src.common.logger import set_logger
+from src.common.serial_driver import SerialDriver
+from src.common.visa_driver import VisaDriver
+from src.engine.bench import BENCH_DEFAULT_DEADLINE, BenchResultDict, run_concurrently
+from src.engine.read_instrument_settings import SerialSetting, setting_service
+
+LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
+logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
+
+router = APIRouter()
+
+
+def make_serial_connect_task(serial: SerialDriver, setting: SerialSetting) -> Callable[[], bool]:
+    def task() -> bool:
+        if not serial.get_port_status():
+            serial.set_port(port=setting.port, baudrate=setting.baudrate, parity=setting.parity)
+        return serial.get_port_status()
+
+    return task
+
+
+def make_visa_connect_task(connect: Callable[[str], bool], visa: VisaDriver, address: str, reconnects: bool) -> Callable[[], bool]:
+    def task() -> bool:
+        if reconnects or not visa.get_open_status():
+            connect(address)
+        return visa.get_open_status()
+
+    return task
+
+
+def make_connect_tasks(reconnects: bool) -> dict[str, Callable[[], bool]]:
+    settings = setting_service.get()
+    if settings is None:
+        return {}
+    bus_test = src.routers.bus.get_bus_test()
+    obs_test = src.routers.obs.get_obs_test()
+    trans_test = src.routers.trans.get_trans_test()
+
+    def connect_qdra() -> bool:
+        trans_test.is_on_qdra = health_monitor.probe_now("qdra")
+        return trans_test.is_on_qdra
+
+    def connect_qmr() -> bool:
+        trans_test.is_on_qmr = health_monitor.probe_now("qmr")
+        return trans_test.is_on_qmr
+
+    return {
+        "bus_jig": make_serial_connect_task(bus_test.bus_jig, bus_test.bus_jig_setting),
+        "sas": make_serial_connect_task(bus_test.sas, bus_test.sas_setting),
+        "gl840": make_visa_connect_task(lambda address: bus_test.gl840.connect(address=address), bus_test.gl840, settings.gl840.visa, reconnects),
+        "power_sensor": make_visa_connect_task(
+            lambda address: obs_test.power_sensor.connect(address=address), obs_test.power_sensor, settings.power_sensor.visa, reconnects
+        ),
+        "signal_analyzer": make_visa_connect_task(
+            lambda address: obs_test.signal_analyzer.connect(address=address), obs_test.signal_analyzer, settings.signal_analyzer.visa, reconnects
+        ),
+        "qdra": connect_qdra,
+        "qmr": connect_qmr,
+    }
+
+
+def make_open_status_getters() -> dict[str, Callable[[], bool]]:
+    bus_test = src.routers.bus.get_bus_test()
+    obs_test = src.routers.obs.get_obs_test()
+    trans_test = src.routers.trans.get_trans_test()
+
+    return {
+        "bus_jig": bus_test.bus_jig.get_port_status,
+        "sas": bus_test.sas.get_port_status,
+        "gl840": bus_test.gl840.get_open_status,
+        "power_sensor": obs_test.power_sensor.get_open_status,
+        "signal_analyzer": obs_test.signal_analyzer.get_open_status,
+        "qdra": lambda: trans_test.is_on_qdra,
+        "qmr": lambda: trans_test.is_on_qmr,
+    }
+
+
+def make_verify_tasks() -> dict[str, Callable[[], bool]]:
+    bus_test = src.routers.bus.get_bus_test()
+    obs_test = src.routers.obs.get_obs_test()
+    trans_test = src.routers.trans.get_trans_test()
+
+    return {
+        "bus_jig": bus_test.bus_jig.get_port_status,
+        "sas": bus_test.sas.get_port_status,
+        "gl840": lambda: bus_test.gl840.get_open_status() and health_monitor.probe_now("gl840"),
+        "power_sensor": lambda: obs_test.power_sensor.get_open_status() and health_monitor.probe_now("power_sensor"),
+        "signal_analyzer": lambda: obs_test.signal_analyzer.get_open_status() and health_monitor.probe_now("signal_analyzer"),
+        "qdra": lambda: trans_test.is_on_qdra and health_monitor.probe_now("qdra"),
+        "qmr": lambda: trans_test.is_on_qmr and health_monitor.probe_now("qmr"),
+    }
+
+
+def select_tasks(tasks: dict[str, Callable[[], bool]], devices: Optional[str]) -> dict[str, Callable[[], bool]]:
+    """
+    devices: comma separated device names, all devices when None
+    """
+    if devices is None:
+        return tasks
+    names = [name.strip() for name in devices.split(",")]
+    return {name: task for name, task in tasks.items() if name in names}
+
+
+@router.get("/connect")
+async def bench_connect(
+    deadline: float = BENCH_DEFAULT_DEADLINE, devices: Optional[str] = None, reconnect: bool = False
+) -> dict[str, bool | str | dict[str, BenchResultDict]]:
+    """
+    Connect all instruments in settings concurrently. Already open instruments are kept unless reconnect is true.
+    Instruments reserved by a job are not touched and reported as "busy", because reconnecting would break the job.
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | dict[str, BenchResultDict]]:
+        tasks = select_tasks(make_connect_tasks(reconnects=reconnect), devices)
+        if len(tasks) == 0:
+            return {"success": False, "error": "No device"}
+        busy_names = [name for name in tasks if job_scheduler.is_reserved(name)]
+        results = run_concurrently(tasks={name: task for name, task in tasks.items() if name not in busy_names}, deadline=deadline)
+        get_open_status_dict = make_open_status_getters()
+        for name in busy_names:
+            results[name] = {"is_open": get_open_status_dict[name](), "status": "busy", "elapsed": None, "error": "busy"}
+        return {"success": all(result["is_open"] for result in results.values()), "data": results}
+
+    return await run_in_threadpool(wrapper)
+
+
+@router.get("/verify")
+async def bench_verify(deadline: float = BENCH_DEFAULT_DEADLINE, devices: Optional[str] = None) -> dict[str, bool | str | dict[str, BenchResultDict]]:
+    """
+    Check concurrently that every instrument is open and reachable now
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | dict[str, BenchResultDict]]:
+        tasks = select_tasks(make_verify_tasks(), devices)
+        if len(tasks) == 0:
+            return {"success": False, "error": "No device"}
+        results = run_concurrently(tasks=tasks, deadline=deadline)
+        return {"success": all(result["is_open"] for result in results.values()), "data": results}
+
+    return await run_in_threadpool(wrapper)
@@ -1,9 +1,18 @@
 from __future__ import annotations
 
+import threading
+from typing import Optional
+
 from fastapi import APIRouter
 
 import src.common.settings
 from src.common.decorator import exception
+from src.common.health_monitor import (
+    get_visa_probe_interval,
+    health_monitor,
+    make_visa_probe,
+)
+from src.common.job_scheduler import job_scheduler
 from src.common.logger import set_logger
 from src.engine.bus_jig import BusJigSerial
 from src.engine.gl840 import Gl840Visa
@@ -11,7 +20,7 @@ from src.engine.read_instrument_settings import (
     InstrumentSetting,
     SasOutputSetting,
     SasRepeatSetting,
-    read_json_file,
+    setting_service,
 )
 from src.engine.sas import SasSerial
 
@@ -31,10 +40,47 @@ class BusTest:
         self.sas_setting = settings.sas.serial
         self.sas = SasSerial()
 
+    def update_settings(self, settings: InstrumentSetting) -> None:
+        """
+        Apply reloaded settings. Open ports and connections are kept.
+        """
+        self.bus_jig_setting = settings.bus_jig.serial
+        self.gl840_setting = settings.gl840.visa
+        self.sas_setting = settings.sas.serial
+
+
+bus_test: Optional[BusTest] = None
+bus_test_lock = threading.Lock()
+
+
+def get_bus_test() -> BusTest:
+    """
+    BusTest is made at first request to shorten startup time
+    """
+    global bus_test
+    with bus_test_lock:
+        if bus_test is None:
+            settings = setting_service.get()
+            if settings is None:
+                raise RuntimeError("Instrument setting is not valid")
+            bus_test = BusTest(settings=settings)
+            setting_service.subscribe(bus_test.update_settings)
+        return bus_test
+
+
+def register_health_probes(settings: InstrumentSetting) -> None:
+    health_monitor.register(
+        "gl840",
+        make_visa_probe(settings.gl840.visa, is_open=lambda: bus_test is not None and bus_test.gl840.get_open_status()),
+        target=settings.gl840.visa,
+        interval=get_visa_probe_interval(settings.gl840.visa),
+    )
+
 
-settings = read_json_file()
+settings = setting_service.get()
 if settings is not None:
-    bus_test = BusTest(settings=settings)
+    register_health_probes(settings)
+setting_service.subscribe(register_health_probes)
 
 router = APIRouter()
 router_bus_jig = APIRouter()
@@ -51,9 +97,10 @@ async def bus_hello() -> dict[str, str]:
 async def bus_jig_connect(accessPoint: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         baudrate = bus_test.bus_jig_setting.baudrate
         parity = bus_test.bus_jig_setting.parity
-        is_success = bus_test.bus_jig.set_port(port=accessPoint.upper(), baudrate=baudrate, parity=parity)
+        is_success = bus_test.bus_jig.set_port(port=accessPoint, baudrate=baudrate, parity=parity)
         if is_success:
             return {"success": True, "isOpen": bus_test.bus_jig.get_port_status()}
         else:
@@ -66,6 +113,7 @@ async def bus_jig_connect(accessPoint: str) -> dict[str, bool | str]:  # noqa
 async def bus_jig_disconnect() -> dict[str, bool]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         bus_test.bus_jig.close_port()
         return {"success": True, "isOpen": bus_test.bus_jig.get_port_status()}
 
@@ -76,9 +124,12 @@ async def bus_jig_disconnect() -> dict[str, bool]:
 async def sat_ena() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.bus_jig.get_port_status()
         if not is_open:
             return {"success": False, "error": "Not open: bus jig"}
+        if job_scheduler.is_reserved("bus_jig"):
+            return {"success": False, "error": "busy"}
         bus_test.bus_jig.send_sat_ena()
         return {"success": True}
 
@@ -89,9 +140,12 @@ async def sat_ena() -> dict[str, bool | str]:
 async def sat_dis() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.bus_jig.get_port_status()
         if not is_open:
             return {"success": False, "error": "Not open: bus jig"}
+        if job_scheduler.is_reserved("bus_jig"):
+            return {"success": False, "error": "busy"}
         bus_test.bus_jig.send_sat_dis()
         return {"success": True}
 
@@ -102,6 +156,7 @@ async def sat_dis() -> dict[str, bool | str]:
 async def gl840_connect(accessPoint: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         bus_test.gl840.connect(address=accessPoint)
         return {"success": True, "isOpen": bus_test.gl840.get_open_status()}
 
@@ -112,6 +167,7 @@ async def gl840_connect(accessPoint: str) -> dict[str, bool | str]:  # noqa
 async def gl840_disconnect() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         bus_test.gl840.disconnect()
         return {"success": True, "isOpen": bus_test.gl840.get_open_status()}
 
@@ -122,9 +178,12 @@ async def gl840_disconnect() -> dict[str, bool | str]:
 async def gl840_record_start() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.gl840.get_open_status()
         if not is_open:
             return {"success": False, "error": "Not open: gl840"}
+        if job_scheduler.is_reserved("gl840"):
+            return {"success": False, "error": "busy"}
         bus_test.gl840.record_start()
         return {"success": True}
 
@@ -135,9 +194,12 @@ async def gl840_record_start() -> dict[str, bool | str]:
 async def gl840_record_stop() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.gl840.get_open_status()
         if not is_open:
             return {"success": False, "error": "Not open: gl840"}
+        if job_scheduler.is_reserved("gl840"):
+            return {"success": False, "error": "busy"}
         bus_test.gl840.record_stop()
         return {"success": True}
 
@@ -148,9 +210,10 @@ async def gl840_record_stop() -> dict[str, bool | str]:
 async def sas_connect(accessPoint: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         baudrate = bus_test.sas_setting.baudrate
         parity = bus_test.sas_setting.parity
-        is_success = bus_test.sas.set_port(port=accessPoint.upper(), baudrate=baudrate, parity=parity)
+        is_success = bus_test.sas.set_port(port=accessPoint, baudrate=baudrate, parity=parity)
         if is_success:
             return {"success": True, "isOpen": bus_test.sas.get_port_status()}
         else:
@@ -163,6 +226,7 @@ async def sas_connect(accessPoint: str) -> dict[str, bool | str]:  # noqa
 async def sas_disconnect() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         bus_test.sas.close_port()
         return {"success": True, "isOpen": bus_test.sas.get_port_status()}
 
@@ -173,9 +237,12 @@ async def sas_disconnect() -> dict[str, bool | str]:
 async def sas_on(voc: float, isc: float, fillFactor: float) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.sas.get_port_status()
         if not is_open:
             return {"success": False, "error": "Not open: SAS"}
+        if job_scheduler.is_reserved("sas"):
+            return {"success": False, "error": "busy"}
         setting = SasOutputSetting(voc=voc, isc=isc, fill_factor=fillFactor)
         bus_test.sas.output(onoff="on", setting=setting)
         return {"success": True, "isOn": bus_test.sas.get_output_status()}
@@ -187,9 +254,12 @@ async def sas_on(voc: float, isc: float, fillFactor: float) -> dict[str, bool |
 async def sas_repeat_on(voc: float, isc: float, fillFactor: float, orbitPeriod: int, sunRate: float, offset: int) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.sas.get_port_status()
         if not is_open:
             return {"success": False, "error": "Not open: SAS"}
+        if job_scheduler.is_reserved("sas"):
+            return {"success": False, "error": "busy"}
         output_setting = SasOutputSetting(voc=voc, isc=isc, fill_factor=fillFactor)
         repeat_setting = SasRepeatSetting(orbit_period=orbitPeriod, sun_rate=sunRate, offset=offset, interval=1)
         bus_test.sas.repeat_on(output_setting=output_setting, repeat_setting=repeat_setting)
@@ -202,9 +272,12 @@ async def sas_repeat_on(voc: float, isc: float, fillFactor: float, orbitPeriod:
 async def sas_off() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        bus_test = get_bus_test()
         is_open = bus_test.sas.get_port_status()
         if not is_open:
             return {"success": False, "error": "Not open: SAS"}
+        if job_scheduler.is_reserved("sas"):
+            return {"success": False, "error": "busy"}
         bus_test.sas.repeat_off()
         return {"success": True, "isOn": bus_test.sas.get_repeat_status()}
 
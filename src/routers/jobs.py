@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+
+import src.common.settings
+from src.common.decorator import exception
+from src.common.job_scheduler import JobStatusDict, job_scheduler
+from src.common.logger import set_logger
+
+LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
+logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
+
+router = APIRouter()
+
+
+@router.get("/list")
+async def list_jobs() -> dict[str, bool | list[JobStatusDict] | dict[str, str]]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | list[JobStatusDict] | dict[str, str]]:
+        return {"success": True, "data": job_scheduler.get_all(), "reservations": job_scheduler.get_reservations()}
+
+    return wrapper()
+
+
+@router.get("/status")
+async def get_job_status(jobId: str) -> dict[str, bool | str | JobStatusDict]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | JobStatusDict]:
+        status = job_scheduler.get_status(jobId)
+        if status is None:
+            return {"success": False, "error": f"Not exist: job {jobId}"}
+        return {"success": True, "data": status}
+
+    return wrapper()
+
+
+@router.get("/result")
+async def get_job_result(jobId: str) -> dict[str, bool | str | JobStatusDict | Any]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | JobStatusDict | Any]:
+        status, result = job_scheduler.get_result(jobId)
+        if status is None:
+            return {"success": False, "error": f"Not exist: job {jobId}"}
+        if status["state"] != "succeeded":
+            return {"success": False, "error": f"Not succeeded: {status['state']}", "status": status}
+        return {"success": True, "data": result, "status": status}
+
+    return wrapper()
+
+
+@router.get("/cancel")
+async def cancel_job(jobId: str, timeout: Optional[float] = None) -> dict[str, bool | str]:  # noqa
+    """
+    Request cancellation and wait for the job to stop up to timeout s. Without timeout, only the request is sent.
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        is_finished = job_scheduler.cancel(jobId, timeout=0 if timeout is None else timeout)
+        if is_finished is None:
+            return {"success": False, "error": f"Not exist: job {jobId}"}
+        return {"success": True, "isFinished": is_finished}
+
+    return await run_in_threadpool(wrapper)
@@ -1,117 +1,252 @@
 from __future__ import annotations
 
 import threading
+from functools import partial
 from pathlib import Path
-from time import perf_counter, sleep
-from typing import Optional
+from time import perf_counter
+from typing import Optional, Sequence
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
+from starlette.concurrency import run_in_threadpool
 
 import src.common.settings
 from src.common import general
+from src.common.background_writer import BackgroundWriter, WriterStatsDict
+from src.common.decimation import MINMAX_MIN_POINTS, DecimationMethod, decimation_cache
 from src.common.decorator import exception
-from src.common.general import get_today_string, resolve_path_shared_drives
+from src.common.general import get_today_string
+from src.common.health_monitor import (
+    get_visa_probe_interval,
+    health_monitor,
+    make_visa_probe,
+)
+from src.common.job_scheduler import JobContext, job_scheduler
 from src.common.logger import set_logger
+from src.common.path_cache import shared_drives_cache
+from src.common.response_encoding import ArrayDtype, encode_arrays, negotiate_format
+from src.common.sampler import PeriodicSampler, SamplerStatsDict
+from src.common.sync_uploader import sync_uploader
+from src.common.tracing import tracer
 from src.engine.power_sensor import PowerSensor
-from src.engine.read_instrument_settings import InstrumentSetting, read_json_file
-from src.engine.signal_analyzer import FreqResponse, SignalAnalyzer
+from src.engine.read_instrument_settings import InstrumentSetting, setting_service
+from src.engine.signal_analyzer import SignalAnalyzer
+from src.engine.spectrum_analysis import (
+    OBW_PERCENT_DEFAULT,
+    SpectrumMetricsDict,
+    analyze_spectrum,
+)
+from src.engine.trace_accumulator import AverageType, TraceAccumulator
 
 LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
 logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
 
+OBS_JOB_RESOURCES = ["power_sensor", "signal_analyzer"]
+# Added to the test durations for captures and saving files
+OBS_JOB_TIMEOUT_MARGIN = 60  # s
+POWER_SAMPLING_INTERVAL = 0.1  # s
+WARM_UP_CAPTURE_INTERVAL = 1  # s
+DECIMATION_MIN_POINTS = MINMAX_MIN_POINTS
+TRACE_ACCUMULATION_RESOURCES = ["signal_analyzer"]
+# The accumulation fails after this number of consecutive failed traces
+TRACE_ACCUMULATION_MAX_ERRORS = 10
+TRACE_ACCUMULATION_STOP_TIMEOUT = 10  # s
+
 
 class ObsTest:
     def __init__(self, settings: InstrumentSetting) -> None:
-        self.__is_busy = False
-        self.p_save = resolve_path_shared_drives(Path(settings.common.default_path))
+        self.job_id: Optional[str] = None
+        self.p_save = shared_drives_cache.resolve(Path(settings.common.default_path))
 
-        self.power_sensor = PowerSensor()
+        self.power_sensor = PowerSensor(read_termination=settings.power_sensor.read_termination)
         self.power_log: Optional[float] = None
         self.power_sensor_data: Optional[dict[str, list[float]]] = None
+        self.trace_accumulator = TraceAccumulator()
+        self.accumulation_job_id: Optional[str] = None
+        # Job ID of the run of power_sensor_data, the key of decimation_cache
+        self.power_sensor_run_id: Optional[str] = None
+        self.power_sampler_stats: Optional[SamplerStatsDict] = None
+        self.writer_stats: Optional[WriterStatsDict] = None
 
         p_capture = Path(settings.signal_analyzer.capture_path)
-        self.signal_analyzer = SignalAnalyzer(p_capture=p_capture)
-
-    def set_busy(self) -> None:
-        self.__is_busy = True
+        self.signal_analyzer = SignalAnalyzer(p_capture=p_capture, read_termination=settings.signal_analyzer.read_termination)
 
-    def set_not_busy(self) -> None:
-        self.__is_busy = False
+    def update_settings(self, settings: InstrumentSetting) -> None:
+        """
+        Apply reloaded settings. Open connections and the save directory are kept, read terminations are used at next connection.
+        """
+        self.power_sensor.read_termination = settings.power_sensor.read_termination
+        self.signal_analyzer.read_termination = settings.signal_analyzer.read_termination
+        self.signal_analyzer.p_capture = Path(settings.signal_analyzer.capture_path) / get_today_string()
 
     def get_busy_status(self) -> bool:
-        return self.__is_busy
-
-    def get_obs_data(self, test_name: str, obs_duration: int, warm_up_duration: int, hold_duration: int) -> Optional[dict[str, list[float]]]:
-        def get_power_data() -> None:
-            interval = 0.1
-            elapsed_time = 0.0
-            time_start = perf_counter()
-            time_list: list[float] = []
-            power_list: list[float] = []
-
-            while elapsed_time <= (obs_duration + warm_up_duration):
-                sleep(interval)
-                elapsed_time = perf_counter() - time_start
-                data = self.power_sensor.get_data()
+        return job_scheduler.is_active(self.job_id)
+
+    def get_obs_data(
+        self, context: JobContext, test_name: str, obs_duration: int, warm_up_duration: int, hold_duration: int
+    ) -> Optional[dict[str, list[float]]]:
+        """
+        Run as a job of job_scheduler. Each step checks context, so the test stops soon after cancellation.
+        """
+
+        def get_power_data(writer: BackgroundWriter) -> None:
+            def set_power_log(data: Optional[float]) -> None:
                 self.power_log = data
-                if data is not None:
-                    time_list.append(elapsed_time)
-                    power_list.append(data)
-                if not self.get_busy_status():
-                    break
+
+            sampler = PeriodicSampler(func=self.power_sensor.get_data, interval=POWER_SAMPLING_INTERVAL)
+            with tracer.span("obs.power_polling", category="obs"):
+                sampled_data, stats = sampler.run(duration=obs_duration + warm_up_duration, cancel_event=context.cancel_event, on_sample=set_power_log)
 
             filename_stem = "obs"
             p_csv = p_dir / f"{filename_stem}.csv"
-            dict_data = {"time": time_list, "power": power_list}
+            p_local_csv = p_local_dir / p_csv.name
+            # time is the deadline of each sample on the uniform grid, request_time and response_time are measured around the query
+            dict_data = {
+                "time": sampled_data["time"],
+                "power": sampled_data["value"],
+                "request_time": sampled_data["request_time"],
+                "response_time": sampled_data["response_time"],
+            }
             self.power_sensor_data = dict_data
-            general.save_csv_from_dict(data=dict_data, path=p_csv)
-
-        self.set_busy()
-
-        if self.p_save is not None:
-            p_dir = self.p_save / test_name
-            if not p_dir.exists():
-                p_dir.mkdir()
+            self.power_sensor_run_id = context.job_id
+            self.power_sampler_stats = stats
+            writer.put("save_csv", partial(general.save_csv_from_dict, data=dict_data, path=p_local_csv))
+            writer.put("enqueue_sync", partial(sync_uploader.enqueue, p_csv))
+
+        with tracer.span("obs.get_obs_data", category="obs", test_name=test_name):
+            if self.p_save is not None:
+                # Files are written in the local staging directory and uploaded to p_save by sync_uploader
+                p_dir = self.p_save / test_name
+                p_local_dir = sync_uploader.stage_path(p_dir)
+                p_local_dir.mkdir(exist_ok=True)
+
+                self.power_sensor_data = None
+                self.power_sampler_stats = None
+                self.writer_stats = None
+                # Files are written by writer, so slow Google Drive does not delay captures and power sampling
+                writer = BackgroundWriter(name="obs_writer")
+                writer.start()
+                t = threading.Thread(target=get_power_data, args=(writer,), name="obs_power_polling")
+                try:
+                    t.start()
+
+                    # Captures start on the grid of WARM_UP_CAPTURE_INTERVAL from the start, same as power data
+                    time_start = perf_counter()
+                    for test_num in range(warm_up_duration):
+                        deadline = test_num * WARM_UP_CAPTURE_INTERVAL
+                        if context.cancel_event.wait(max(deadline - (perf_counter() - time_start), 0)) or context.is_cancelled():
+                            break
+                        picture_name = f"before_obs_{test_num}"
+                        filename = f"{picture_name}.png"
+                        path = p_dir / filename
+                        with tracer.span("obs.warm_up_capture", category="obs", index=test_num):
+                            data = self.signal_analyzer.get_capture(picture_name=picture_name, deletes_picture=True)
+                        if data is not None:
+                            writer.put("save_picture", partial(general.save_picture_from_binary_list, data=data, path=p_local_dir / filename))
+                            writer.put("enqueue_sync", partial(sync_uploader.enqueue, path))
+
+                    with tracer.span("obs.wait_warm_up", category="obs"):
+                        context.cancel_event.wait(max(warm_up_duration * WARM_UP_CAPTURE_INTERVAL - (perf_counter() - time_start), 0))
+                    self.signal_analyzer.send_restart_command()
+                    filename_stem = "obs"
+                    p_png = p_dir / f"{filename_stem}.png"
+
+                    with tracer.span("obs.hold", category="obs"):
+                        for _ in range(hold_duration):
+                            if not context.sleep(1):
+                                break
+
+                    if not context.is_cancelled():
+                        with tracer.span("obs.capture", category="obs"):
+                            capture = self.signal_analyzer.get_capture(picture_name=filename_stem, deletes_picture=True)
+                        if capture is not None:
+                            writer.put("save_picture", partial(general.save_picture_from_binary_list, data=capture, path=p_local_dir / p_png.name))
+                            writer.put("enqueue_sync", partial(sync_uploader.enqueue, p_png))
+
+                    with tracer.span("obs.join_power_polling", category="obs"):
+                        t.join()
+                finally:
+                    if t.is_alive():
+                        # After an error, power sampling is stopped so that obs.csv is put to writer before it is closed
+                        context.cancel()
+                        t.join()
+                    with tracer.span("obs.close_writer", category="obs"):
+                        if not writer.close():
+                            logger.error("Timeout: obs writer")
+                    self.writer_stats = writer.get_stats()
 
-            self.power_sensor_data = None
-            t = threading.Thread(target=get_power_data)
-            t.start()
+        return self.power_sensor_data
 
-            for test_num in range(warm_up_duration):
-                if not self.get_busy_status():
+    def accumulate_traces(self, context: JobContext, average_type: AverageType, interval: float, max_count: Optional[int], resets: bool) -> int:
+        """
+        Run as a job of job_scheduler, add traces to trace_accumulator until cancelled or max_count traces are added.
+        The accumulation continues from the current result without resets, unless average_type is changed.
+
+        Returns
+        -------
+        int
+            Number of accumulated traces
+        """
+        if resets or average_type != self.trace_accumulator.average_type:
+            self.trace_accumulator.reset(average_type=average_type)
+        added_count = 0
+        error_count = 0
+        with tracer.span("obs.accumulate_traces", category="obs"):
+            while not context.is_cancelled():
+                if max_count is not None and added_count >= max_count:
                     break
-                picture_name = f"before_obs_{test_num}"
-                filename = f"{picture_name}.png"
-                path = p_dir / filename
-                data = self.signal_analyzer.get_capture(picture_name=picture_name, deletes_picture=True)
-                if data is not None:
-                    general.save_picture_from_binary_list(data=data, path=path)
-                sleep(1)
-
-            self.signal_analyzer.send_restart_command()
-            filename_stem = "obs"
-            p_png = p_dir / f"{filename_stem}.png"
-
-            for _ in range(hold_duration):
-                if not self.get_busy_status():
+                data = self.signal_analyzer.get_data(trace_num=1)
+                if data is None:
+                    error_count += 1
+                    if error_count >= TRACE_ACCUMULATION_MAX_ERRORS:
+                        raise RuntimeError(f"Trace none {error_count} times")
+                else:
+                    error_count = 0
+                    added_count += 1
+                    if not self.trace_accumulator.add(frequency=data["frequency"], power=data["power"]):
+                        logger.info("Trace accumulation restarted because frequencies changed")
+                if interval > 0 and not context.sleep(interval):
                     break
-                sleep(1)
-
-            if self.get_busy_status():
-                capture = self.signal_analyzer.get_capture(picture_name=filename_stem, deletes_picture=True)
-                if capture is not None:
-                    general.save_picture_from_binary_list(data=capture, path=p_png)
-
-            t.join()
-
-        self.set_not_busy()
-
-        return self.power_sensor_data
-
-
-settings = read_json_file()
+        return self.trace_accumulator.get_count()
+
+
+obs_test: Optional[ObsTest] = None
+obs_test_lock = threading.Lock()
+
+
+def get_obs_test() -> ObsTest:
+    """
+    ObsTest is made at first request to shorten startup time
+    """
+    global obs_test
+    with obs_test_lock:
+        if obs_test is None:
+            settings = setting_service.get()
+            if settings is None:
+                raise RuntimeError("Instrument setting is not valid")
+            obs_test = ObsTest(settings=settings)
+            setting_service.subscribe(obs_test.update_settings)
+        return obs_test
+
+
+def register_health_probes(settings: InstrumentSetting) -> None:
+    health_monitor.register(
+        "power_sensor",
+        make_visa_probe(settings.power_sensor.visa, is_open=lambda: obs_test is not None and obs_test.power_sensor.get_open_status()),
+        target=settings.power_sensor.visa,
+        interval=get_visa_probe_interval(settings.power_sensor.visa),
+    )
+    health_monitor.register(
+        "signal_analyzer",
+        make_visa_probe(settings.signal_analyzer.visa, is_open=lambda: obs_test is not None and obs_test.signal_analyzer.get_open_status()),
+        target=settings.signal_analyzer.visa,
+        interval=get_visa_probe_interval(settings.signal_analyzer.visa),
+    )
+
+
+settings = setting_service.get()
 if settings is not None:
-    obs_test = ObsTest(settings=settings)
+    register_health_probes(settings)
+setting_service.subscribe(register_health_probes)
 
 router = APIRouter()
 router_common = APIRouter()
@@ -129,12 +264,12 @@ async def obs_hello() -> dict[str, str]:
 async def make_dir(pathStr: str, project: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        path = resolve_path_shared_drives(Path(pathStr))
+        obs_test = get_obs_test()
+        path = shared_drives_cache.resolve(Path(pathStr))
         if path is None:
             return {"success": False, "error": "Not exist: dir"}
         p_dir = path / project / "auto_test" / "obs" / get_today_string()
-        if not p_dir.exists():
-            p_dir.mkdir(parents=True)
+        shared_drives_cache.make_dir(p_dir)
         obs_test.p_save = p_dir
 
         return {"success": True, "data": str(p_dir)}
@@ -146,6 +281,7 @@ async def make_dir(pathStr: str, project: str) -> dict[str, bool | str]:  # noqa
 async def connect_power_sensor(accessPoint: str) -> dict[str, bool]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
+        obs_test = get_obs_test()
         obs_test.power_sensor.connect(address=accessPoint)
         return {"success": True, "isOpen": obs_test.power_sensor.get_open_status()}
 
@@ -156,6 +292,7 @@ async def connect_power_sensor(accessPoint: str) -> dict[str, bool]:  # noqa
 async def disconnect_power_sensor() -> dict[str, bool]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
+        obs_test = get_obs_test()
         obs_test.power_sensor.disconnect()
         return {"success": True, "isOpen": obs_test.power_sensor.get_open_status()}
 
@@ -166,6 +303,7 @@ async def disconnect_power_sensor() -> dict[str, bool]:
 async def get_data_power_sensor() -> dict[str, bool | str | float]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str | float]:
+        obs_test = get_obs_test()
         is_open = obs_test.power_sensor.get_open_status()
 
         if not is_open:
@@ -182,6 +320,7 @@ async def get_data_power_sensor() -> dict[str, bool | str | float]:
 async def get_data_power_sensor_log() -> dict[str, bool | str | float]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str | float]:
+        obs_test = get_obs_test()
         data = obs_test.power_log
         if data is None:
             return {"success": False, "error": "Data none"}
@@ -194,6 +333,7 @@ async def get_data_power_sensor_log() -> dict[str, bool | str | float]:
 async def connect_signal_analyzer(accessPoint: str) -> dict[str, bool]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
+        obs_test = get_obs_test()
         obs_test.signal_analyzer.connect(address=accessPoint)
         return {"success": True, "isOpen": obs_test.signal_analyzer.get_open_status()}
 
@@ -204,6 +344,7 @@ async def connect_signal_analyzer(accessPoint: str) -> dict[str, bool]:  # noqa
 async def disconnect_signal_analyzer() -> dict[str, bool]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
+        obs_test = get_obs_test()
         obs_test.signal_analyzer.disconnect()
         return {"success": True, "isOpen": obs_test.signal_analyzer.get_open_status()}
 
@@ -214,9 +355,12 @@ async def disconnect_signal_analyzer() -> dict[str, bool]:
 async def restart_signal_analyzer() -> dict[str, bool | str]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
+        obs_test = get_obs_test()
         is_open = obs_test.signal_analyzer.get_open_status()
         if not is_open:
             return {"success": False, "error": "Not open: signal analyzer"}
+        if job_scheduler.is_reserved("signal_analyzer"):
+            return {"success": False, "error": "busy"}
 
         obs_test.signal_analyzer.send_restart_command()
         return {"success": True}
@@ -225,16 +369,174 @@ async def restart_signal_analyzer() -> dict[str, bool | str]:
 
 
 @router_signal_analyzer.get("/getTrace")
-async def get_trace_signal_analyzer() -> dict[str, bool | str | FreqResponse]:
+async def get_trace_signal_analyzer(
+    request: Request,
+    responseFormat: Optional[str] = None,  # noqa
+    maxPoints: Optional[int] = None,  # noqa
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    method: DecimationMethod = "minmax",
+) -> dict[str, bool | str] | Response:
+    """
+    responseFormat or Accept header selects json (default), binary or arrow, see encode_arrays.
+    The trace is reduced to maxPoints in start <= frequency <= end by min/max or LTTB decimation of power.
+    """
+
     @exception(logger=logger)
-    def wrapper() -> dict[str, bool | str | FreqResponse]:
+    def wrapper() -> dict[str, bool | str] | Response:
+        try:
+            response_format = negotiate_format(responseFormat, request.headers.get("accept"))
+        except ValueError as error:
+            return {"success": False, "error": str(error)}
+        if maxPoints is not None and maxPoints < DECIMATION_MIN_POINTS:
+            return {"success": False, "error": f"maxPoints must be at least {DECIMATION_MIN_POINTS}"}
+        obs_test = get_obs_test()
         is_open = obs_test.signal_analyzer.get_open_status()
         if not is_open:
             return {"success": False, "error": "Not open: signal analyzer"}
+        # Queries of a job using the signal analyzer, Ex) obs test or trace accumulation, would be mixed with these
+        if job_scheduler.is_reserved("signal_analyzer"):
+            return {"success": False, "error": "busy"}
         data = obs_test.signal_analyzer.get_data(trace_num=1)
         if data is None:
             return {"success": False, "error": "Data none"}
-        return {"success": True, "data": data}
+        if maxPoints is None and start is None and end is None:
+            return encode_arrays({"frequency": (data["frequency"], "float64"), "power": (data["power"], "float32")}, {}, response_format)
+
+        import numpy as np
+
+        indices, decimation = decimation_cache.decimate(None, data["frequency"], data["power"], max_points=maxPoints, start=start, end=end, method=method)
+        arrays: dict[str, tuple[Sequence[float], ArrayDtype]] = {
+            "frequency": (np.asarray(data["frequency"])[indices], "float64"),
+            "power": (np.asarray(data["power"])[indices], "float32"),
+        }
+        return encode_arrays(arrays, {"decimation": decimation}, response_format)
+
+    return wrapper()
+
+
+@router_signal_analyzer.get("/getMetrics")
+async def get_metrics_signal_analyzer(
+    obwPercent: float = OBW_PERCENT_DEFAULT,  # noqa
+    channelCenter: Optional[float] = None,  # noqa
+    channelBandwidth: Optional[float] = None,  # noqa
+    rbw: Optional[float] = None,
+) -> dict[str, bool | str | SpectrumMetricsDict]:
+    """
+    Peak, occupied bandwidth, channel power and SNR of the current trace without the trace itself, see analyze_spectrum
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | SpectrumMetricsDict]:
+        obs_test = get_obs_test()
+        is_open = obs_test.signal_analyzer.get_open_status()
+        if not is_open:
+            return {"success": False, "error": "Not open: signal analyzer"}
+        # Queries of a job using the signal analyzer, Ex) obs test or trace accumulation, would be mixed with these
+        if job_scheduler.is_reserved("signal_analyzer"):
+            return {"success": False, "error": "busy"}
+        data = obs_test.signal_analyzer.get_data(trace_num=1)
+        if data is None:
+            return {"success": False, "error": "Data none"}
+        try:
+            metrics = analyze_spectrum(data, obw_percent=obwPercent, channel_center=channelCenter, channel_bandwidth=channelBandwidth, rbw=rbw)
+        except ValueError as error:
+            return {"success": False, "error": str(error)}
+        return {"success": True, "data": metrics}
+
+    return wrapper()
+
+
+@router_signal_analyzer.get("/accumulateStart")
+async def start_accumulation(
+    averageType: AverageType = "log",  # noqa
+    interval: float = 0,
+    maxCount: Optional[int] = None,  # noqa
+    resets: bool = True,
+) -> dict[str, bool | str]:
+    """
+    Fetch traces in background and accumulate mean, variance, max and min until accumulateStop or maxCount more traces.
+    interval is the wait in s between traces. With resets false, the accumulation continues from the current result.
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        obs_test = get_obs_test()
+        is_open = obs_test.signal_analyzer.get_open_status()
+        if not is_open:
+            return {"success": False, "error": "Not open: signal analyzer"}
+        job_id = job_scheduler.submit(
+            name="obs.accumulate_traces",
+            func=lambda context: obs_test.accumulate_traces(context, average_type=averageType, interval=interval, max_count=maxCount, resets=resets),
+            resources=TRACE_ACCUMULATION_RESOURCES,
+        )
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        obs_test.accumulation_job_id = job_id
+        return {"success": True, "jobId": job_id}
+
+    return wrapper()
+
+
+@router_signal_analyzer.get("/accumulateStop")
+async def stop_accumulation() -> dict[str, bool | int]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | int]:
+        obs_test = get_obs_test()
+        if obs_test.accumulation_job_id is not None:
+            job_scheduler.cancel(obs_test.accumulation_job_id, timeout=TRACE_ACCUMULATION_STOP_TIMEOUT)
+        return {"success": True, "count": obs_test.trace_accumulator.get_count()}
+
+    return await run_in_threadpool(wrapper)
+
+
+@router_signal_analyzer.get("/accumulateReset")
+async def reset_accumulation() -> dict[str, bool]:
+    """
+    Clear the result, a running accumulation continues from the next trace
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool]:
+        obs_test = get_obs_test()
+        obs_test.trace_accumulator.reset()
+        return {"success": True}
+
+    return wrapper()
+
+
+@router_signal_analyzer.get("/getAccumulated")
+async def get_accumulated(request: Request, responseFormat: Optional[str] = None) -> dict[str, bool | str] | Response:  # noqa
+    """
+    responseFormat or Accept header selects json (default), binary or arrow, see encode_arrays
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str] | Response:
+        try:
+            response_format = negotiate_format(responseFormat, request.headers.get("accept"))
+        except ValueError as error:
+            return {"success": False, "error": str(error)}
+        obs_test = get_obs_test()
+        result = obs_test.trace_accumulator.get_result()
+        if result is None:
+            return {"success": False, "error": "Data none"}
+        arrays: dict[str, tuple[Sequence[float], ArrayDtype]] = {
+            "frequency": (result["frequency"], "float64"),
+            "mean": (result["mean"], "float32"),
+            "max": (result["max"], "float32"),
+            "min": (result["min"], "float32"),
+            "variance": (result["variance"], "float32"),
+        }
+        metadata = {
+            "count": result["count"],
+            "averageType": result["average_type"],
+            "startedAt": result["started_at"],
+            "updatedAt": result["updated_at"],
+            "restartCount": result["restart_count"],
+            "isRunning": job_scheduler.is_active(obs_test.accumulation_job_id),
+        }
+        return encode_arrays(arrays, metadata, response_format)
 
     return wrapper()
 
@@ -243,9 +545,12 @@ async def get_trace_signal_analyzer() -> dict[str, bool | str | FreqResponse]:
 async def get_capture_signal_analyzer(pictureName: str) -> dict[str, bool | str | list[int | float]]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str | list[int | float]]:
+        obs_test = get_obs_test()
         is_open = obs_test.signal_analyzer.get_open_status()
         if not is_open:
             return {"success": False, "error": "Not open: signal analyzer"}
+        if job_scheduler.is_reserved("signal_analyzer"):
+            return {"success": False, "error": "busy"}
         data = obs_test.signal_analyzer.get_capture(picture_name="capture_test", deletes_picture=True)
         if data is None:
             return {"success": False, "error": "Data none"}
@@ -255,7 +560,8 @@ async def get_capture_signal_analyzer(pictureName: str) -> dict[str, bool | str
             return {"success": False, "error": "Not exist: dir"}
 
         path = obs_test.p_save / f"{pictureName}.png"
-        general.save_picture_from_binary_list(data=data, path=path)
+        general.save_picture_from_binary_list(data=data, path=sync_uploader.stage_path(path))
+        sync_uploader.enqueue(path)
         return {"success": True, "data": str(path)}
 
     return wrapper()
@@ -265,6 +571,7 @@ async def get_capture_signal_analyzer(pictureName: str) -> dict[str, bool | str
 async def get_chirp_waveform(testName: str, obsDuration: int, warmUpDuration: int, holdDuration: int) -> dict[str, bool | str | dict[str, list[float]]]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str | dict[str, list[float]]]:
+        obs_test = get_obs_test()
         is_open_power_sensor = obs_test.power_sensor.get_open_status()
         is_open_signal_analyzer = obs_test.signal_analyzer.get_open_status()
         if not is_open_power_sensor:
@@ -278,21 +585,59 @@ async def get_chirp_waveform(testName: str, obsDuration: int, warmUpDuration: in
         if not obs_test.p_save.exists():
             return {"success": False, "error": "Not exist: dir"}
 
-        t = threading.Thread(target=obs_test.get_obs_data, args=(testName, obsDuration, warmUpDuration, holdDuration))
-        t.start()
-        return {"success": True}
+        job_id = job_scheduler.submit(
+            name="obs.get_obs_data",
+            func=lambda context: obs_test.get_obs_data(context, testName, obsDuration, warmUpDuration, holdDuration),
+            resources=OBS_JOB_RESOURCES,
+            timeout=obsDuration + warmUpDuration + holdDuration + OBS_JOB_TIMEOUT_MARGIN,
+        )
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        obs_test.job_id = job_id
+        return {"success": True, "jobId": job_id}
 
     return wrapper()
 
 
 @router_test.get("/getObsPowerSensorData")
-async def get_obs_power_sensor_data() -> dict[str, bool | str | dict[str, list[float]]]:
+async def get_obs_power_sensor_data(
+    request: Request,
+    responseFormat: Optional[str] = None,  # noqa
+    maxPoints: Optional[int] = None,  # noqa
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    method: DecimationMethod = "minmax",
+) -> dict[str, bool | str] | Response:
+    """
+    responseFormat or Accept header selects json (default), binary or arrow, see encode_arrays.
+    The data is reduced to maxPoints in start <= time <= end by min/max or LTTB decimation of power.
+    Decimation levels are cached for each run, so repeated zooms do not scan all data.
+    """
+
     @exception(logger=logger)
-    def wrapper() -> dict[str, bool | str | dict[str, list[float]]]:
+    def wrapper() -> dict[str, bool | str] | Response:
+        try:
+            response_format = negotiate_format(responseFormat, request.headers.get("accept"))
+        except ValueError as error:
+            return {"success": False, "error": str(error)}
+        if maxPoints is not None and maxPoints < DECIMATION_MIN_POINTS:
+            return {"success": False, "error": f"maxPoints must be at least {DECIMATION_MIN_POINTS}"}
+        obs_test = get_obs_test()
         data = obs_test.power_sensor_data
         if data is None:
             return {"success": False, "error": "Data none"}
-        return {"success": True, "data": data}
+        metadata = {"stats": obs_test.power_sampler_stats, "writerStats": obs_test.writer_stats}
+        dtypes: dict[str, ArrayDtype] = {"time": "float64", "power": "float32", "request_time": "float64", "response_time": "float64"}
+        if maxPoints is None and start is None and end is None:
+            return encode_arrays({name: (data[name], dtype) for name, dtype in dtypes.items()}, metadata, response_format)
+
+        import numpy as np
+
+        indices, decimation = decimation_cache.decimate(
+            obs_test.power_sensor_run_id, data["time"], data["power"], max_points=maxPoints, start=start, end=end, method=method
+        )
+        arrays: dict[str, tuple[Sequence[float], ArrayDtype]] = {name: (np.asarray(data[name])[indices], dtype) for name, dtype in dtypes.items()}
+        return encode_arrays(arrays, {**metadata, "decimation": decimation}, response_format)
 
     return wrapper()
 
@@ -301,7 +646,9 @@ async def get_obs_power_sensor_data() -> dict[str, bool | str | dict[str, list[f
 async def stop_obs() -> dict[str, bool]:
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
-        obs_test.set_not_busy()
+        obs_test = get_obs_test()
+        if obs_test.job_id is not None:
+            job_scheduler.cancel(obs_test.job_id, timeout=0)
         return {"success": True}
 
     return wrapper()
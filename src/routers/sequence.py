@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, ValidationError
+
+import src.common.settings
+from src.common.decorator import exception
+from src.common.health_monitor import health_monitor
+from src.common.job_scheduler import JobContext, job_scheduler
+from src.common.logger import set_logger
+from src.common.sequence import (
+    SequenceActionDict,
+    SequenceError,
+    SequenceRun,
+    SequenceStatusDict,
+    parse_sequence,
+)
+from src.engine.qmr import ModcodType
+from src.engine.read_instrument_settings import SasOutputSetting
+from src.routers.bus import get_bus_test
+from src.routers.obs import get_obs_test
+from src.routers.trans import get_trans_test
+
+LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
+logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
+
+# Runs are forgotten from the oldest when the number of runs exceeds this
+MAX_SEQUENCE_RUNS = 20
+
+
+class ModcodParams(BaseModel):
+    modcod: ModcodType
+
+
+class RecordParams(BaseModel):
+    session_name: str
+    duration: int
+
+
+class ObsParams(BaseModel):
+    test_name: str
+    obs_duration: int
+    warm_up_duration: int
+    hold_duration: int
+
+
+def sas_on(params: SasOutputSetting, context: JobContext) -> bool:
+    bus_test = get_bus_test()
+    if not bus_test.sas.get_port_status():
+        raise RuntimeError("Not open: SAS")
+    bus_test.sas.output(onoff="on", setting=params)
+    return bus_test.sas.get_output_status()
+
+
+def sas_off(params: Any, context: JobContext) -> bool:
+    bus_test = get_bus_test()
+    if not bus_test.sas.get_port_status():
+        raise RuntimeError("Not open: SAS")
+    bus_test.sas.output(onoff="off")
+    return not bus_test.sas.get_output_status()
+
+
+def sat_ena(params: Any, context: JobContext) -> None:
+    bus_test = get_bus_test()
+    if not bus_test.bus_jig.get_port_status():
+        raise RuntimeError("Not open: bus jig")
+    bus_test.bus_jig.send_sat_ena()
+
+
+def sat_dis(params: Any, context: JobContext) -> None:
+    bus_test = get_bus_test()
+    if not bus_test.bus_jig.get_port_status():
+        raise RuntimeError("Not open: bus jig")
+    bus_test.bus_jig.send_sat_dis()
+
+
+def gl840_record_start(params: Any, context: JobContext) -> bool:
+    bus_test = get_bus_test()
+    if not bus_test.gl840.get_open_status():
+        raise RuntimeError("Not open: gl840")
+    return bus_test.gl840.record_start()
+
+
+def gl840_record_stop(params: Any, context: JobContext) -> bool:
+    bus_test = get_bus_test()
+    if not bus_test.gl840.get_open_status():
+        raise RuntimeError("Not open: gl840")
+    # record_stop returns the recording status
+    return not bus_test.gl840.record_stop()
+
+
+def qmr_change_modcod(params: ModcodParams, context: JobContext) -> bool:
+    trans_test = get_trans_test()
+    if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
+        raise RuntimeError("Not open: qMR")
+    return trans_test.change_modcod(modcod=params.modcod)
+
+
+def qdra_record_start(params: RecordParams, context: JobContext) -> bool:
+    trans_test = get_trans_test()
+    if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
+        raise RuntimeError("Not open: qDRA")
+    return trans_test.record_start(session_name=params.session_name, duration=params.duration)
+
+
+def qdra_record_stop(params: Any, context: JobContext) -> bool:
+    trans_test = get_trans_test()
+    if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
+        raise RuntimeError("Not open: qDRA")
+    return trans_test.record_stop()
+
+
+def signal_analyzer_restart(params: Any, context: JobContext) -> None:
+    obs_test = get_obs_test()
+    if not obs_test.signal_analyzer.get_open_status():
+        raise RuntimeError("Not open: signal analyzer")
+    obs_test.signal_analyzer.send_restart_command()
+
+
+def power_sensor_get_data(params: Any, context: JobContext) -> Optional[float]:
+    obs_test = get_obs_test()
+    if not obs_test.power_sensor.get_open_status():
+        raise RuntimeError("Not open: power sensor")
+    return obs_test.power_sensor.get_data()
+
+
+def obs_run(params: ObsParams, context: JobContext) -> bool:
+    """
+    Same test as /obs/test/startObs, the power sensor data is saved and kept in ObsTest
+    """
+    obs_test = get_obs_test()
+    if not obs_test.power_sensor.get_open_status():
+        raise RuntimeError("Not open: power sensor")
+    if not obs_test.signal_analyzer.get_open_status():
+        raise RuntimeError("Not open: signal analyzer")
+    if obs_test.p_save is None or not obs_test.p_save.exists():
+        raise RuntimeError("Not connect GDrive")
+    data = obs_test.get_obs_data(
+        context,
+        test_name=params.test_name,
+        obs_duration=params.obs_duration,
+        warm_up_duration=params.warm_up_duration,
+        hold_duration=params.hold_duration,
+    )
+    return data is not None
+
+
+SEQUENCE_ACTIONS: dict[str, SequenceActionDict] = {
+    "sas.on": {"func": sas_on, "params_model": SasOutputSetting, "resources": ["sas"]},
+    "sas.off": {"func": sas_off, "params_model": None, "resources": ["sas"]},
+    "bus_jig.sat_ena": {"func": sat_ena, "params_model": None, "resources": ["bus_jig"]},
+    "bus_jig.sat_dis": {"func": sat_dis, "params_model": None, "resources": ["bus_jig"]},
+    "gl840.record_start": {"func": gl840_record_start, "params_model": None, "resources": ["gl840"]},
+    "gl840.record_stop": {"func": gl840_record_stop, "params_model": None, "resources": ["gl840"]},
+    "qmr.change_modcod": {"func": qmr_change_modcod, "params_model": ModcodParams, "resources": ["qmr"]},
+    "qdra.record_start": {"func": qdra_record_start, "params_model": RecordParams, "resources": ["qdra"]},
+    "qdra.record_stop": {"func": qdra_record_stop, "params_model": None, "resources": ["qdra"]},
+    "signal_analyzer.restart": {"func": signal_analyzer_restart, "params_model": None, "resources": ["signal_analyzer"]},
+    "power_sensor.get_data": {"func": power_sensor_get_data, "params_model": None, "resources": ["power_sensor"]},
+    "obs.run": {"func": obs_run, "params_model": ObsParams, "resources": ["power_sensor", "signal_analyzer"]},
+}
+
+sequence_runs: OrderedDict[str, SequenceRun] = OrderedDict()
+sequence_runs_lock = threading.Lock()
+
+router = APIRouter()
+
+
+@router.get("/actions")
+async def get_actions() -> dict[str, bool | dict[str, Any]]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | dict[str, Any]]:
+        data = {
+            name: {
+                "resources": action["resources"],
+                "params": None if action["params_model"] is None else action["params_model"].schema()["properties"],
+            }
+            for name, action in SEQUENCE_ACTIONS.items()
+        }
+        return {"success": True, "data": data}
+
+    return wrapper()
+
+
+@router.post("/start")
+async def start_sequence(request: Request) -> dict[str, bool | str]:
+    """
+    Start a sequence given as the request body in JSON, or in YAML with a Content-Type including "yaml".
+    The sequence runs as a job, use /jobs endpoints to wait or cancel and /sequence/status to see each step.
+
+    Ex)
+        name: orbit_test
+        steps:
+          - {name: sas_on, action: sas.on, params: {voc: 60, isc: 1, fill_factor: 0.9}}
+          - {name: ena, action: bus_jig.sat_ena, after: [sas_on], delay: 2}
+          - {name: modcod, action: qmr.change_modcod, params: {modcod: 13}, at: 5, max_lateness: 0.1}
+          - {name: record, action: qdra.record_start, params: {session_name: test, duration: 60}, at: 5, max_lateness: 0.1}
+    """
+    body = await request.body()
+    is_yaml = "yaml" in request.headers.get("content-type", "")
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        try:
+            run = SequenceRun(definition=parse_sequence(body.decode(), is_yaml=is_yaml), actions=SEQUENCE_ACTIONS)
+        except (SequenceError, ValidationError, ValueError) as error:
+            return {"success": False, "error": str(error)}
+
+        job_id = job_scheduler.submit(name=f"sequence.{run.name}", func=run.run, resources=run.get_resources())
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        with sequence_runs_lock:
+            sequence_runs[job_id] = run
+            while len(sequence_runs) > MAX_SEQUENCE_RUNS:
+                sequence_runs.popitem(last=False)
+        return {"success": True, "jobId": job_id}
+
+    return wrapper()
+
+
+@router.get("/status")
+async def get_sequence_status(jobId: str) -> dict[str, bool | str | SequenceStatusDict]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | SequenceStatusDict]:
+        with sequence_runs_lock:
+            run = sequence_runs.get(jobId)
+        if run is None:
+            return {"success": False, "error": f"Not exist: sequence {jobId}"}
+        return {"success": True, "data": run.get_status()}
+
+    return wrapper()
@@ -1,36 +1,159 @@
 from __future__ import annotations
 
+import asyncio
+import threading
 from pathlib import Path
+from typing import Callable, List, Optional, Union, cast
 
 from fastapi import APIRouter
+from pydantic import BaseModel, StrictBool, StrictFloat, StrictInt, StrictStr
+from starlette.concurrency import run_in_threadpool
 
 import src.common.settings
-from src.common.decorator import exception
-from src.common.general import check_ping, get_today_string, resolve_path_shared_drives
+from src.common.decorator import async_exception, exception
+from src.common.general import check_ping, get_today_string
+from src.common.health_monitor import health_monitor
+from src.common.job_scheduler import JobContext, JobStatusDict, job_scheduler
 from src.common.logger import set_logger
-from src.engine.qdra import QdraSsh, record_start, record_stop
-from src.engine.qmr import ModcodType, change_modcod
-from src.engine.read_instrument_settings import InstrumentSetting, read_json_file
+from src.common.path_cache import shared_drives_cache
+from src.common.sync_uploader import sync_uploader
+from src.common.tracing import tracer
+from src.engine.qdra import (
+    CompressionType,
+    QdraAsyncRest,
+    QdraProcessingJob,
+    QdraRest,
+    QdraSsh,
+    TransferMode,
+)
+from src.engine.qmr import (
+    DEFAULT_COMPONENT,
+    AttributeValue,
+    FactoryType,
+    ModcodType,
+    QmrAsyncRest,
+    QmrAttributeCache,
+    QmrRest,
+    QmrSweep,
+    QmrSweepAxisDict,
+    guess_factory_type,
+    make_attribute,
+)
+from src.engine.read_instrument_settings import InstrumentSetting, setting_service
 
 LOGGER_IS_ACTIVE_STREAM = src.common.settings.logger_is_active_stream
 logger = set_logger(__name__, is_active_stream=LOGGER_IS_ACTIVE_STREAM)
 
+MAX_PROCESSING_JOBS = 20
+QDRA_JOB_RESOURCES = ["qdra"]
+QMR_JOB_RESOURCES = ["qmr"]
+
+# Strict types keep JSON type of value, otherwise pydantic converts numbers to str
+AttributeValueField = Union[StrictBool, StrictInt, StrictFloat, StrictStr]
+
+
+class QmrAttributeRequest(BaseModel):
+    name: str
+    value: AttributeValueField
+    component: str = DEFAULT_COMPONENT
+    factoryType: Optional[FactoryType] = None  # noqa
+
+
+class QmrWriteAttributesRequest(BaseModel):
+    attributes: List[QmrAttributeRequest]
+    force: bool = False
+
+
+class QmrSweepAxisRequest(BaseModel):
+    name: str
+    values: List[AttributeValueField]
+    component: str = DEFAULT_COMPONENT
+    factoryType: Optional[FactoryType] = None  # noqa
+
+
+class QmrSweepRequest(BaseModel):
+    axes: List[QmrSweepAxisRequest]
+    dwell: float = 0
+    readBack: bool = True  # noqa
+
 
 class TransTest:
     def __init__(self, settings: InstrumentSetting) -> None:
         self.__is_busy = False
-        self.p_save = resolve_path_shared_drives(Path(settings.common.default_path))
+        self.p_save = shared_drives_cache.resolve(Path(settings.common.default_path))
         self.trans_setting = settings.trans
-        self.qdra_setting = settings.qdra.network
-        self.qmr_setting = settings.qmr.network
         self.is_on_qdra = False
         self.is_on_qmr = False
+        self.qmr_cache = QmrAttributeCache()
+        self.qmr_sweep: Optional[QmrSweep] = None
+        self.qmr_sweep_job_id: Optional[str] = None
+        # Job ID of job_scheduler => processing
+        self.processing_jobs: dict[str, QdraProcessingJob] = {}
+        # processingStart and processingStatus are handled concurrently
+        self.__processing_jobs_lock = threading.Lock()
+        self.make_qdra_clients(settings)
+        self.make_qmr_clients(settings)
+
+    def make_qdra_clients(self, settings: InstrumentSetting) -> None:
+        self.qdra_setting = settings.qdra.network
+        self.qdra_rest = QdraRest(
+            ip_address=self.qdra_setting.ip_address,
+            port=self.qdra_setting.port,
+            timeout=self.qdra_setting.timeout,
+            retries=self.qdra_setting.retries,
+            pool_size=self.qdra_setting.pool_size,
+        )
+        self.qdra_async_rest = QdraAsyncRest(
+            ip_address=self.qdra_setting.ip_address,
+            port=self.qdra_setting.port,
+            timeout=self.qdra_setting.timeout,
+            retries=self.qdra_setting.retries,
+            pool_size=self.qdra_setting.pool_size,
+        )
 
-        qdra_ssh_setting = settings.qdra.ssh
+        self.qdra_ssh_setting = settings.qdra.ssh
         self.qdra_ssh = QdraSsh(
-            host=qdra_ssh_setting.ip_address, port=qdra_ssh_setting.port, username=qdra_ssh_setting.username, password=qdra_ssh_setting.password
+            host=self.qdra_ssh_setting.ip_address,
+            port=self.qdra_ssh_setting.port,
+            username=self.qdra_ssh_setting.username,
+            password=self.qdra_ssh_setting.password,
+        )
+
+    def make_qmr_clients(self, settings: InstrumentSetting) -> None:
+        self.qmr_setting = settings.qmr.network
+        self.qmr_rest = QmrRest(
+            ip_address=self.qmr_setting.ip_address,
+            port=self.qmr_setting.port,
+            timeout=self.qmr_setting.timeout,
+            retries=self.qmr_setting.retries,
+            pool_size=self.qmr_setting.pool_size,
+            cache=self.qmr_cache,
+        )
+        self.qmr_async_rest = QmrAsyncRest(
+            ip_address=self.qmr_setting.ip_address,
+            port=self.qmr_setting.port,
+            timeout=self.qmr_setting.timeout,
+            retries=self.qmr_setting.retries,
+            pool_size=self.qmr_setting.pool_size,
+            cache=self.qmr_cache,
         )
 
+    def update_settings(self, settings: InstrumentSetting) -> None:
+        """
+        Apply reloaded settings. Clients are made again only when their settings are changed, and the old ones are closed.
+        A running sweep keeps the old qMR client, which opens a new session for its remaining requests.
+        """
+        self.trans_setting = settings.trans
+        if settings.qdra.network != self.qdra_setting or settings.qdra.ssh != self.qdra_ssh_setting:
+            self.qdra_rest.close()
+            self.qdra_async_rest.close_soon()
+            self.make_qdra_clients(settings)
+        if settings.qmr.network != self.qmr_setting:
+            self.qmr_rest.close()
+            self.qmr_async_rest.close_soon()
+            self.qmr_cache.clear()
+            self.make_qmr_clients(settings)
+
     def set_busy(self) -> None:
         self.__is_busy = True
 
@@ -41,9 +164,7 @@ class TransTest:
         return self.__is_busy
 
     def change_modcod(self, modcod: ModcodType) -> bool:
-        ip_address = self.qmr_setting.ip_address
-        port = self.qmr_setting.port
-        response = change_modcod(ip_address=ip_address, port=port, modcod=modcod)
+        response = self.qmr_rest.change_modcod(modcod=modcod)
 
         if response == 200:
             return True
@@ -51,10 +172,8 @@ class TransTest:
             return False
 
     def record_start(self, session_name: str, duration: int) -> bool:
-        ip_address = self.qdra_setting.ip_address
-        port = self.qdra_setting.port
         session_desc = ""
-        response = record_start(ip_address=ip_address, port=port, session_name=session_name, session_desc=session_desc, duration=duration)
+        response = self.qdra_rest.record_start(session_name=session_name, session_desc=session_desc, duration=duration)
 
         if response == 200:
             return True
@@ -62,60 +181,154 @@ class TransTest:
             return False
 
     def record_stop(self) -> bool:
-        ip_address = self.qdra_setting.ip_address
-        port = self.qdra_setting.port
-        response = record_stop(ip_address=ip_address, port=port)
+        response = self.qdra_rest.record_stop()
 
         if response == 200:
             return True
         else:
             return False
 
-    def processing(self, session_name: str, path_str: str, p_script_str: str) -> tuple[str, str]:
-        self.set_busy()
-        stdout, stderr = self.qdra_ssh.exec_sh(session_name=session_name, path=Path(path_str), p_script=Path(p_script_str))
-        self.set_not_busy()
-        return stdout, stderr
+    async def change_modcod_async(self, modcod: ModcodType) -> bool:
+        response = await self.qmr_async_rest.change_modcod(modcod=modcod)
+        return response == 200
 
-    def get_processing_data(self, session_name: str, path_str: str, delete_flag: bool = False) -> bool:
-        self.set_busy()
-        path = Path(path_str)
-        p_from = path / session_name
-        exists = self.qdra_ssh.exists(Path(p_from))
-        if not exists:
-            return False
-        file_list = self.qdra_ssh.get_list_dir(path=p_from)
+    async def record_start_async(self, session_name: str, duration: int) -> bool:
+        session_desc = ""
+        response = await self.qdra_async_rest.record_start(session_name=session_name, session_desc=session_desc, duration=duration)
+        return response == 200
 
-        if self.p_save is not None:
-            p_to = self.p_save / session_name
-            if not p_to.exists():
-                p_to.mkdir(parents=True)
-            for f in file_list:
-                self.qdra_ssh.get_file(p_server=p_from / f, p_save=p_to / f)
-        if delete_flag:
-            self.qdra_ssh.delete_dir(p_from)
+    async def record_stop_async(self) -> bool:
+        response = await self.qdra_async_rest.record_stop()
+        return response == 200
 
-        self.set_not_busy()
-        return True
+    def processing(self, session_name: str, path_str: str, p_script_str: str) -> tuple[str, str]:
+        self.set_busy()
+        try:
+            return self.qdra_ssh.exec_sh(session_name=session_name, path=Path(path_str), p_script=Path(p_script_str))
+        finally:
+            self.set_not_busy()
+
+    def start_processing(self, session_name: str, path_str: str, p_script_str: str) -> Optional[str]:
+        """
+        Start processing script as a job of job_scheduler reserving qDRA and return job ID, None if qDRA is reserved.
+        Output of old finished jobs is forgotten when the number of jobs exceeds MAX_PROCESSING_JOBS.
+        """
+        job = QdraProcessingJob(qdra_ssh=self.qdra_ssh, session_name=session_name, path=Path(path_str), p_script=Path(p_script_str))
+        with self.__processing_jobs_lock:
+            finished_job_ids = [job_id for job_id, processing_job in self.processing_jobs.items() if processing_job.is_finished()]
+            for finished_job_id in finished_job_ids[: max(0, len(self.processing_jobs) - MAX_PROCESSING_JOBS + 1)]:
+                del self.processing_jobs[finished_job_id]
+
+            job_id = job_scheduler.submit(
+                name="trans.processing", func=lambda context: job.run(context.cancel_event), resources=QDRA_JOB_RESOURCES, on_finish=job.finish
+            )
+            if job_id is not None:
+                self.processing_jobs[job_id] = job
+        return job_id
+
+    def get_processing_job(self, job_id: str) -> Optional[QdraProcessingJob]:
+        with self.__processing_jobs_lock:
+            return self.processing_jobs.get(job_id)
+
+    def get_processing_data(
+        self,
+        session_name: str,
+        path_str: str,
+        delete_flag: bool = False,
+        transfer_mode: TransferMode = "sftp",
+        compression: CompressionType = "gzip",
+        context: Optional[JobContext] = None,
+    ) -> Optional[str]:
+        """
+        When run as a job, the data is not deleted if the job is cancelled during the download.
+        The data is downloaded into the local staging directory and uploaded to p_save in background by sync_uploader.
+        Neither deleted nor uploaded when the transfer failed.
+
+        Returns
+        -------
+        Optional[str]
+            Error, None on success
+        """
+        self.set_busy()
+        try:
+            with tracer.span("trans.get_processing_data", category="trans", session_name=session_name, transfer_mode=transfer_mode):
+                path = Path(path_str)
+                p_from = path / session_name
+                exists = self.qdra_ssh.exists(Path(p_from))
+                if not exists:
+                    return "Processing data not exist"
+
+                if self.p_save is not None:
+                    p_to = self.p_save / session_name
+                    is_transferred = self.qdra_ssh.get_dir(
+                        p_server=p_from, p_save=sync_uploader.stage_path(p_to), transfer_mode=transfer_mode, compression=compression
+                    )
+                    if not is_transferred:
+                        return "Cannot transfer"
+                    sync_uploader.enqueue(p_to)
+                if delete_flag and (context is None or not context.is_cancelled()):
+                    self.qdra_ssh.delete_dir(p_from)
+            return None
+        finally:
+            self.set_not_busy()
 
     def screenshot(self, session_name: str) -> bool:
         self.set_busy()
-        path = Path(f"Pictures/{session_name}.png")
-        self.qdra_ssh.screenshot(path)
-        exists = self.qdra_ssh.exists(path)
-
-        if self.p_save is not None:
-            p_to = self.p_save / session_name
-            if not p_to.exists():
-                p_to.mkdir(parents=True)
-            self.qdra_ssh.get_file(p_server=path, p_save=p_to / f"{session_name}.png")
-        self.set_not_busy()
-        return exists
-
-
-settings = read_json_file()
+        try:
+            path = Path(f"Pictures/{session_name}.png")
+            self.qdra_ssh.screenshot(path)
+            exists = self.qdra_ssh.exists(path)
+
+            if self.p_save is not None:
+                p_to = self.p_save / session_name / f"{session_name}.png"
+                self.qdra_ssh.get_file(p_server=path, p_save=sync_uploader.stage_path(p_to))
+                sync_uploader.enqueue(p_to)
+            return exists
+        finally:
+            self.set_not_busy()
+
+
+trans_test: Optional[TransTest] = None
+trans_test_lock = threading.Lock()
+
+
+def get_trans_test() -> TransTest:
+    """
+    TransTest is made at first request to shorten startup time
+    """
+    global trans_test
+    with trans_test_lock:
+        if trans_test is None:
+            settings = setting_service.get()
+            if settings is None:
+                raise RuntimeError("Instrument setting is not valid")
+            trans_test = TransTest(settings=settings)
+            setting_service.subscribe(trans_test.update_settings)
+        return trans_test
+
+
+def get_job_error(status: Optional[JobStatusDict]) -> Optional[str]:
+    """
+    Error of a job run by job_scheduler.submit_and_wait, None if it succeeded
+    """
+    if status is None:
+        return "busy"
+    if status["state"] == "succeeded":
+        return None
+    return status["error"] if status["error"] is not None else status["state"]
+
+
+def register_health_probes(settings: InstrumentSetting) -> None:
+    qdra_ip_address = settings.qdra.network.ip_address
+    qmr_ip_address = settings.qmr.network.ip_address
+    health_monitor.register("qdra", lambda: check_ping(qdra_ip_address), target=qdra_ip_address)
+    health_monitor.register("qmr", lambda: check_ping(qmr_ip_address), target=qmr_ip_address)
+
+
+settings = setting_service.get()
 if settings is not None:
-    trans_test = TransTest(settings=settings)
+    register_health_probes(settings)
+setting_service.subscribe(register_health_probes)
 
 router = APIRouter()
 router_common = APIRouter()
@@ -133,12 +346,12 @@ async def trans_hello() -> dict[str, str]:
 async def make_dir(pathStr: str, project: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        path = resolve_path_shared_drives(Path(pathStr))
+        trans_test = get_trans_test()
+        path = shared_drives_cache.resolve(Path(pathStr))
         if path is None:
             return {"success": False, "error": "Not exist: dir"}
         p_dir = path / project / "auto_test" / "trans" / get_today_string()
-        if not p_dir.exists():
-            p_dir.mkdir(parents=True)
+        shared_drives_cache.make_dir(p_dir)
         trans_test.p_save = p_dir
         return {"success": True, "data": str(p_dir)}
 
@@ -149,6 +362,7 @@ async def make_dir(pathStr: str, project: str) -> dict[str, bool | str]:  # noqa
 async def connect_qdra(accessPoint: str) -> dict[str, bool]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
+        trans_test = get_trans_test()
         is_success = check_ping(ip_address=accessPoint)
         if is_success:
             trans_test.is_on_qdra = True
@@ -161,34 +375,38 @@ async def connect_qdra(accessPoint: str) -> dict[str, bool]:  # noqa
 
 @router_qdra.get("/recordStart")
 async def qdra_record_start(sessionName: str, duration: int) -> dict[str, bool | str]:  # noqa
-    @exception(logger=logger)
-    def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+    @async_exception(logger=logger)
+    async def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
-        return {"success": trans_test.record_start(session_name=sessionName, duration=duration)}
+        if job_scheduler.is_reserved("qdra"):
+            return {"success": False, "error": "busy"}
+        return {"success": await trans_test.record_start_async(session_name=sessionName, duration=duration)}
 
-    return wrapper()
+    return await wrapper()
 
 
 @router_qdra.get("/recordStop")
 async def qdra_record_stop() -> dict[str, bool | str]:
-    @exception(logger=logger)
-    def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+    @async_exception(logger=logger)
+    async def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
-        return {"success": trans_test.record_stop()}
+        if job_scheduler.is_reserved("qdra"):
+            return {"success": False, "error": "busy"}
+        return {"success": await trans_test.record_stop_async()}
 
-    return wrapper()
+    return await wrapper()
 
 
 @router_qdra.get("/checkExistence")
 async def qdra_check_existence(pathStr: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
         exists = trans_test.qdra_ssh.exists(Path(pathStr))
         if exists:
@@ -203,8 +421,8 @@ async def qdra_check_existence(pathStr: str) -> dict[str, bool | str]:  # noqa
 async def qdra_make_dir(pathStr: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
         return {"success": trans_test.qdra_ssh.mkdir(Path(pathStr))}
 
@@ -215,6 +433,7 @@ async def qdra_make_dir(pathStr: str) -> dict[str, bool | str]:  # noqa
 async def connect_qmr(accessPoint: str) -> dict[str, bool]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool]:
+        trans_test = get_trans_test()
         is_success = check_ping(ip_address=accessPoint)
         if is_success:
             trans_test.is_on_qmr = True
@@ -227,53 +446,343 @@ async def connect_qmr(accessPoint: str) -> dict[str, bool]:  # noqa
 
 @router_qmr.get("/8psk_2_3")
 async def qmr_change_modcod_8psk_2_3() -> dict[str, bool | str]:
-    @exception(logger=logger)
-    def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qmr_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qmr:
+    @async_exception(logger=logger)
+    async def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
             return {"success": False, "error": "Not open: qMR"}
-        return {"success": trans_test.change_modcod(modcod=13)}
+        if job_scheduler.is_reserved("qmr"):
+            return {"success": False, "error": "busy"}
+        return {"success": await trans_test.change_modcod_async(modcod=13)}
 
-    return wrapper()
+    return await wrapper()
 
 
 @router_qmr.get("/8psk_5_6")
 async def qmr_change_modcod_8psk_5_6() -> dict[str, bool | str]:
+    @async_exception(logger=logger)
+    async def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
+            return {"success": False, "error": "Not open: qMR"}
+        if job_scheduler.is_reserved("qmr"):
+            return {"success": False, "error": "busy"}
+        return {"success": await trans_test.change_modcod_async(modcod=15)}
+
+    return await wrapper()
+
+
+@router_qmr.get("/readAttribute")
+async def qmr_read_attribute(name: str, component: str = DEFAULT_COMPONENT) -> dict[str, bool | str | AttributeValue]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | AttributeValue]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
+            return {"success": False, "error": "Not open: qMR"}
+        value = trans_test.qmr_rest.read_attribute(name=name, component=component)
+        if value is None:
+            return {"success": False, "error": f"Cannot read: {component}/{name}"}
+        return {"success": True, "data": value}
+
+    return wrapper()
+
+
+@router_qmr.post("/writeAttributes")
+async def qmr_write_attributes(request: QmrWriteAttributesRequest) -> dict[str, bool | str | list[int]]:
+    """
+    Write attributes in order. Attributes whose cached value is the same are skipped unless force is true.
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | list[int]]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
+            return {"success": False, "error": "Not open: qMR"}
+        if job_scheduler.is_reserved("qmr"):
+            return {"success": False, "error": "busy"}
+        attributes = [make_attribute(name=a.name, value=a.value, component=a.component, factory_type=a.factoryType) for a in request.attributes]
+        status_codes = trans_test.qmr_rest.write_attributes(attributes=attributes, force=request.force)
+        return {"success": all(status_code == 200 for status_code in status_codes), "data": status_codes}
+
+    return wrapper()
+
+
+@router_qmr.get("/getCache")
+async def qmr_get_cache() -> dict[str, bool | dict[str, AttributeValue]]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | dict[str, AttributeValue]]:
+        trans_test = get_trans_test()
+        return {"success": True, "data": trans_test.qmr_cache.to_dict()}
+
+    return wrapper()
+
+
+@router_qmr.get("/clearCache")
+async def qmr_clear_cache() -> dict[str, bool]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool]:
+        trans_test = get_trans_test()
+        trans_test.qmr_cache.clear()
+        return {"success": True}
+
+    return wrapper()
+
+
+@router_qmr.post("/sweepStart")
+async def qmr_sweep_start(request: QmrSweepRequest) -> dict[str, bool | str]:
+    """
+    Run every combination of axis values on the server as a job reserving qMR. The last axis changes fastest.
+    """
+
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qmr_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qmr:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
             return {"success": False, "error": "Not open: qMR"}
-        return {"success": trans_test.change_modcod(modcod=15)}
+        if job_scheduler.is_reserved("qmr"):
+            return {"success": False, "error": "busy"}
+        axes: list[QmrSweepAxisDict] = [
+            {
+                "component": axis.component,
+                "name": axis.name,
+                "values": axis.values,
+                "factory_type": guess_factory_type(axis.values[0]) if axis.factoryType is None else axis.factoryType,
+            }
+            for axis in request.axes
+            if len(axis.values) > 0
+        ]
+        sweep = QmrSweep(client=trans_test.qmr_rest, axes=axes, dwell=request.dwell, reads_back=request.readBack)
+        job_id = job_scheduler.submit(name="trans.qmr_sweep", func=lambda context: sweep.run(context.cancel_event), resources=QMR_JOB_RESOURCES)
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        trans_test.qmr_sweep = sweep
+        trans_test.qmr_sweep_job_id = job_id
+        return {"success": True, "sweepId": job_id}
 
     return wrapper()
 
 
+@router_qmr.get("/sweepStatus")
+async def qmr_sweep_status() -> dict[str, bool | str | object]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | object]:
+        trans_test = get_trans_test()
+        status = None if trans_test.qmr_sweep_job_id is None else job_scheduler.get_status(trans_test.qmr_sweep_job_id)
+        if trans_test.qmr_sweep is None or status is None:
+            return {"success": False, "error": "Not exist: sweep"}
+        return {
+            "success": True,
+            "data": {
+                "sweep_id": status["job_id"],
+                "is_running": status["state"] in ("queued", "running"),
+                "is_cancelled": status["is_cancel_requested"],
+                **trans_test.qmr_sweep.get_status(),
+                "error": status["error"],
+            },
+        }
+
+    return wrapper()
+
+
+@router_qmr.get("/sweepStop")
+async def qmr_sweep_stop() -> dict[str, bool | str]:
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if trans_test.qmr_sweep_job_id is None or job_scheduler.cancel(trans_test.qmr_sweep_job_id, timeout=0) is None:
+            return {"success": False, "error": "Not exist: sweep"}
+        return {"success": True}
+
+    return wrapper()
+
+
+@router_test.get("/changeModcodRecordStart")
+async def change_modcod_record_start(modcod: int, sessionName: str, duration: int) -> dict[str, bool | str]:  # noqa
+    """
+    Switch MODCOD of qMR and start recording of qDRA concurrently
+    """
+
+    @async_exception(logger=logger)
+    async def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if modcod not in (13, 15):
+            return {"success": False, "error": f"Not supported: modcod {modcod}"}
+        if not health_monitor.is_alive("qmr") or not trans_test.is_on_qmr:
+            return {"success": False, "error": "Not open: qMR"}
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
+            return {"success": False, "error": "Not open: qDRA"}
+        if job_scheduler.is_reserved("qmr") or job_scheduler.is_reserved("qdra"):
+            return {"success": False, "error": "busy"}
+        is_changed, is_recording = await asyncio.gather(
+            trans_test.change_modcod_async(modcod=cast(ModcodType, modcod)),
+            trans_test.record_start_async(session_name=sessionName, duration=duration),
+        )
+        if not is_changed:
+            return {"success": False, "error": "Cannot change MODCOD"}
+        if not is_recording:
+            return {"success": False, "error": "Cannot start recording"}
+        return {"success": True}
+
+    return await wrapper()
+
+
 @router_test.get("/processing")
 async def processing(sessionName: str, pathStr: str, pathScriptStr: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
-        stdout, stderr = trans_test.processing(session_name=sessionName, path_str=pathStr, p_script_str=pathScriptStr)
+        status, result = job_scheduler.submit_and_wait(
+            name="trans.processing",
+            func=lambda _: trans_test.processing(session_name=sessionName, path_str=pathStr, p_script_str=pathScriptStr),
+            resources=QDRA_JOB_RESOURCES,
+        )
+        error = get_job_error(status)
+        if error is not None:
+            return {"success": False, "error": error}
+        stdout, stderr = result
         return {"success": True, "stdout": stdout, "stderr": stderr}
 
+    return await run_in_threadpool(wrapper)
+
+
+@router_test.get("/processingStart")
+async def processing_start(sessionName: str, pathStr: str, pathScriptStr: str) -> dict[str, bool | str]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
+            return {"success": False, "error": "Not open: qDRA"}
+        if trans_test.get_busy_status():
+            return {"success": False, "error": "busy"}
+        job_id = trans_test.start_processing(session_name=sessionName, path_str=pathStr, p_script_str=pathScriptStr)
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        return {"success": True, "jobId": job_id}
+
+    return wrapper()
+
+
+@router_test.get("/processingOutput")
+async def processing_output(jobId: str, since: int = 0) -> dict[str, bool | str | int | list[str]]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | int | list[str]]:
+        trans_test = get_trans_test()
+        job = trans_test.get_processing_job(jobId)
+        if job is None:
+            return {"success": False, "error": f"Not exist: job {jobId}"}
+        lines, next_since = job.get_output(since=since)
+        return {"success": True, "data": lines, "next": next_since}
+
     return wrapper()
 
 
+@router_test.get("/processingStatus")
+async def processing_status(jobId: str) -> dict[str, bool | str | int | None]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str | int | None]:
+        trans_test = get_trans_test()
+        job = trans_test.get_processing_job(jobId)
+        if job is None:
+            return {"success": False, "error": f"Not exist: job {jobId}"}
+        # Read from the job, which keeps the final state after job_scheduler has forgotten the job
+        processing_status = job.get_status()
+        return {
+            "success": True,
+            "jobId": jobId,
+            "sessionName": processing_status["session_name"],
+            "isRunning": processing_status["state"] in ("queued", "running"),
+            "isCancelled": processing_status["is_cancel_requested"],
+            "exitStatus": processing_status["exit_status"],
+            "lineCount": processing_status["line_count"],
+            "jobError": processing_status["error"],
+        }
+
+    return wrapper()
+
+
+@router_test.get("/processingCancel")
+async def processing_cancel(jobId: str) -> dict[str, bool | str]:  # noqa
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if trans_test.get_processing_job(jobId) is None:
+            return {"success": False, "error": f"Not exist: job {jobId}"}
+        # None when job_scheduler has forgotten the job, which has finished long ago
+        job_scheduler.cancel(jobId, timeout=0)
+        return {"success": True}
+
+    return wrapper()
+
+
+def make_get_processing_data_job(
+    session_name: str, path_str: str, delete_flag: bool, transfer_mode: TransferMode, compression: CompressionType
+) -> Callable[[JobContext], None]:
+    """
+    Job function of getProcessingData, which fails with the error when the data does not exist or the transfer failed
+    """
+
+    def run(context: JobContext) -> None:
+        error = get_trans_test().get_processing_data(
+            session_name=session_name, path_str=path_str, delete_flag=delete_flag, transfer_mode=transfer_mode, compression=compression, context=context
+        )
+        if error is not None:
+            raise RuntimeError(error)
+
+    return run
+
+
 @router_test.get("/getProcessingData")
-async def get_processing_data(sessionName: str, pathStr: str, deleteFlag: bool = False) -> dict[str, bool | str]:  # noqa
+async def get_processing_data(
+    sessionName: str, pathStr: str, deleteFlag: bool = False, transferMode: TransferMode = "sftp", compression: CompressionType = "gzip"  # noqa
+) -> dict[str, bool | str]:
+    """
+    Download the data as a job reserving qDRA and wait for it
+    """
+
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
-        exists = trans_test.get_processing_data(session_name=sessionName, path_str=pathStr, delete_flag=deleteFlag)
-        if exists:
+        status, _ = job_scheduler.submit_and_wait(
+            name="trans.get_processing_data",
+            func=make_get_processing_data_job(sessionName, pathStr, deleteFlag, transferMode, compression),
+            resources=QDRA_JOB_RESOURCES,
+        )
+        error = get_job_error(status)
+        if error is None:
             return {"success": True}
         else:
-            return {"success": False, "error": "Processing data not exist"}
+            return {"success": False, "error": error}
+
+    return await run_in_threadpool(wrapper)
+
+
+@router_test.get("/getProcessingDataStart")
+async def get_processing_data_start(
+    sessionName: str, pathStr: str, deleteFlag: bool = False, transferMode: TransferMode = "sftp", compression: CompressionType = "gzip"  # noqa
+) -> dict[str, bool | str]:
+    """
+    Same as getProcessingData as a job. The job fails with the error when the data does not exist or the transfer failed.
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
+            return {"success": False, "error": "Not open: qDRA"}
+        if trans_test.get_busy_status():
+            return {"success": False, "error": "busy"}
+        job_id = job_scheduler.submit(
+            name="trans.get_processing_data",
+            func=make_get_processing_data_job(sessionName, pathStr, deleteFlag, transferMode, compression),
+            resources=QDRA_JOB_RESOURCES,
+        )
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        return {"success": True, "jobId": job_id}
 
     return wrapper()
 
@@ -282,13 +791,37 @@ async def get_processing_data(sessionName: str, pathStr: str, deleteFlag: bool =
 async def screenshot(sessionName: str) -> dict[str, bool | str]:  # noqa
     @exception(logger=logger)
     def wrapper() -> dict[str, bool | str]:
-        ip_address = trans_test.qdra_setting.ip_address
-        if not check_ping(ip_address) or not trans_test.is_on_qdra:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
             return {"success": False, "error": "Not open: qDRA"}
-        exists = trans_test.screenshot(sessionName)
+        status, exists = job_scheduler.submit_and_wait(name="trans.screenshot", func=lambda _: trans_test.screenshot(sessionName), resources=QDRA_JOB_RESOURCES)
+        error = get_job_error(status)
+        if error is not None:
+            return {"success": False, "error": error}
         if exists:
             return {"success": True}
         else:
             return {"success": False, "error": "Cannot screenshot"}
 
+    return await run_in_threadpool(wrapper)
+
+
+@router_test.get("/screenshotStart")
+async def screenshot_start(sessionName: str) -> dict[str, bool | str]:  # noqa
+    """
+    Same as screenshot as a job. The result of the job is true if the screenshot exists.
+    """
+
+    @exception(logger=logger)
+    def wrapper() -> dict[str, bool | str]:
+        trans_test = get_trans_test()
+        if not health_monitor.is_alive("qdra") or not trans_test.is_on_qdra:
+            return {"success": False, "error": "Not open: qDRA"}
+        if trans_test.get_busy_status():
+            return {"success": False, "error": "busy"}
+        job_id = job_scheduler.submit(name="trans.screenshot", func=lambda _: trans_test.screenshot(sessionName), resources=QDRA_JOB_RESOURCES)
+        if job_id is None:
+            return {"success": False, "error": "busy"}
+        return {"success": True, "jobId": job_id}
+
     return wrapper()
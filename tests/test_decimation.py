@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from common.decimation import (
+    MINMAX_MIN_POINTS,
+    DecimationCache,
+    MinMaxPyramid,
+    lttb_indices,
+    minmax_indices,
+    select_range,
+)
+
+
+def make_data(n: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    return np.arange(n, dtype=float) * 0.1, rng.normal(size=n)
+
+
+def test_select_range():
+    x = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+
+    assert select_range(x, None, None) == (0, 5)
+    # Both ends are inclusive
+    assert select_range(x, 1.0, 3.0) == (1, 4)
+    assert select_range(x, 0.5, 3.5) == (1, 4)
+    assert select_range(x, 3.5, 1.0) == (4, 4)
+
+
+def test_minmax_indices():
+    _, y = make_data(1003)
+    bucket_size = 10
+
+    indices = minmax_indices(y, bucket_size)
+
+    assert np.all(np.diff(indices) > 0)
+    assert len(indices) <= 2 * 101
+    # The minimum and the maximum of each bucket are kept, including the last partial bucket
+    for i_bucket in range(0, len(y), bucket_size):
+        bucket = y[i_bucket : i_bucket + bucket_size]
+        assert i_bucket + int(np.argmin(bucket)) in indices
+        assert i_bucket + int(np.argmax(bucket)) in indices
+
+
+@pytest.mark.parametrize("max_points", [MINMAX_MIN_POINTS, 5, 10, 33, 100, 999])
+@pytest.mark.parametrize(("i_start", "i_end"), [(0, 10000), (0, 9999), (123, 4567), (5000, 5100), (9990, 10000)])
+def test_pyramid_get_indices(max_points: int, i_start: int, i_end: int):
+    _, y = make_data(10000)
+    pyramid = MinMaxPyramid(y)
+
+    indices = pyramid.get_indices(i_start, i_end, max_points)
+
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == i_start
+    assert indices[-1] == i_end - 1
+    if i_end - i_start <= max_points:
+        assert len(indices) == i_end - i_start
+    else:
+        assert len(indices) <= max_points + 2
+    # The extrema of the range are kept
+    assert i_start + int(np.argmin(y[i_start:i_end])) in indices
+    assert i_start + int(np.argmax(y[i_start:i_end])) in indices
+
+
+def test_pyramid_min_points():
+    _, y = make_data(100)
+
+    with pytest.raises(ValueError, match="max_points"):
+        MinMaxPyramid(y).get_indices(0, 100, MINMAX_MIN_POINTS - 1)
+
+
+@pytest.mark.parametrize("max_points", [3, 10, 100])
+def test_lttb_indices(max_points: int):
+    x, y = make_data(1000)
+    y[500] = 100.0
+
+    indices = lttb_indices(x, y, max_points)
+
+    assert len(indices) == max_points
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0
+    assert indices[-1] == len(y) - 1
+    if max_points > 3:
+        # A spike makes the largest triangle in its bucket
+        assert 500 in indices
+
+
+def test_lttb_indices_no_decimation():
+    x, y = make_data(10)
+
+    assert np.array_equal(lttb_indices(x, y, 10), np.arange(10))
+    assert np.array_equal(lttb_indices(x, y, 100), np.arange(10))
+
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_decimation_cache(method: str):
+    x, y = make_data(1000)
+    cache = DecimationCache(max_runs=1)
+
+    indices, info = cache.decimate("run", x.tolist(), y.tolist(), max_points=20, start=10.0, end=50.0, method=method)  # type: ignore
+
+    assert info["total_count"] == 1000
+    assert info["range_count"] == 401
+    assert info["count"] == len(indices)
+    assert len(indices) <= 22
+    assert indices[0] == 100
+    assert indices[-1] == 500
+    # The same run is not converted again
+    indices_again, _ = cache.decimate("run", [], [], max_points=20, start=10.0, end=50.0, method=method)  # type: ignore
+    assert np.array_equal(indices, indices_again)
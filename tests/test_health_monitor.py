@@ -0,0 +1,114 @@
+import threading
+import time
+
+from common.health_monitor import (
+    HealthMonitor,
+    get_ip_address_from_visa,
+    get_visa_probe_interval,
+    make_visa_probe,
+)
+
+TIMEOUT = 5  # s
+
+
+class CountingProbe:
+    def __init__(self, is_alive: bool = True) -> None:
+        self.is_alive = is_alive
+        self.call_count = 0
+
+    def __call__(self) -> bool:
+        self.call_count += 1
+        return self.is_alive
+
+
+def test_visa_address():
+    assert get_ip_address_from_visa("TCPIP0::192.168.1.5::8023::SOCKET") == "192.168.1.5"
+    assert get_ip_address_from_visa("USB0::0x2A8D::0x7F18::MY60430008::0::INSTR") is None
+    assert get_visa_probe_interval("TCPIP0::192.168.1.5::inst0::INSTR") is None
+    assert get_visa_probe_interval("USB0::0x2A8D::0x7F18::MY60430008::0::INSTR") is not None
+
+
+def test_open_usb_device_is_not_looked_up():
+    # The VISA resource list is not needed while the driver is open
+    probe = make_visa_probe("USB0::0x2A8D::0x7F18::MY60430008::0::INSTR", is_open=lambda: True)
+
+    assert probe()
+
+
+def test_probe_interval():
+    monitor = HealthMonitor(interval=0.05)
+    fast_probe = CountingProbe()
+    slow_probe = CountingProbe()
+    monitor.register("fast", fast_probe)
+    monitor.register("slow", slow_probe, interval=0.4)
+
+    monitor.start()
+    time.sleep(1)
+    monitor.stop()
+
+    assert fast_probe.call_count >= 10
+    assert 2 <= slow_probe.call_count <= 4
+
+
+def test_stale_cache():
+    monitor = HealthMonitor(interval=0.05, max_age=0.1)
+    probe = CountingProbe()
+    monitor.register("device", probe, interval=0.2)
+
+    # Never checked, so probed on the calling thread
+    assert monitor.is_alive("device")
+    assert probe.call_count == 1
+    time.sleep(0.15)
+    # Stale after two intervals of the device, not max_age of the monitor
+    assert monitor.is_alive("device")
+    assert probe.call_count == 1
+    time.sleep(0.3)
+    assert monitor.is_alive("device")
+    assert probe.call_count == 2
+    assert not monitor.is_alive("nope")
+
+
+def test_register_same_target():
+    monitor = HealthMonitor()
+    monitor.register("device", CountingProbe(), target="192.168.1.5")
+    monitor.probe_now("device")
+    health = monitor.get("device")
+
+    # Reload of the same settings keeps the cache, so is_alive does not probe on the calling thread
+    probe = CountingProbe()
+    monitor.register("device", probe, target="192.168.1.5")
+    assert monitor.get("device") == health
+    assert monitor.is_alive("device")
+    assert probe.call_count == 0
+
+    # A new target is checked again
+    monitor.register("device", probe, target="192.168.1.6")
+    new_health = monitor.get("device")
+    assert new_health is not None and new_health["checked_at"] is None
+
+
+def test_superseded_probe():
+    monitor = HealthMonitor()
+    started_event = threading.Event()
+    release_event = threading.Event()
+
+    def old_probe() -> bool:
+        started_event.set()
+        release_event.wait(TIMEOUT)
+        return True
+
+    monitor.register("device", old_probe, target="192.168.1.5")
+    thread = threading.Thread(target=monitor.probe_now, args=("device",))
+    thread.start()
+    assert started_event.wait(TIMEOUT)
+
+    monitor.register("device", CountingProbe(is_alive=False), target="192.168.1.6")
+    monitor.probe_now("device")
+    release_event.set()
+    thread.join()
+
+    # The result of the old address finished later is dropped
+    health = monitor.get("device")
+    assert health is not None
+    assert health["checked_at"] is not None
+    assert not health["is_alive"]
@@ -0,0 +1,139 @@
+import threading
+from typing import Iterator
+
+import pytest
+
+from common.job_scheduler import JobContext, JobScheduler, JobStatusDict
+
+TIMEOUT = 5  # s
+
+
+@pytest.fixture()
+def scheduler() -> Iterator[JobScheduler]:
+    scheduler = JobScheduler(max_workers=1, max_history=3)
+    yield scheduler
+    scheduler.shutdown(timeout=TIMEOUT)
+
+
+def wait_cancelled(context: JobContext) -> None:
+    context.cancel_event.wait(TIMEOUT)
+
+
+def test_reservation_conflict(scheduler: JobScheduler):
+    release_event = threading.Event()
+    job_id = scheduler.submit("a", lambda _: release_event.wait(TIMEOUT), resources=["qdra", "qmr"])
+    assert job_id is not None
+
+    assert scheduler.submit("b", lambda _: None, resources=["qmr"]) is None
+    assert scheduler.is_reserved("qdra")
+    assert scheduler.get_reservations() == {"qdra": job_id, "qmr": job_id}
+    status, _ = scheduler.submit_and_wait("c", lambda _: None, resources=["qdra"])
+    assert status is None
+
+    release_event.set()
+    assert scheduler.wait(job_id, TIMEOUT)
+    assert not scheduler.is_reserved("qdra")
+    status, result = scheduler.submit_and_wait("d", lambda _: 1, resources=["qdra"])
+    assert status is not None and status["state"] == "succeeded"
+    assert result == 1
+
+
+def test_cancel_queued_and_running(scheduler: JobScheduler):
+    started_event = threading.Event()
+    calls: list[str] = []
+
+    def run(context: JobContext) -> None:
+        started_event.set()
+        wait_cancelled(context)
+
+    running_job_id = scheduler.submit("running", run, resources=["qdra"])
+    # One worker, so the second job waits queued
+    queued_job_id = scheduler.submit("queued", lambda _: calls.append("queued"), resources=["qmr"])
+    assert running_job_id is not None and queued_job_id is not None
+    assert started_event.wait(TIMEOUT)
+
+    # A queued job is cancelled without running and releases its resources at once
+    assert scheduler.cancel(queued_job_id, timeout=0)
+    status = scheduler.get_status(queued_job_id)
+    assert status is not None and status["state"] == "cancelled" and status["started_at"] is None
+    assert not scheduler.is_reserved("qmr")
+    # A running job stops at its next check
+    assert scheduler.is_reserved("qdra")
+    assert scheduler.cancel(running_job_id, timeout=TIMEOUT)
+    status = scheduler.get_status(running_job_id)
+    assert status is not None and status["state"] == "cancelled" and status["is_cancel_requested"]
+    assert not scheduler.is_reserved("qdra")
+    assert calls == []
+    assert scheduler.cancel("nope") is None
+
+
+def test_timeout(scheduler: JobScheduler):
+    def run(context: JobContext) -> int:
+        count = 0
+        while context.sleep(1):
+            count += 1
+        return count
+
+    status, result = scheduler.submit_and_wait("slow", run, timeout=0.1)
+
+    assert status is not None
+    assert status["state"] == "cancelled"
+    assert status["is_timed_out"]
+    assert result is None
+
+
+def test_timeout_of_event_waiter(scheduler: JobScheduler):
+    # A job blocking on cancel_event without calling is_cancelled stops at the timeout
+    status, _ = scheduler.submit_and_wait("wait", wait_cancelled, timeout=0.1)
+
+    assert status is not None
+    assert status["state"] == "cancelled"
+    assert status["is_timed_out"]
+    assert status["finished_at"] is not None and status["started_at"] is not None
+    assert status["finished_at"] - status["started_at"] < TIMEOUT / 2
+
+
+def test_failed_job(scheduler: JobScheduler):
+    def run(_: JobContext) -> None:
+        raise RuntimeError("Cannot transfer")
+
+    status, result = scheduler.submit_and_wait("fail", run, resources=["qdra"])
+
+    assert status is not None
+    assert status["state"] == "failed"
+    assert status["error"] == "Cannot transfer"
+    assert result is None
+    assert not scheduler.is_reserved("qdra")
+
+
+def test_history_pruning():
+    scheduler = JobScheduler(max_workers=2, max_history=3)
+    job_id = scheduler.submit("running", wait_cancelled)
+    finished_job_ids = []
+    for i in range(4):
+        status, _ = scheduler.submit_and_wait(f"job{i}", lambda _: None)
+        assert status is not None
+        finished_job_ids.append(status["job_id"])
+    assert job_id is not None
+
+    # Jobs over max_history are forgotten from the oldest finished job, a running job is kept
+    assert len(scheduler.get_all()) == 3
+    assert scheduler.get_status(job_id) is not None
+    assert [scheduler.get_status(finished_job_id) is not None for finished_job_id in finished_job_ids] == [False, False, True, True]
+    scheduler.shutdown(timeout=TIMEOUT)
+
+
+def test_on_finish(scheduler: JobScheduler):
+    statuses: list[JobStatusDict] = []
+    release_event = threading.Event()
+
+    running_job_id = scheduler.submit("running", lambda _: release_event.wait(TIMEOUT), on_finish=statuses.append)
+    queued_job_id = scheduler.submit("queued", lambda _: None, on_finish=statuses.append)
+    assert running_job_id is not None and queued_job_id is not None
+
+    # Also called for a job cancelled before running
+    scheduler.cancel(queued_job_id, timeout=0)
+    release_event.set()
+    assert scheduler.wait(running_job_id, TIMEOUT)
+
+    assert [(status["job_id"], status["state"]) for status in statuses] == [(queued_job_id, "cancelled"), (running_job_id, "succeeded")]
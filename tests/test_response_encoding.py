@@ -0,0 +1,92 @@
+import json
+import sys
+
+import numpy as np
+import pytest
+
+from common.decimation import DecimationCache
+from common.response_encoding import (
+    ARRAY_ALIGNMENT,
+    LAYOUT_HEADER,
+    METADATA_HEADER,
+    FastJSONResponse,
+    encode_arrays,
+    negotiate_format,
+)
+
+
+def test_negotiate_format():
+    assert negotiate_format(None, None) == "json"
+    assert negotiate_format(None, "application/octet-stream") == "binary"
+    assert negotiate_format("json", "application/octet-stream") == "json"
+    with pytest.raises(ValueError, match="Not supported"):
+        negotiate_format("csv", None)
+
+
+@pytest.mark.parametrize("has_orjson", [True, False])
+def test_encode_decimated_json(monkeypatch: pytest.MonkeyPatch, has_orjson: bool):
+    if not has_orjson:
+        # The standard encoder is used when orjson cannot be imported
+        monkeypatch.setitem(sys.modules, "orjson", None)
+    else:
+        pytest.importorskip("orjson")
+    frequency = np.linspace(1.0e9, 1.1e9, 1001)
+    power = np.random.default_rng(0).normal(-90, 1, len(frequency))
+    indices, decimation = DecimationCache().decimate(None, frequency.tolist(), power.tolist(), max_points=50)
+
+    response = encode_arrays(
+        {"frequency": (frequency[indices], "float64"), "power": (power[indices], "float32")},
+        {"decimation": decimation, "peak": np.float64(power.max())},
+        "json",
+    )
+    body = json.loads(response.body)
+
+    assert body["success"]
+    assert body["data"]["frequency"] == frequency[indices].tolist()
+    assert body["data"]["power"] == power[indices].tolist()
+    assert body["decimation"]["count"] == len(indices)
+    assert body["peak"] == power.max()
+
+
+def test_non_finite_json(monkeypatch: pytest.MonkeyPatch):
+    pytest.importorskip("orjson")
+    content = {
+        "values": [1.5, float("nan"), float("inf")],
+        "array": np.array([np.nan, -np.inf, 2.0]),
+        "array32": np.array([np.nan, 1.0], dtype=np.float32),
+        "scalar": np.float64("nan"),
+        "scalar32": np.float32("inf"),
+        "nested": {"pair": (float("-inf"), 0.0)},
+    }
+    body_orjson = FastJSONResponse(content).body
+
+    # The standard encoder gives the same output as orjson
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    body_json = FastJSONResponse(content).body
+
+    assert body_json == body_orjson
+    assert json.loads(body_json) == {
+        "values": [1.5, None, None],
+        "array": [None, None, 2.0],
+        "array32": [None, 1.0],
+        "scalar": None,
+        "scalar32": None,
+        "nested": {"pair": [None, 0.0]},
+    }
+
+
+def test_encode_binary():
+    frequency = np.linspace(1.0e9, 1.1e9, 3)
+    power = [-90.0, -20.0, -90.0]
+
+    response = encode_arrays({"power": (power, "float32"), "frequency": (frequency, "float64")}, {"rbw": 1e6}, "binary")
+    layout = json.loads(response.headers[LAYOUT_HEADER])
+
+    assert json.loads(response.headers[METADATA_HEADER]) == {"rbw": 1e6}
+    assert [array["name"] for array in layout] == ["power", "frequency"]
+    for array in layout:
+        assert array["offset"] % ARRAY_ALIGNMENT == 0
+    values = np.frombuffer(response.body, dtype="<f4", count=3, offset=layout[0]["offset"])
+    assert values.tolist() == power
+    values = np.frombuffer(response.body, dtype="<f8", count=3, offset=layout[1]["offset"])
+    assert values.tolist() == frequency.tolist()
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Optional
+
+import pytest
+
+from common.sampler import PeriodicSampler
+
+
+class FakeInstrument:
+    """
+    Query which takes latency s, returns None for the calls in errors
+    """
+
+    def __init__(self, latency: float = 0, errors: tuple[int, ...] = ()) -> None:
+        self.latency = latency
+        self.errors = errors
+        self.call_count = 0
+
+    def get_data(self) -> Optional[float]:
+        self.call_count += 1
+        time.sleep(self.latency)
+        return None if self.call_count in self.errors else float(self.call_count)
+
+
+def test_inclusive_end():
+    # 0.3 / 0.1 is 2.9999999999999996 in float, the deadline at 0.3 must not be lost
+    data, stats = PeriodicSampler(func=FakeInstrument().get_data, interval=0.1).run(duration=0.3)
+
+    assert data["time"] == [0.0, 0.1, 0.2, 0.3]
+    assert data["value"] == [1.0, 2.0, 3.0, 4.0]
+    assert stats["deadline_count"] == 4
+    assert stats["sample_count"] == 4
+    assert stats["missed_count"] == 0
+
+
+def test_no_drift():
+    instrument = FakeInstrument(latency=0.02)
+
+    data, stats = PeriodicSampler(func=instrument.get_data, interval=0.05).run(duration=0.5)
+
+    # Latency shorter than the interval does not shift the deadlines
+    assert data["time"] == pytest.approx([i * 0.05 for i in range(11)])
+    assert stats["missed_count"] == 0
+    for deadline, request_time, response_time in zip(data["time"], data["request_time"], data["response_time"]):
+        assert request_time >= deadline
+        assert response_time - request_time >= 0.02
+    assert stats["mean_latency"] is not None and stats["mean_latency"] >= 0.02
+
+
+def test_overrun():
+    # Each query overruns 2 deadlines, which are skipped instead of sampled in a burst
+    instrument = FakeInstrument(latency=0.13)
+
+    data, stats = PeriodicSampler(func=instrument.get_data, interval=0.05).run(duration=0.5)
+
+    assert data["time"] == pytest.approx([0.0, 0.15, 0.3, 0.45])
+    assert instrument.call_count == 4
+    # 2 missed after each of the first 3 samples and 1 before the end at 0.5
+    assert stats["missed_count"] == 7
+    assert stats["deadline_count"] == 11
+    assert stats["sample_count"] + stats["missed_count"] + stats["error_count"] == stats["deadline_count"]
+
+
+def test_errors():
+    samples: list[Optional[float]] = []
+    instrument = FakeInstrument(errors=(2, 3))
+
+    data, stats = PeriodicSampler(func=instrument.get_data, interval=0.05).run(duration=0.2, on_sample=samples.append)
+
+    # Failed queries are counted, not saved, and deadlines of the others are kept
+    assert data["time"] == pytest.approx([0.0, 0.15, 0.2])
+    assert data["value"] == [1.0, 4.0, 5.0]
+    assert samples == [1.0, None, None, 4.0, 5.0]
+    assert stats["error_count"] == 2
+    assert stats["sample_count"] == 3
+    assert stats["deadline_count"] == 5
+
+
+def test_cancel():
+    cancel_event = threading.Event()
+    instrument = FakeInstrument()
+    timer = threading.Timer(0.12, cancel_event.set)
+    timer.start()
+
+    time_start = time.perf_counter()
+    data, stats = PeriodicSampler(func=instrument.get_data, interval=0.05).run(duration=10, cancel_event=cancel_event)
+
+    assert time.perf_counter() - time_start < 1
+    # Deadlines at 0, 0.05 and 0.1 before the cancellation at 0.12
+    assert data["time"] == pytest.approx([0.0, 0.05, 0.1])
+    assert stats["deadline_count"] == 3
+    assert stats["missed_count"] == 0
+
+
+def test_cancelled_before_start():
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    data, stats = PeriodicSampler(func=FakeInstrument().get_data, interval=0.05).run(duration=1, cancel_event=cancel_event)
+
+    assert data["time"] == []
+    assert stats["deadline_count"] == 0
+    assert stats["mean_lateness"] is None
@@ -0,0 +1,172 @@
+import threading
+import time
+from typing import Any, Optional
+
+import pytest
+
+from common.job_scheduler import JobContext
+from common.sequence import (
+    SequenceActionDict,
+    SequenceDefinition,
+    SequenceError,
+    SequenceRun,
+    SequenceStep,
+    sort_steps,
+)
+
+
+def make_run(steps: list[dict[str, Any]], stop_on_error: bool = True) -> SequenceRun:
+    def sleep(params: dict[str, Any], context: JobContext) -> Optional[bool]:
+        time.sleep(params.get("duration", 0))
+        return params.get("result")
+
+    actions: dict[str, SequenceActionDict] = {
+        "sleep": {"func": sleep, "params_model": None, "resources": ["sas"]},
+        "other": {"func": sleep, "params_model": None, "resources": ["qmr", "qdra"]},
+    }
+    definition = SequenceDefinition.parse_obj({"name": "test", "steps": steps, "stop_on_error": stop_on_error})
+    return SequenceRun(definition=definition, actions=actions)
+
+
+def get_steps(run: SequenceRun) -> dict[str, dict[str, Any]]:
+    return {step["name"]: dict(step) for step in run.get_status()["steps"]}
+
+
+def test_sort_steps():
+    steps = [
+        SequenceStep(name="c", action="sleep", after=["b"]),
+        SequenceStep(name="b", action="sleep", after=["a"]),
+        SequenceStep(name="a", action="sleep"),
+        SequenceStep(name="d", action="sleep", after=["a"]),
+    ]
+
+    assert [step.name for step in sort_steps(steps)] == ["a", "b", "c", "d"]
+
+
+@pytest.mark.parametrize(
+    ("steps", "match"),
+    [
+        ([SequenceStep(name="a", action="sleep", after=["b"]), SequenceStep(name="b", action="sleep", after=["a"])], "Circular"),
+        ([SequenceStep(name="a", action="sleep", after=["a"])], "Circular"),
+        ([SequenceStep(name="a", action="sleep", after=["nope"])], "Not exist"),
+        ([SequenceStep(name="a", action="sleep"), SequenceStep(name="a", action="sleep")], "not unique"),
+    ],
+)
+def test_sort_steps_error(steps: list[SequenceStep], match: str):
+    with pytest.raises(SequenceError, match=match):
+        sort_steps(steps)
+
+
+def test_unknown_action():
+    with pytest.raises(SequenceError, match="Not supported"):
+        make_run([{"name": "a", "action": "nope"}])
+
+
+def test_resources():
+    run = make_run([{"name": "a", "action": "sleep"}, {"name": "b", "action": "other"}])
+
+    assert run.get_resources() == ["qdra", "qmr", "sas"]
+
+
+def test_timing():
+    run = make_run(
+        [
+            {"name": "a", "action": "sleep", "params": {"duration": 0.3}},
+            {"name": "b", "action": "sleep", "after": ["a"], "delay": 0.2},
+            {"name": "c", "action": "sleep", "at": 0.15},
+        ]
+    )
+
+    run.run(JobContext(job_id="test"))
+    steps = get_steps(run)
+
+    assert all(step["state"] == "succeeded" for step in steps.values())
+    # after and delay: b starts 0.2 s after a finished
+    assert steps["b"]["planned_start"] == pytest.approx(steps["a"]["end"] + 0.2)
+    assert steps["b"]["start"] >= steps["a"]["end"] + 0.2
+    # at: c starts 0.15 s from the start, concurrently with a
+    assert steps["c"]["planned_start"] == 0.15
+    assert 0.15 <= steps["c"]["start"] < steps["a"]["end"]
+    for step in steps.values():
+        assert step["lateness"] == pytest.approx(step["start"] - step["planned_start"])
+        assert step["lateness"] >= 0
+
+
+class LateEvent(threading.Event):
+    # Wakes up later than requested, like an overloaded PC
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        time.sleep((timeout or 0) + 0.1)
+        return self.is_set()
+
+
+def test_max_lateness():
+    run = make_run([{"name": "a", "action": "sleep", "at": 0.05, "max_lateness": 0.05}, {"name": "b", "action": "sleep", "at": 0.05}], stop_on_error=False)
+    context = JobContext(job_id="test")
+    context.cancel_event = LateEvent()
+
+    with pytest.raises(SequenceError, match="Failed steps: a"):
+        run.run(context)
+    steps = get_steps(run)
+
+    assert steps["a"]["state"] == "failed"
+    assert "Late" in steps["a"]["error"]
+    assert steps["a"]["lateness"] > 0.05
+    # A late step without max_lateness runs
+    assert steps["b"]["state"] == "succeeded"
+
+
+@pytest.mark.parametrize("stop_on_error", [True, False])
+def test_stop_on_error(stop_on_error: bool):
+    run = make_run(
+        [
+            {"name": "fail", "action": "sleep", "params": {"result": False}},
+            {"name": "dependent", "action": "sleep", "after": ["fail"]},
+            {"name": "later", "action": "sleep", "at": 0.1},
+        ],
+        stop_on_error=stop_on_error,
+    )
+
+    with pytest.raises(SequenceError, match="Failed steps: fail"):
+        run.run(JobContext(job_id="test"))
+    steps = get_steps(run)
+
+    assert steps["fail"]["state"] == "failed"
+    # Steps after a failed step never run
+    assert steps["dependent"]["state"] == "skipped"
+    # Independent steps not started yet are skipped only with stop_on_error
+    assert steps["later"]["state"] == ("skipped" if stop_on_error else "succeeded")
+
+
+def test_action_timeout():
+    run = make_run([{"name": "slow", "action": "sleep", "params": {"duration": 0.5}, "timeout": 0.1}])
+    running_steps: list[dict[str, Any]] = []
+
+    def watch() -> None:
+        time.sleep(0.3)
+        running_steps.append(get_steps(run)["slow"])
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    time_start = time.perf_counter()
+    with pytest.raises(SequenceError, match="Failed steps: slow"):
+        run.run(JobContext(job_id="test"))
+    watcher.join()
+
+    # The step fails at the timeout, but the sequence finishes after the action returned
+    assert time.perf_counter() - time_start >= 0.5
+    assert running_steps[0]["state"] == "failed"
+    assert running_steps[0]["is_action_running"]
+    assert "Timeout" in running_steps[0]["error"]
+    assert run.get_status()["is_running"] is False
+    assert not get_steps(run)["slow"]["is_action_running"]
+
+
+def test_cancel():
+    run = make_run([{"name": "a", "action": "sleep", "at": 10}])
+    context = JobContext(job_id="test")
+    threading.Timer(0.1, context.cancel).start()
+
+    status = run.run(context)
+
+    assert status["steps"][0]["state"] == "cancelled"
+    assert status["elapsed"] < 5
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from engine.spectrum_analysis import analyze_spectrum
+
+NOISE_FLOOR = -90.0
+CARRIER_POWER = -20.0
+
+
+def make_trace() -> dict[str, list[float]]:
+    # 1 MHz spacing, a flat carrier of 11 points from 1.045 GHz to 1.055 GHz on a flat noise floor
+    frequency = np.linspace(1.0e9, 1.1e9, 101)
+    power = np.full(len(frequency), NOISE_FLOOR)
+    power[45:56] = CARRIER_POWER
+    power[50] = CARRIER_POWER + 3
+    return {"frequency": frequency.tolist(), "power": power.tolist()}
+
+
+def test_analyze_spectrum():
+    metrics = analyze_spectrum(make_trace(), obw_percent=99)
+
+    assert metrics["point_count"] == 101
+    assert metrics["peak_frequency"] == pytest.approx(1.05e9)
+    assert metrics["peak_power"] == pytest.approx(CARRIER_POWER + 3)
+    assert metrics["noise_floor"] == pytest.approx(NOISE_FLOOR)
+    assert metrics["snr"] == pytest.approx(CARRIER_POWER + 3 - NOISE_FLOOR)
+    assert 1.044e9 <= metrics["obw_low"] <= 1.046e9
+    assert 1.054e9 <= metrics["obw_high"] <= 1.056e9
+    assert metrics["obw_center"] == pytest.approx(1.05e9, abs=1e6)
+
+
+def test_channel_power():
+    trace = make_trace()
+    carrier_mw = 10 * 10 ** (CARRIER_POWER / 10) + 10 ** ((CARRIER_POWER + 3) / 10)
+
+    metrics = analyze_spectrum(trace, channel_center=1.05e9, channel_bandwidth=10e6)
+    assert metrics["channel_power"] == pytest.approx(10 * np.log10(carrier_mw))
+
+    # Points are 1 MHz apart, so each point stands for 10 bins of 100 kHz RBW
+    metrics = analyze_spectrum(trace, channel_center=1.05e9, channel_bandwidth=10e6, rbw=100e3)
+    assert metrics["channel_power"] == pytest.approx(10 * np.log10(carrier_mw * 10))
+
+    metrics = analyze_spectrum(trace, channel_center=2e9, channel_bandwidth=1e6)
+    assert metrics["channel_power"] is None
+
+
+def test_invalid_trace():
+    with pytest.raises(ValueError):
+        analyze_spectrum({"frequency": [], "power": []})
+    with pytest.raises(ValueError):
+        analyze_spectrum({"frequency": [1.0, 2.0], "power": [0.0]})
+    with pytest.raises(ValueError):
+        analyze_spectrum(make_trace(), obw_percent=100)
@@ -0,0 +1,87 @@
+import io
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from engine.qdra import check_tar_member, extract_tar
+
+
+def make_tar(members: list[tuple[str, bytes | str | None]]) -> io.BytesIO:
+    """
+    members: name and content for a file, link target for a symbolic link, None for a directory
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in members:
+            member = tarfile.TarInfo(name)
+            if content is None:
+                member.type = tarfile.DIRTYPE
+                tar.addfile(member)
+            elif isinstance(content, str):
+                member.type = tarfile.SYMTYPE
+                member.linkname = content
+                tar.addfile(member)
+            else:
+                member.size = len(content)
+                tar.addfile(member, io.BytesIO(content))
+    buffer.seek(0)
+    return buffer
+
+
+def extract(buffer: io.BytesIO, p_save: Path) -> None:
+    with tarfile.open(fileobj=buffer, mode="r|") as tar:
+        extract_tar(tar, p_save)
+
+
+@pytest.fixture(params=[True, False], ids=["data_filter", "fallback"])
+def has_data_filter(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> bool:
+    if not request.param:
+        monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    return bool(request.param)
+
+
+def test_extract(tmp_path: Path, has_data_filter: bool):
+    buffer = make_tar([("./sub", None), ("./sub/a.bin", b"abc"), ("./b.txt", b"b"), ("./link", "sub/a.bin")])
+
+    extract(buffer, tmp_path)
+
+    assert (tmp_path / "sub" / "a.bin").read_bytes() == b"abc"
+    assert (tmp_path / "b.txt").read_bytes() == b"b"
+    assert (tmp_path / "link").read_bytes() == b"abc"
+
+
+@pytest.mark.parametrize(
+    "members",
+    [
+        [("../outside.txt", b"x")],
+        [("./sub/../../outside.txt", b"x")],
+        [("{tmp_path}/outside.txt", b"x")],
+        [("./link", "../outside.txt")],
+        [("./link", "/etc/passwd")],
+        [("./link", ".."), ("./link/outside.txt", b"x")],
+    ],
+    ids=["parent", "nested_parent", "absolute", "symlink_parent", "symlink_absolute", "through_symlink"],
+)
+def test_refuse_outside(tmp_path: Path, has_data_filter: bool, members: list[tuple[str, bytes | str | None]]):
+    p_save = tmp_path / "save"
+    p_save.mkdir()
+    members = [(name.format(tmp_path=tmp_path), content) for name, content in members]
+
+    try:
+        extract(make_tar(members), p_save)
+        is_refused = False
+    except tarfile.TarError:
+        is_refused = True
+
+    assert not (tmp_path / "outside.txt").exists()
+    # "data" filter extracts an absolute name under p_save instead of refusing it
+    assert is_refused or (has_data_filter and members[0][0].startswith("/"))
+
+
+def test_refuse_device(tmp_path: Path):
+    member = tarfile.TarInfo("./fifo")
+    member.type = tarfile.FIFOTYPE
+
+    with pytest.raises(tarfile.TarError, match="Not supported type"):
+        check_tar_member(member, tmp_path)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from engine.trace_accumulator import TraceAccumulator
+
+FREQUENCY = np.linspace(1.0e9, 1.1e9, 11).tolist()
+
+
+def make_traces(count: int) -> np.ndarray:
+    return np.random.default_rng(0).normal(-60, 3, (count, len(FREQUENCY)))
+
+
+def test_no_trace():
+    assert TraceAccumulator().get_result() is None
+
+
+@pytest.mark.parametrize("average_type", ["log", "power"])
+def test_add(average_type: str):
+    traces = make_traces(20)
+    accumulator = TraceAccumulator(average_type=average_type)  # type: ignore
+
+    for trace in traces:
+        assert accumulator.add(FREQUENCY, trace.tolist())
+    result = accumulator.get_result()
+
+    assert result is not None
+    assert result["count"] == 20
+    assert result["restart_count"] == 0
+    assert result["frequency"] == FREQUENCY
+    values = traces if average_type == "log" else 10 ** (traces / 10)
+    mean = np.mean(values, axis=0)
+    assert result["mean"] == pytest.approx(mean if average_type == "log" else 10 * np.log10(mean))
+    assert result["variance"] == pytest.approx(np.var(values, axis=0, ddof=1))
+    assert result["max"] == pytest.approx(np.max(traces, axis=0))
+    assert result["min"] == pytest.approx(np.min(traces, axis=0))
+
+
+def test_single_trace():
+    trace = make_traces(1)[0]
+    accumulator = TraceAccumulator()
+
+    accumulator.add(FREQUENCY, trace.tolist())
+    result = accumulator.get_result()
+
+    assert result is not None
+    assert result["mean"] == pytest.approx(trace)
+    assert result["variance"] == [0.0] * len(FREQUENCY)
+
+
+def test_restart_on_frequency_change():
+    traces = make_traces(5)
+    accumulator = TraceAccumulator()
+    for trace in traces[:3]:
+        accumulator.add(FREQUENCY, trace.tolist())
+
+    # A changed span restarts the accumulation from the trace
+    frequency = np.linspace(2.0e9, 2.1e9, 11).tolist()
+    assert not accumulator.add(frequency, traces[3].tolist())
+    assert accumulator.add(frequency, traces[4].tolist())
+    result = accumulator.get_result()
+
+    assert result is not None
+    assert result["count"] == 2
+    assert result["restart_count"] == 1
+    assert result["frequency"] == frequency
+    assert result["mean"] == pytest.approx(np.mean(traces[3:], axis=0))
+    assert result["max"] == pytest.approx(np.max(traces[3:], axis=0))
+
+    # A different number of points also restarts
+    assert not accumulator.add(FREQUENCY[:5], traces[0][:5].tolist())
+    result = accumulator.get_result()
+    assert result is not None
+    assert result["count"] == 1
+    assert result["restart_count"] == 2
+    assert result["mean"] == pytest.approx(traces[0][:5])
+
+
+def test_invalid_trace():
+    with pytest.raises(ValueError, match="Invalid trace"):
+        TraceAccumulator().add(FREQUENCY, [0.0])
+
+
+def test_reset():
+    accumulator = TraceAccumulator()
+    accumulator.add(FREQUENCY, make_traces(1)[0].tolist())
+
+    accumulator.reset(average_type="power")
+
+    assert accumulator.get_result() is None
+    assert accumulator.get_count() == 0
+    assert accumulator.average_type == "power"